@@ -0,0 +1,46 @@
+"""Import time benchmark for the rbac_builder package
+
+Compares importing the decorators through the lazy package namespace
+against importing every module the package used to import eagerly.
+Each measurement runs in a fresh interpreter.
+
+    python benchmarks/bench_import.py [runs]
+"""
+import statistics
+import subprocess
+import sys
+
+LAZY = "from rbac_builder import has_access, permission_name"
+EAGER = (
+    "import rbac_builder.base, rbac_builder.baseview, rbac_builder.utils, "
+    "rbac_builder.models, rbac_builder.security.decorators, "
+    "rbac_builder.security.manager, flask_jwt_extended"
+)
+TIMER = (
+    "import time; _start = time.perf_counter(); {0}; "
+    "print(time.perf_counter() - _start)"
+)
+
+
+def measure(statement, runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", TIMER.format(statement)]
+        )
+        timings.append(float(output))
+    return statistics.median(timings)
+
+
+def main(runs=15):
+    lazy = measure(LAZY, runs)
+    eager = measure(EAGER, runs)
+    print("eager imports:   {0:8.2f} ms".format(eager * 1000))
+    print("lazy decorators: {0:8.2f} ms".format(lazy * 1000))
+    print("saving:          {0:8.2f} ms ({1:.0%})".format(
+        (eager - lazy) * 1000, (eager - lazy) / eager)
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,208 @@
+"""Permission check queries benchmark on SQLite
+
+Builds a large synthetic catalog (views, permissions, roles and grants) in
+a temporary SQLite file and times the hot security manager queries against
+their previous shape, which joined `role` to filter on its id and joined
+`permission` and `view_menu` to filter on their names. The previous shape
+is timed without and with the schema version 4 indexes. Every shape runs as
+a cached statement, only the SQL differs.
+
+    python benchmarks/bench_permission_queries.py [views] [roles] [runs]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import and_, bindparam, exists, literal, select
+
+from rbac_builder import RBACBuilder, SQLA
+from rbac_builder.security.sqla.models import assoc_permissionview_role
+from rbac_builder.utils import generate_uuid
+
+PERMISSIONS = [
+    "can_list", "can_show", "can_add", "can_edit", "can_delete",
+    "can_export", "can_import", "menu_access",
+]
+GRANTS_PER_ROLE = 400
+ROLES_PER_USER = 3
+NEW_INDEXES = ["ix_permission_view_role_role_id", "ix_permission_view_view_menu_id"]
+
+
+def create_catalog(sm, views, roles):
+    """
+        Inserts `views` views with every permission and `roles` roles
+        holding GRANTS_PER_ROLE random permission views each
+    """
+    random.seed(0)
+    session = sm.get_session
+    permission = sm.permission_model.__table__
+    view_menu = sm.viewmenu_model.__table__
+    pv = sm.permissionview_model.__table__
+    role = sm.role_model.__table__
+    permission_ids = {name: generate_uuid() for name in PERMISSIONS}
+    view_ids = {"View{0}".format(i): generate_uuid() for i in range(views)}
+    pv_rows = [
+        {"id": generate_uuid(), "permission_id": permission_id, "view_menu_id": view_id}
+        for view_id in view_ids.values()
+        for permission_id in permission_ids.values()
+    ]
+    role_rows = [{"id": generate_uuid(), "name": "Role{0}".format(i)} for i in range(roles)]
+    session.execute(permission.insert(), [
+        {"id": pk, "name": name} for name, pk in permission_ids.items()
+    ])
+    session.execute(view_menu.insert(), [
+        {"id": pk, "name": name} for name, pk in view_ids.items()
+    ])
+    session.execute(pv.insert(), pv_rows)
+    session.execute(role.insert(), role_rows)
+    session.execute(assoc_permissionview_role.insert(), [
+        {"id": generate_uuid(), "role_id": role_row["id"], "permission_view_id": pv_row["id"]}
+        for role_row in role_rows
+        for pv_row in random.sample(pv_rows, GRANTS_PER_ROLE)
+    ])
+    session.commit()
+    session.execute("ANALYZE")
+    return [role_row["id"] for role_row in role_rows]
+
+
+def legacy_join(sm):
+    pv = sm.permissionview_model.__table__
+    return (
+        assoc_permissionview_role
+            .join(pv, pv.c.id == assoc_permissionview_role.c.permission_view_id)
+            .join(
+            sm.role_model.__table__,
+            sm.role_model.__table__.c.id == assoc_permissionview_role.c.role_id,
+        )
+            .join(sm.permission_model.__table__, sm.permission_model.__table__.c.id == pv.c.permission_id)
+            .join(sm.viewmenu_model.__table__, sm.viewmenu_model.__table__.c.id == pv.c.view_menu_id)
+    )
+
+
+def legacy_exist(sm):
+    return select([exists(
+        select([literal(True)])
+            .select_from(legacy_join(sm))
+            .where(
+            and_(
+                sm.viewmenu_model.__table__.c.name == bindparam("view_name"),
+                sm.permission_model.__table__.c.name == bindparam("permission_name"),
+                sm.role_model.__table__.c.id.in_(bindparam("role_ids", expanding=True)),
+            )
+        )
+    )])
+
+
+def legacy_view_menu_names(sm):
+    return (
+        select([sm.viewmenu_model.__table__.c.name])
+            .select_from(legacy_join(sm))
+            .where(
+            and_(
+                sm.permission_model.__table__.c.name == bindparam("permission_name"),
+                sm.role_model.__table__.c.id.in_(bindparam("role_ids", expanding=True)),
+            )
+        )
+    )
+
+
+def legacy_permission_views(sm):
+    permission = sm.permission_model.__table__
+    return (
+        select([
+            sm.permissionview_model.__table__.c.id,
+            permission.c.name,
+            sm.viewmenu_model.__table__.c.name,
+        ])
+            .select_from(legacy_join(sm))
+            .where(sm.role_model.__table__.c.id.in_(bindparam("role_ids", expanding=True)))
+            .where(permission.c.name != "menu_access")
+    )
+
+
+def measure(call, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(views=5000, roles=500, runs=200):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + path
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["JWT_SECRET_KEY"] = "rbac-builder-benchmark-secret-key-0123456789"
+    with app.app_context():
+        db = SQLA(app)
+        rbac = RBACBuilder()
+        rbac.init_app(app, db.session, JWTManager(app))
+        sm = rbac.sm
+        role_ids = create_catalog(sm, views, roles)
+        random.seed(1)
+        user_roles = random.sample(role_ids, ROLES_PER_USER)
+        view_name = "View{0}".format(views // 2)
+        print("{0} views, {1} permission views, {2} roles, {3} grants, {4} runs".format(
+            views, views * len(PERMISSIONS), roles, roles * GRANTS_PER_ROLE, runs
+        ))
+        # (name, previous shape, current shape, previous rows to current result)
+        cases = [
+            (
+                "exist_permission_on_roles",
+                lambda: sm.execute_cached(
+                    "legacy_exist", lambda: legacy_exist(sm),
+                    view_name=view_name, permission_name="can_edit", role_ids=user_roles,
+                ),
+                lambda: sm.exist_permission_on_roles(view_name, "can_edit", user_roles),
+                lambda rows: bool(rows[0][0]),
+            ),
+            (
+                "find_roles_view_menu_names",
+                lambda: sm.execute_cached(
+                    "legacy_view_menu_names", lambda: legacy_view_menu_names(sm),
+                    permission_name="menu_access", role_ids=user_roles,
+                ),
+                lambda: sorted(sm.find_roles_view_menu_names("menu_access", user_roles)),
+                lambda rows: sorted(row[0] for row in rows),
+            ),
+            (
+                "find_permission_view_tuples",
+                lambda: sm.execute_cached(
+                    "legacy_permission_views", lambda: legacy_permission_views(sm),
+                    role_ids=user_roles,
+                ),
+                lambda: sorted(sm.find_permission_view_tuples_by_roles(user_roles)),
+                lambda rows: sorted(tuple(row) for row in rows),
+            ),
+        ]
+        timings = {name: [] for name, _, _, _ in cases}
+        for name, legacy, current, convert in cases:
+            assert convert(legacy()) == current(), name
+            timings[name].append(measure(legacy, runs))
+            timings[name].append(measure(current, runs))
+        for index in NEW_INDEXES:
+            sm.get_session.execute("DROP INDEX {0}".format(index))
+        sm.get_session.execute("ANALYZE")
+        sm.get_session.commit()
+        for name, legacy, _, _ in cases:
+            timings[name].insert(0, measure(legacy, runs))
+
+        print("{0:28} {1:>12} {2:>12} {3:>12}".format(
+            "milliseconds", "v3 schema", "v4 indexes", "v4 queries"
+        ))
+        for name, (before, indexed, after) in timings.items():
+            print("{0:28} {1:12.3f} {2:12.3f} {3:12.3f}  ({4:+.0%})".format(
+                name, before * 1000, indexed * 1000, after * 1000, (after - before) / before
+            ))
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -3,14 +3,47 @@ Import the `RBACBuilder` module to work with the RBAC builder:
     >>> from rbac_builder import RBACBuilder
     >>> rbac_builder = RBACBuilder()
 See https://github.com/tukida/rbac_builder for more information
+
+Public names are imported lazily on first access, so processes that only
+need `has_access` or `permission_name` do not pay for importing flask_sqlalchemy,
+SQLAlchemy or the security manager.
 """
+import importlib
+from typing import TYPE_CHECKING
 
 __author__ = "Kidataek"
 __version__ = "1.0.1"
 
-from .base import RBACBuilder
-from .baseview import BaseView
-from .utils import generate_uuid
-from .models import Model, SQLA
-from .security.decorators import has_access, permission_name
-from .security.manager import BaseSecurityManager
+_LAZY_IMPORTS = {
+    "RBACBuilder": ".base",
+    "BaseView": ".baseview",
+    "generate_uuid": ".utils",
+    "Model": ".models",
+    "SQLA": ".models",
+    "has_access": ".security.decorators",
+    "permission_name": ".security.decorators",
+    "BaseSecurityManager": ".security.manager",
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .base import RBACBuilder
+    from .baseview import BaseView
+    from .utils import generate_uuid
+    from .models import Model, SQLA
+    from .security.decorators import has_access, permission_name
+    from .security.manager import BaseSecurityManager
+
+
+def __getattr__(name):
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
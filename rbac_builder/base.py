@@ -1,3 +1,4 @@
+import gc
 import logging
 from functools import reduce
 from typing import Dict
@@ -9,7 +10,8 @@ from .const import (
     LOGMSG_INF_RBAC_ADD_VIEW,
     LOGMSG_WAR_RBAC_VIEW_EXISTS,
     LOGMSG_ERR_RBAC_ADD_PERMISSION_VIEW,
-    LOGMSG_ERR_RBAC_ADD_PERMISSION_MENU
+    LOGMSG_ERR_RBAC_ADD_PERMISSION_MENU,
+    LOGMSG_INF_RBAC_WARMUP
 )
 from .menu import Menu, Side
 
@@ -58,6 +60,9 @@ class RBACBuilder(object):
             optional, update permissions flag (Boolean)
         """
         self.baseviews = {}
+        # Views and menus registered before the app, see `warmup`
+        self._pending_views = []
+        self._pending_menus = []
 
         self.menu = Menu()
 
@@ -89,6 +94,13 @@ class RBACBuilder(object):
             self.security_manager_class = SecurityManager
 
         self.sm = self.security_manager_class(self)
+        app.rbac_builder = self
+
+        from .cli import rbac_cli
+        app.cli.add_command(rbac_cli)
+        if app.config.get("RBAC_SERVER_TIMING", False):
+            from . import timing
+            timing.init_app(app)
 
     @property
     def get_app(self):
@@ -169,9 +181,12 @@ class RBACBuilder(object):
 
         if not self._view_exists(baseview):
             baseview.rbac_builder = self
+            baseview._compile_permission_guards()
             self.baseviews[baseview.class_permission_name] = baseview
             if self.app:
                 self._add_permission(baseview)
+            else:
+                self._pending_views.append(baseview)
         else:
             log.warning(LOGMSG_WAR_RBAC_VIEW_EXISTS.format(baseview.__class__.__name__))
 
@@ -197,6 +212,8 @@ class RBACBuilder(object):
 
         if self.app:
             self._add_permissions_menu(name)
+        else:
+            self._pending_menus.append(name)
 
     def add_menu(
             self,
@@ -249,6 +266,10 @@ class RBACBuilder(object):
             self._add_permissions_menu(name)
             if category:
                 self._add_permissions_menu(category)
+        else:
+            self._pending_menus.append(name)
+            if category:
+                self._pending_menus.append(category)
 
     def add_view_no_menu(self, baseview):
         """
@@ -261,9 +282,12 @@ class RBACBuilder(object):
 
         if not self._view_exists(baseview):
             baseview.rbac_builder = self
+            baseview._compile_permission_guards()
             self.baseviews[baseview.class_permission_name] = baseview
             if self.app:
                 self._add_permission(baseview)
+            else:
+                self._pending_views.append(baseview)
         else:
             log.warning(LOGMSG_WAR_RBAC_VIEW_EXISTS.format(baseview.__class__.__name__))
         return baseview
@@ -284,6 +308,46 @@ class RBACBuilder(object):
             except Exception as e:
                 log.error(LOGMSG_ERR_RBAC_ADD_PERMISSION_MENU.format(str(e)))
 
+    def warmup(self, freeze=True):
+        """
+            Finishes all the registration work up front, call it on the
+            pre-fork master (for example with gunicorn `--preload`, right
+            after registering all views) so workers start with everything
+            built and share its memory pages copy-on-write.
+
+            - Adds the permissions of views and menus registered before
+              the app was set
+            - Builds the BaseView permission metadata and guards
+            - Freezes the menu and sides, see `Menu.freeze`
+            - Loads the security manager permission caches, see
+              `BaseSecurityManager.warmup`
+            - Moves all the objects created so far to the garbage
+              collector permanent generation, so collections in the
+              workers do not touch (and copy) their pages
+
+            :param freeze: If False will not freeze the garbage collector
+        """
+        pending_views, self._pending_views = self._pending_views, []
+        for baseview in pending_views:
+            self._add_permission(baseview)
+        pending_menus, self._pending_menus = self._pending_menus, []
+        for name in dict.fromkeys(pending_menus):
+            self._add_permissions_menu(name)
+
+        for baseview in self.baseviews.values():
+            baseview.get_permission_metadata()
+            if baseview._permission_guards is None:
+                baseview._compile_permission_guards()
+        self.menu.freeze()
+        self.side.freeze()
+
+        self.sm.warmup()
+
+        if freeze:
+            gc.collect()
+            gc.freeze()
+        log.info(LOGMSG_INF_RBAC_WARMUP.format(len(self.baseviews)))
+
     def _check_and_init(self, baseview):
         # If class if not instantiated, instantiate it
         if hasattr(baseview, "__call__"):
@@ -296,6 +360,19 @@ class RBACBuilder(object):
                 return True
         return False
 
+    def security_sync(self):
+        """
+            Adds the permissions of all the registered views and menus,
+            even when the builder was created with update_perms=False.
+            Used by the `flask rbac sync` command
+        """
+        for baseview in self.baseviews.values():
+            self._add_permission(baseview, update_perms=True)
+        menu_names = self.menu.get_flat_name_list() + self.side.get_flat_name_list()
+        for name in dict.fromkeys(menu_names):
+            if name != "-":
+                self._add_permissions_menu(name, update_perms=True)
+
     def security_cleanup(self):
         """
             This method is useful if you have changed
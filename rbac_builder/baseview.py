@@ -1,8 +1,22 @@
 import re
+from typing import Dict, FrozenSet, NamedTuple, Optional, Tuple
 
 from .const import PERMISSION_PREFIX
 
 
+class PermissionMetadata(NamedTuple):
+    """
+        Permission metadata collected once per BaseView class
+    """
+
+    protected_methods: Dict[str, str]
+    """ Method name -> permission name given by has_access/permission_name """
+    previous_method_permission_name: Dict[str, str]
+    """ Attribute name -> permission name before method_permission_name """
+    base_permissions: FrozenSet[str]
+    """ Permissions inferred from the protected methods """
+
+
 class BaseView(object):
     rbac_builder = None
     base_permissions = None
@@ -11,8 +25,12 @@ class BaseView(object):
     method_permission_name = None
     previous_method_permission_name = None
     actions = None
+    _protected_methods = None
+    _permission_guards = None
 
     def __init__(self):
+        metadata = self.get_permission_metadata()
+
         # Init class permission override attrs
         if not self.previous_class_permission_name and self.class_permission_name:
             self.previous_class_permission_name = self.__class__.__name__
@@ -21,29 +39,59 @@ class BaseView(object):
         )
 
         # Init previous permission override attrs
-        is_collect_previous = False
         if not self.previous_method_permission_name and self.method_permission_name:
-            self.previous_method_permission_name = dict()
-            is_collect_previous = True
+            self.previous_method_permission_name = dict(
+                metadata.previous_method_permission_name
+            )
         self.method_permission_name = self.method_permission_name or dict()
 
-        # Collect base_permissions and infer previous permissions
-        is_add_base_permissions = False
+        # Collect base_permissions
         if self.base_permissions is None:
-            self.base_permissions = set()
-            is_add_base_permissions = True
+            self.base_permissions = metadata.base_permissions
+        else:
+            self.base_permissions = frozenset(self.base_permissions)
+        self._protected_methods = metadata.protected_methods
 
-        for attr_name in dir(self):
-            if hasattr(getattr(self, attr_name), "_permission_name"):
-                if is_collect_previous:
-                    self.previous_method_permission_name[attr_name] = getattr(
-                        getattr(self, attr_name), "_permission_name"
-                    )
-                _permission_name = self.get_method_permission(attr_name)
-                if is_add_base_permissions:
-                    self.base_permissions.add(PERMISSION_PREFIX + _permission_name)
+    @classmethod
+    def get_permission_metadata(cls) -> PermissionMetadata:
+        """
+            Returns the permission metadata for this class, collected
+            on first use from the class dictionaries (so properties and
+            descriptors are never evaluated) and cached on the class.
+        """
+        metadata = cls.__dict__.get("_permission_metadata")
+        if metadata is not None:
+            return metadata
 
-        self.base_permissions = list(self.base_permissions)
+        # Walk the MRO from the base, subclasses override their parents
+        attrs = dict()
+        for klass in reversed(cls.__mro__):
+            for attr_name, attr in vars(klass).items():
+                if hasattr(attr, "_permission_name"):
+                    attrs[attr_name] = attr
+                else:
+                    attrs.pop(attr_name, None)
+
+        method_permission_name = cls.method_permission_name or dict()
+        protected_methods = dict()
+        previous_method_permission_name = dict()
+        base_permissions = set()
+        for attr_name in sorted(attrs):
+            attr = attrs[attr_name]
+            protected_methods[attr.__name__] = attr._permission_name
+            previous_method_permission_name[attr_name] = attr._permission_name
+            base_permissions.add(
+                PERMISSION_PREFIX + (
+                        method_permission_name.get(attr_name) or attr._permission_name
+                )
+            )
+        metadata = PermissionMetadata(
+            protected_methods,
+            previous_method_permission_name,
+            frozenset(base_permissions),
+        )
+        cls._permission_metadata = metadata
+        return metadata
 
     def get_method_permission(self, method_name: str) -> str:
         """
@@ -55,6 +103,26 @@ class BaseView(object):
         else:
             return getattr(getattr(self, method_name), "_permission_name")
 
+    def _compile_permission_guards(self) -> Dict[str, Optional[Tuple[str, str]]]:
+        """
+            Resolves once the effective permission and views name of each
+            method protected by `has_access`, keyed by the method name.
+            Methods whose permission is not on `base_permissions` get None.
+
+            Called by RBACBuilder when the views is registered
+        """
+        guards = dict()
+        for method_name, _permission_name in self._protected_methods.items():
+            permission_str = PERMISSION_PREFIX + (
+                    self.method_permission_name.get(method_name) or _permission_name
+            )
+            if permission_str in self.base_permissions:
+                guards[method_name] = (permission_str, self.class_permission_name)
+            else:
+                guards[method_name] = None
+        self._permission_guards = guards
+        return guards
+
     @staticmethod
     def _prettify_name(name):
         """
@@ -0,0 +1,375 @@
+"""Caches for the RBAC data
+
+`LRUCache` is the in process building block. `CacheBackend` is the interface
+the security manager caches are written against, so a cache shared by every
+node (SQLite file, networked cache) can replace the process memory one and
+make a grant change visible everywhere at once.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class LRUCache(object):
+    """
+        Thread safe least recently used cache, bounded by a number of
+        entries and optionally by a total weight (for example the number
+        of grants held by the entries, as a proxy for their memory).
+
+        :param maxsize: Max number of entries
+        :param max_weight: Max total weight of the entries, None for no limit
+        :param weigh: Callable returning the weight of a value, defaults to 1
+    """
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            max_weight: Optional[int] = None,
+            weigh: Callable[[Any], int] = None,
+    ):
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 1)
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                value, _ = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value) -> None:
+        weight = self.weigh(value)
+        with self._lock:
+            if key in self._data:
+                self.weight -= self._data.pop(key)[1]
+            self._data[key] = (value, weight)
+            self.weight += weight
+            self._evict()
+
+    def delete(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return False
+            self.weight -= entry[1]
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def _evict(self):
+        # Always keep the newest entry, even when it is over max_weight alone
+        while len(self._data) > 1 and (
+                len(self._data) > self.maxsize or
+                (self.max_weight is not None and self.weight > self.max_weight)
+        ):
+            _, (_, weight) = self._data.popitem(last=False)
+            self.weight -= weight
+
+
+"""
+---------------
+ CACHE BACKENDS
+---------------
+"""
+
+_MISSING = object()
+
+Entry = Tuple[Any, Optional[float], Tuple[Tuple[str, int], ...]]
+""" (value, expires at or None, ((tag, version), ...)) """
+
+
+class CacheBackend(object):
+    """
+        Interface of the backends holding cached RBAC data. Keys are
+        strings, values JSON serializable objects, read back as decoded
+        JSON (lists for tuples, string keys) unless `json_values` is False.
+
+        Entries expire after their `ttl` seconds, and can be tagged:
+        `bump_version(tag)` invalidates every entry set with `tag` before
+        the bump, without having to know their keys.
+
+        Backends are thread safe, run `CacheBackendConformance` from
+        `rbac_builder.testing` against new ones.
+    """
+
+    clock = staticmethod(time.time)
+    """ Wall clock, so expiry times are shared between processes """
+    json_values = True
+    """ Values are stored as JSON """
+
+    def get(self, key: str, default=None):
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+            Returns the values of the keys found, by key
+        """
+        result = dict()
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                result[key] = value
+        return result
+
+    def set(self, key: str, value, ttl: float = None, tags: Iterable[str] = ()) -> None:
+        raise NotImplementedError
+
+    def set_many(
+            self, values: Dict[str, Any], ttl: float = None, tags: Iterable[str] = ()
+    ) -> None:
+        for key, value in values.items():
+            self.set(key, value, ttl, tags)
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def get_version(self, tag: str) -> int:
+        raise NotImplementedError
+
+    def bump_version(self, tag: str) -> int:
+        """
+            Invalidates the entries tagged with `tag`, returns the new version
+        """
+        raise NotImplementedError
+
+    def _entry(self, value, ttl: Optional[float], tags: Iterable[str]) -> Entry:
+        tags = tuple(sorted(set(tags)))
+        return (
+            value,
+            None if ttl is None else self.clock() + ttl,
+            tuple(zip(tags, self.get_versions(tags))),
+        )
+
+    def get_versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        """
+            Returns the version of each tag
+        """
+        return tuple(self.get_version(tag) for tag in tags)
+
+    def _is_valid(self, entry: Entry) -> bool:
+        _, expires, tag_versions = entry
+        if expires is not None and expires <= self.clock():
+            return False
+        if not tag_versions:
+            return True
+        tags = tuple(tag for tag, _ in tag_versions)
+        return self.get_versions(tags) == tuple(version for _, version in tag_versions)
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+        In process backend on an `LRUCache`, values are returned as set
+        (not copied).
+
+        :param maxsize: Max number of entries
+        :param max_weight: Max total weight of the entries, None for no limit
+        :param weigh: Callable returning the weight of a value, defaults to 1
+    """
+
+    json_values = False
+
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            max_weight: Optional[int] = None,
+            weigh: Callable[[Any], int] = None,
+    ):
+        weigh = weigh or (lambda value: 1)
+        self.lru = LRUCache(maxsize, max_weight, lambda entry: weigh(entry[0]))
+        self._versions: Dict[str, int] = dict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lru)
+
+    def get(self, key: str, default=None):
+        entry = self.lru.get(key)
+        if entry is None:
+            return default
+        if not self._is_valid(entry):
+            self.lru.delete(key)
+            return default
+        return entry[0]
+
+    def set(self, key: str, value, ttl: float = None, tags: Iterable[str] = ()) -> None:
+        self.lru.set(key, self._entry(value, ttl, tags))
+
+    def delete(self, key: str) -> bool:
+        return self.lru.delete(key)
+
+    def clear(self) -> None:
+        self.lru.clear()
+
+    def get_version(self, tag: str) -> int:
+        return self._versions.get(tag, 0)
+
+    def bump_version(self, tag: str) -> int:
+        with self._lock:
+            version = self._versions[tag] = self._versions.get(tag, 0) + 1
+        return version
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+        Backend on a SQLite file, shared by the processes of a host (or
+        by the nodes mounting it). Values are stored as JSON, expired entries are
+        removed when read or by `purge`.
+
+        Stands in for a networked cache: a bump of a tag version or a
+        delete is seen by every process on its next read.
+
+        :param path: The database file, created if needed
+        :param timeout: Seconds to wait on a locked database
+    """
+
+    def __init__(self, path: str, timeout: float = 5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rbac_cache ("
+                "key TEXT PRIMARY KEY, value TEXT, expires REAL, tags TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rbac_cache_version ("
+                "tag TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+            Connection of the current thread, reopened in forked processes
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _load(self, rows) -> Dict[str, Optional[Entry]]:
+        entries = dict()
+        for key, value, expires, tags in rows:
+            try:
+                entries[key] = (
+                    json.loads(value),
+                    expires,
+                    tuple((tag, version) for tag, version in json.loads(tags)),
+                )
+            except (TypeError, ValueError):
+                # Written by another version of the backend
+                entries[key] = None
+        return entries
+
+    def get(self, key: str, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        if not keys:
+            return dict()
+        conn = self._connect()
+        entries = self._load(conn.execute(
+            "SELECT key, value, expires, tags FROM rbac_cache WHERE key IN ({0})".format(
+                ", ".join("?" * len(keys))
+            ),
+            keys,
+        ))
+        result = dict()
+        invalid = []
+        for key, entry in entries.items():
+            if entry is not None and self._is_valid(entry):
+                result[key] = entry[0]
+            else:
+                invalid.append(key)
+        if invalid:
+            with conn:
+                conn.executemany("DELETE FROM rbac_cache WHERE key = ?", [(key,) for key in invalid])
+        return result
+
+    def set(self, key: str, value, ttl: float = None, tags: Iterable[str] = ()) -> None:
+        self.set_many({key: value}, ttl, tags)
+
+    def set_many(
+            self, values: Dict[str, Any], ttl: float = None, tags: Iterable[str] = ()
+    ) -> None:
+        _, expires, tag_versions = self._entry(None, ttl, tags)
+        tag_versions = json.dumps(tag_versions)
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO rbac_cache (key, value, expires, tags) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (key, json.dumps(value), expires, tag_versions)
+                    for key, value in values.items()
+                ],
+            )
+
+    def delete(self, key: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM rbac_cache WHERE key = ?", (key,)).rowcount > 0
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM rbac_cache")
+
+    def purge(self) -> int:
+        """
+            Removes the expired entries, returns their number
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM rbac_cache WHERE expires <= ?", (self.clock(),)
+            ).rowcount
+
+    def get_versions(self, tags: Tuple[str, ...]) -> Tuple[int, ...]:
+        if not tags:
+            return ()
+        versions = dict(self._connect().execute(
+            "SELECT tag, version FROM rbac_cache_version WHERE tag IN ({0})".format(
+                ", ".join("?" * len(tags))
+            ),
+            tags,
+        ))
+        return tuple(versions.get(tag, 0) for tag in tags)
+
+    def get_version(self, tag: str) -> int:
+        return self.get_versions((tag,))[0]
+
+    def bump_version(self, tag: str) -> int:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO rbac_cache_version (tag, version) VALUES (?, 1) "
+                "ON CONFLICT (tag) DO UPDATE SET version = version + 1",
+                (tag,),
+            )
+            return conn.execute(
+                "SELECT version FROM rbac_cache_version WHERE tag = ?", (tag,)
+            ).fetchone()[0]
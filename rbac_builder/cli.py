@@ -0,0 +1,85 @@
+"""Flask CLI commands to maintain the RBAC tables outside the web workers
+
+    $ flask rbac sync
+    $ flask rbac cleanup
+    $ flask rbac converge
+    $ flask rbac plan
+
+Each command reports how long it took and the security tables row counts.
+"""
+import time
+from contextlib import contextmanager
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+rbac_cli = AppGroup("rbac", help="Role based access control maintenance.")
+
+
+def _format_counts(before, after) -> str:
+    return ", ".join(
+        "{0} {1} ({2:+d})".format(table, count, count - before.get(table, 0))
+        for table, count in after.items()
+    )
+
+
+@contextmanager
+def _report(action: str):
+    """
+        Echoes the elapsed time and the row counts changes of the block
+    """
+    sm = current_app.rbac_builder.sm
+    before = sm.get_row_counts()
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    click.echo("{0} finished in {1:.3f}s".format(action, elapsed))
+    click.echo(_format_counts(before, sm.get_row_counts()))
+
+
+def _format_state_transitions(state_transitions) -> str:
+    lines = []
+    for (view_name, permission_name), targets in sorted(state_transitions.get("add", {}).items()):
+        for new_view_name, new_permission_name in sorted(targets):
+            lines.append("  {0}.{1} -> {2}.{3}".format(
+                view_name, permission_name, new_view_name, new_permission_name
+            ))
+    for view_name, permission_name in sorted(state_transitions.get("del_role_pvm", ())):
+        lines.append("  - revoke {0}.{1}".format(view_name, permission_name))
+    for view_name in sorted(state_transitions.get("del_views", ())):
+        lines.append("  - delete view {0}".format(view_name))
+    for permission_name in sorted(state_transitions.get("del_perms", ())):
+        lines.append("  - delete permission {0}".format(permission_name))
+    return "\n".join(lines) or "  No changes"
+
+
+@rbac_cli.command("sync")
+def sync():
+    """Add the permissions of every registered view and menu."""
+    with _report("Sync"):
+        current_app.rbac_builder.security_sync()
+
+
+@rbac_cli.command("cleanup")
+def cleanup():
+    """Remove the permissions of views and menus no longer registered."""
+    with _report("Cleanup"):
+        current_app.rbac_builder.security_cleanup()
+
+
+@rbac_cli.command("converge")
+def converge():
+    """Migrate the grants of renamed views and permissions."""
+    with _report("Converge"):
+        state_transitions = current_app.rbac_builder.security_converge()
+    click.echo(_format_state_transitions(state_transitions))
+
+
+@rbac_cli.command("plan")
+def plan():
+    """Print the converge operations without changing the database."""
+    start = time.perf_counter()
+    state_transitions = current_app.rbac_builder.security_converge(dry=True)
+    click.echo(_format_state_transitions(state_transitions))
+    click.echo("Plan finished in {0:.3f}s".format(time.perf_counter() - start))
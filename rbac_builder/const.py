@@ -1,5 +1,8 @@
 LOGMSG_ERR_SEC_ACCESS_DENIED = "Access is Denied for: {0} on: {1}"
 """ Access denied log message, format with user and views/resource """
+LOGMSG_WAR_SEC_ACCESS_DENIED_AGG = "Access is Denied for: {0} on: {1} to: {2}, {3} times"
+""" Aggregated access denied log message, format with permission, views, identity and count """
+LOGMSG_WAR_SEC_DENIALS_DROPPED = "Dropped {0} access denials, the denial log queue is full"
 LOGMSG_WAR_SEC_LOGIN_FAILED = "Login Failed for user: {0}"
 LOGMSG_ERR_SEC_CREATE_DB = "DB Creation and initialization failed: {0}"
 """ security models creation fails, format with error message """
@@ -34,6 +37,10 @@ LOGMSG_ERR_SEC_ADD_PERMROLE = "Add Permission to Role Error: {0}"
 """ Error adding permission to role, format with err message """
 LOGMSG_ERR_SEC_DEL_PERMROLE = "Remove Permission to Role Error: {0}"
 """ Error deleting permission to role, format with err message """
+LOGMSG_WAR_SEC_UNKNOWN_ROLES = "Skipped the grants of unknown roles: {0}"
+""" Warning on grants set on role ids that do not exist, format with the ids """
+LOGMSG_WAR_SEC_UNKNOWN_PERMVIEWS = "Skipped the grants of unknown permission views: {0}"
+""" Warning on grants of permission view ids that do not exist, format with the ids """
 LOGMSG_ERR_SEC_ADD_REGISTER_USER = "Add Register User Error: {0}"
 """ Error adding registered user, format with err message """
 LOGMSG_ERR_SEC_DEL_REGISTER_USER = "Remove Register User Error: {0}"
@@ -66,10 +73,23 @@ format with permission views class string and role name """
 LOGMSG_INF_SEC_DEL_PERMROLE = "Removed Permission {0} to role {1}"
 """ Info when deleting permission to role,
 format with permission views class string and role name """
+LOGMSG_INF_SEC_UPD_PERMROLE = "Updated permissions of role {0}: {1} added, {2} removed"
+""" Info when bulk updating permissions of a role,
+format with role id, number of added and removed permissions """
 LOGMSG_INF_SEC_ADD_ROLE = "Inserted Role: {0}"
 """ Info when added role, format with role name """
 LOGMSG_INF_SEC_NO_DB = "Security DB not found Creating all Models from Base"
 LOGMSG_INF_SEC_ADD_DB = "Security DB Created"
+LOGMSG_INF_SEC_UPD_DB = "Security DB schema stamped with version {0}"
+""" Security tables created or upgraded, format with schema version """
+LOGMSG_INF_SEC_ADD_COLUMN = "Added column {1} to security table {0}"
+""" Column added on upgrade, format with table and column names """
+LOGMSG_INF_SEC_ADD_INDEX = "Added index {1} to security table {0}"
+""" Index added on upgrade, format with table and index names """
+LOGMSG_INF_SEC_DEL_ROLE_NAME_UNIQUE = "Dropped the unique constraint on role names"
+""" Role names made unique per tenant on upgrade """
+LOGMSG_INF_SEC_DEL_ORPHAN_GRANTS = "Deleted {0} grants of deleted roles"
+""" Orphan grants purged on upgrade, format with the number of grants """
 LOGMSG_INF_SEC_ADD_USER = "Added user {0}"
 """ User added, format with username """
 LOGMSG_INF_SEC_UPD_USER = "Updated user {0}"
@@ -78,6 +98,12 @@ LOGMSG_INF_SEC_UPD_ROLE = "Updated role {0}"
 """ Role updated, format with role name """
 LOGMSG_ERR_SEC_UPD_ROLE = "An error occurred updating role {0}"
 """ Role updated Error, format with role name """
+LOGMSG_INF_SEC_LOAD_SNAPSHOT = "Loaded RBAC snapshot {0}"
+""" Snapshot loaded, format with snapshot path """
+LOGMSG_ERR_SEC_LOAD_SNAPSHOT = "Could not load RBAC snapshot {0}: {1}"
+""" Snapshot load error, format with snapshot path and err message """
+LOGMSG_WAR_SEC_READ_ONLY = "Refused to {0}, the security manager is read only"
+""" Write attempted on a read only security manager, format with operation """
 
 LOGMSG_INF_RBAC_ADDON_ADDED = "Registered AddOn: {0}"
 """ Addon imported and registered """
@@ -114,7 +140,26 @@ LOGMSG_WAR_DBI_DEL_INTEGRITY = "Delete record integrity error: {0}"
 
 LOGMSG_INF_RBAC_ADD_VIEW = "Registering class {0} on menu {1}"
 """ Inform that views class was added, format with class name, name"""
+LOGMSG_INF_RBAC_WARMUP = "RBAC warmup done for {0} views"
+""" Inform that warmup finished, format with the number of views """
+LOGMSG_INF_RBAC_TIMINGS = "RBAC timings {0} {1}: {2}"
+""" Per request RBAC timings, format with method, path and name=ms/calls/statements """
 
 FLAMSG_ERR_SEC_ACCESS_DENIED = "Access is Denied"
 
 PERMISSION_PREFIX = "can_"
+
+SECURITY_SCHEMA_VERSION = 4
+""" Version of the security tables, bump when they change """
+
+CHANGE_CREATE = "create"
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+CHANGE_GRANT = "grant"
+CHANGE_REVOKE = "revoke"
+""" Operations recorded on the RBAC change log """
+CHANGE_TARGET_ROLE = "role"
+CHANGE_TARGET_PERMISSION = "permission"
+CHANGE_TARGET_VIEW_MENU = "view_menu"
+CHANGE_TARGET_PERMISSION_VIEW = "permission_view"
+""" Objects changed on the RBAC change log, grants and revokes target roles """
@@ -1,9 +1,22 @@
-from typing import List
+import json
+from typing import Dict, List
 
 from flask import current_app
 
+from .timing import timed
+
+_SEPARATOR = 0
+_CATEGORY = 1
+_ITEM = 2
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
 
 class MenuItem(object):
+    __slots__ = ("name", "href", "icon", "label", "childs", "baseview")
+
     def __init__(self, name, href="", icon="", label="", childs=None, baseview=None):
         self.name = name
         self.href = href
@@ -22,10 +35,141 @@ class MenuItem(object):
         }
 
 
+class MenuSkeleton(object):
+    """
+        Frozen, compact form of a menu tree.
+
+        Nodes are numbered in pre-order and stored in parallel tuples
+        (name, kind, children indexes), each with a pre-built fragment:
+        the node dict without its childs and its JSON serialization.
+        Rendering for a request only tests each node name against the
+        set of allowed menus and stitches the fragments together.
+
+        Labels that are not plain strings (for example lazy translated
+        strings) are kept as is and converted on each render.
+    """
+
+    __slots__ = (
+        "roots",
+        "names",
+        "kinds",
+        "children",
+        "labels",
+        "fragments",
+        "json_fragments",
+        "menu_names",
+    )
+
+    def __init__(self, items: List[MenuItem]):
+        self.names = []
+        self.kinds = []
+        self.children = []
+        self.labels = []
+        self.fragments = []
+        self.json_fragments = []
+        self.roots = self._add_nodes(items)
+        self.names = tuple(self.names)
+        self.kinds = tuple(self.kinds)
+        self.children = tuple(self.children)
+        self.labels = tuple(self.labels)
+        self.fragments = tuple(self.fragments)
+        self.json_fragments = tuple(self.json_fragments)
+        self.menu_names = list(dict.fromkeys(
+            name for name, kind in zip(self.names, self.kinds) if kind != _SEPARATOR
+        ))
+
+    def _add_nodes(self, items: List[MenuItem]) -> tuple:
+        indexes = []
+        for i, item in enumerate(items):
+            if not item:
+                continue
+            index = len(self.names)
+            indexes.append(index)
+            self.names.append(item.name)
+            self.children.append(())
+            if item.name == '-' and not i == len(items) - 1:
+                self.kinds.append(_SEPARATOR)
+                self.labels.append(None)
+                self.fragments.append(None)
+                self.json_fragments.append(_dumps('-'))
+                continue
+            label = item.label
+            if isinstance(label, str):
+                self.labels.append(None)
+            else:
+                self.labels.append(label)
+                label = ""
+            fragment = {"name": item.name, "icon": item.icon, "label": label}
+            if item.childs:
+                self.kinds.append(_CATEGORY)
+            else:
+                self.kinds.append(_ITEM)
+                fragment["url"] = item.href
+            self.fragments.append(fragment)
+            self.json_fragments.append(self._json_fragment(fragment, item.childs))
+            if item.childs:
+                self.children[index] = self._add_nodes(item.childs)
+        return tuple(indexes)
+
+    @staticmethod
+    def _json_fragment(fragment: Dict, childs) -> str:
+        """
+            The node JSON, categories are left open: '{...,"childs":['
+        """
+        if childs:
+            return _dumps(fragment)[:-1] + ',"childs":['
+        return _dumps(fragment)
+
+    def _fragment(self, index: int) -> Dict:
+        fragment = dict(self.fragments[index])
+        if self.labels[index] is not None:
+            fragment["label"] = str(self.labels[index])
+        return fragment
+
+    def render(self, allowed, nodes: tuple = None) -> List:
+        """
+            Returns the menu data visible with the `allowed` menu names
+
+            :param allowed: Set of menu names the user has menu_access on
+            :param nodes: Node indexes to render, defaults to the roots
+        """
+        result = []
+        for index in self.roots if nodes is None else nodes:
+            kind = self.kinds[index]
+            if kind == _SEPARATOR:
+                result.append('-')
+            elif self.names[index] in allowed:
+                fragment = self._fragment(index)
+                if kind == _CATEGORY:
+                    fragment["childs"] = self.render(allowed, self.children[index])
+                result.append(fragment)
+        return result
+
+    def render_json(self, allowed, nodes: tuple = None) -> str:
+        """
+            Same as `render` but stitches the pre-serialized JSON fragments
+        """
+        parts = []
+        for index in self.roots if nodes is None else nodes:
+            kind = self.kinds[index]
+            if kind == _SEPARATOR:
+                parts.append(self.json_fragments[index])
+            elif self.names[index] in allowed:
+                if self.labels[index] is None:
+                    part = self.json_fragments[index]
+                else:
+                    part = self._json_fragment(self._fragment(index), kind == _CATEGORY)
+                if kind == _CATEGORY:
+                    part += self.render_json(allowed, self.children[index])[1:-1] + "]}"
+                parts.append(part)
+        return "[" + ",".join(parts) + "]"
+
+
 class Menu(object):
     def __init__(self):
         self.menu = []
         self.group = None
+        self._skeleton = None
 
     def get_list(self):
         return self.menu
@@ -39,35 +183,45 @@ class Menu(object):
                 result.extend(self.get_flat_name_list(menu=item.childs))
         return result
 
-    def get_data(self, menu=None):
-        menu = menu or self.menu
-        ret_list = []
+    def freeze(self) -> MenuSkeleton:
+        """
+            Compiles the menu into a `MenuSkeleton`, reused by every render
+            until the menu changes. Called by `RBACBuilder.warmup`, or
+            lazily by the first render.
 
-        allowed_menus = current_app.rbac_builder.sm.get_user_menu_access(
-            self.get_flat_name_list()
-        )
+            Menus changed without the `Menu` methods (editing
+            MenuItem.childs directly) must call `unfreeze`.
+        """
+        if self._skeleton is None:
+            self._skeleton = MenuSkeleton(self.menu)
+        return self._skeleton
 
-        for i, item in enumerate(menu):
-            if item and item.name == '-' and not i == len(menu) - 1:
-                ret_list.append('-')
-            elif item and item.name not in allowed_menus:
-                continue
-            elif item and item.childs:
-                ret_list.append({
-                    "name": item.name,
-                    "icon": item.icon,
-                    "label": str(item.label),
-                    "childs": self.get_data(menu=item.childs)
-                })
-            else:
-                if item:
-                    ret_list.append({
-                        "name": item.name,
-                        "icon": item.icon,
-                        "label": str(item.label),
-                        "url": item.href
-                    })
-        return ret_list
+    def unfreeze(self):
+        self._skeleton = None
+
+    def _get_skeleton(self, menu=None) -> MenuSkeleton:
+        if not menu or menu is self.menu:
+            return self.freeze()
+        return MenuSkeleton(menu)
+
+    def get_data(self, menu=None):
+        with timed("menu"):
+            skeleton = self._get_skeleton(menu)
+            allowed_menus = current_app.rbac_builder.sm.get_user_menu_access(
+                skeleton.menu_names
+            )
+            return skeleton.render(allowed_menus)
+
+    def get_json(self, menu=None) -> str:
+        """
+            Same as `get_data` already serialized to JSON
+        """
+        with timed("menu"):
+            skeleton = self._get_skeleton(menu)
+            allowed_menus = current_app.rbac_builder.sm.get_user_menu_access(
+                skeleton.menu_names
+            )
+            return skeleton.render_json(allowed_menus)
 
     def find(self, name, menu=None):
         """
@@ -87,6 +241,7 @@ class Menu(object):
                         return ret_item
 
     def add_category(self, category, icon="", label="", parent_category=""):
+        self._skeleton = None
         label = label or category
         if parent_category == "":
             self.menu.append(MenuItem(name=category, icon=icon, label=label))
@@ -107,6 +262,7 @@ class Menu(object):
             parent_category="",
             baseview=None,
     ):
+        self._skeleton = None
         label = label or name
         category_label = category_label or category
         if category == "":
@@ -132,6 +288,7 @@ class Menu(object):
                 self.find(category).childs.append(new_menu_item)
 
     def add_separator(self, category=""):
+        self._skeleton = None
         menu_item = self.find(category)
         if menu_item:
             menu_item.childs.append(MenuItem("-"))
@@ -141,6 +298,8 @@ class Menu(object):
 
 
 class SideItem(object):
+    __slots__ = ("name", "href", "label", "items")
+
     def __init__(self, name, href="", label="", items=None):
         self.name = name
         self.href = href
@@ -165,6 +324,8 @@ class Side(object):
     def __init__(self, menu):
         self.side = {}
         self.menu = menu
+        # (menu skeleton, {side name: skeleton of its items}, menu names)
+        self._frozen = None
 
     @property
     def get_side(self):
@@ -189,6 +350,7 @@ class Side(object):
             label=""
     ):
         if name not in self.side:
+            self._frozen = None
             self.side[name] = SideItem(name, href, label, [])
 
     def add_menu_to_side(
@@ -197,21 +359,60 @@ class Side(object):
             menu
     ):
         if name in self.side:
+            self._frozen = None
             self.side[name].items.append(menu)
 
+    def freeze(self):
+        """
+            Compiles the menu items of every side, see `Menu.freeze`.
+            Rebuilt when the sides or the menu change.
+        """
+        menu_skeleton = self.menu.freeze()
+        if self._frozen is None or self._frozen[0] is not menu_skeleton:
+            skeletons = {
+                name: self.menu._get_skeleton(side.items)
+                for name, side in self.side.items()
+            }
+            names = self.get_flat_name_list()
+            for skeleton in skeletons.values():
+                names.extend(skeleton.menu_names)
+            self._frozen = (menu_skeleton, skeletons, list(dict.fromkeys(names)))
+        return self._frozen
+
+    def _get_allowed(self):
+        """
+            Resolves the sides and their menus access with a single query
+        """
+        _, skeletons, names = self.freeze()
+        allowed = current_app.rbac_builder.sm.get_user_menu_access(names)
+        return skeletons, allowed
+
     def get_data(self):
-        ret_object = {}
-
-        allowed_sides = current_app.rbac_builder.sm.get_user_menu_access(
-            self.get_flat_name_list()
-        )
-
-        for side in allowed_sides:
-            if side in self.side:
-                ret_object[side] = {
-                    'name': self.side[side].name,
-                    'href': self.side[side].href,
-                    'label': self.side[side].label,
-                    'items': self.menu.get_data(self.side[side].items)
-                }
-        return ret_object
+        with timed("menu"):
+            ret_object = {}
+            skeletons, allowed = self._get_allowed()
+            for name, side in self.side.items():
+                if name in allowed:
+                    ret_object[name] = {
+                        'name': side.name,
+                        'href': side.href,
+                        'label': side.label,
+                        'items': skeletons[name].render(allowed)
+                    }
+            return ret_object
+
+    def get_json(self) -> str:
+        """
+            Same as `get_data` already serialized to JSON
+        """
+        with timed("menu"):
+            skeletons, allowed = self._get_allowed()
+            parts = []
+            for name, side in self.side.items():
+                if name in allowed:
+                    parts.append(
+                        _dumps(name) + ":"
+                        + _dumps({'name': side.name, 'href': side.href, 'label': str(side.label)})[:-1]
+                        + ',"items":' + skeletons[name].render_json(allowed) + "}"
+                    )
+            return "{" + ",".join(parts) + "}"
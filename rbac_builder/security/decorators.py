@@ -1,15 +1,24 @@
+import asyncio
+import contextvars
 import functools
-import logging
-
-from flask_jwt_extended import verify_jwt_in_request
+import inspect
 
 from ..const import (
     FLAMSG_ERR_SEC_ACCESS_DENIED,
-    LOGMSG_ERR_SEC_ACCESS_DENIED,
     PERMISSION_PREFIX
 )
+from ..timing import timed
 
-from flask import current_app
+
+def verify_jwt_in_request(*args, **kwargs):
+    """
+        Imports flask_jwt_extended on first use and replaces itself with
+        its `verify_jwt_in_request`, so declaring protected views does not
+        import flask_jwt_extended.
+    """
+    global verify_jwt_in_request
+    from flask_jwt_extended import verify_jwt_in_request
+    return verify_jwt_in_request(*args, **kwargs)
 
 
 def has_access(f):
@@ -18,6 +27,10 @@ def has_access(f):
         Permissions will be associated to a role, and roles are associated to users.
 
         By default the permission's name is the methods name.
+
+        Coroutine functions are supported: the check runs on the security
+        manager `check_executor` thread pool, with a copy of the request
+        context, so the event loop is not blocked by the database lookups.
     """
 
     if hasattr(f, '_permission_name'):
@@ -25,31 +38,61 @@ def has_access(f):
     else:
         permission_str = f.__name__
 
-    def wraps(self, *args, **kwargs):
-        verify_jwt_in_request()
-        permission_str = "{}{}".format(PERMISSION_PREFIX, f._permission_name)
-        if self.method_permission_name:
-            _permission_name = self.method_permission_name.get(f.__name__)
-            if _permission_name:
-                permission_str = "{}{}".format(PERMISSION_PREFIX, _permission_name)
-        if (permission_str in self.base_permissions and
-                self.rbac_builder.sm.has_access(
-                    permission_str,
-                    self.class_permission_name
-                )):
-            return f(self, *args, **kwargs)
+    method_name = f.__name__
+
+    def check(self):
+        """
+            Returns None when access is granted, else the 403 response
+        """
+        with timed("verify_jwt"):
+            verify_jwt_in_request()
+        guards = self._permission_guards
+        if guards is None:
+            guards = self._compile_permission_guards()
+        guard = guards.get(method_name)
+        if guard and self.rbac_builder.sm.has_access(*guard):
+            return None
         else:
-            logging.warning(
-                LOGMSG_ERR_SEC_ACCESS_DENIED.format(
-                    permission_str,
-                    self.__class__.__name__
-                )
+            from flask_jwt_extended import get_jwt_identity
+            identity = get_jwt_identity()
+            self.rbac_builder.sm.denial_logger.record(
+                guard[0] if guard else PERMISSION_PREFIX + (
+                        self.method_permission_name.get(method_name) or
+                        f._permission_name
+                ),
+                self.__class__.__name__,
+                None if identity is None else str(identity),
             )
             response_object = {
                 'message': FLAMSG_ERR_SEC_ACCESS_DENIED,
             }
             return response_object, 403
 
+    def check_in_worker(self):
+        try:
+            return check(self)
+        finally:
+            self.rbac_builder.sm.release_thread_resources()
+
+    if inspect.iscoroutinefunction(f):
+        async def wraps(self, *args, **kwargs):
+            denied = await asyncio.get_running_loop().run_in_executor(
+                self.rbac_builder.sm.check_executor,
+                contextvars.copy_context().run,
+                check_in_worker,
+                self,
+            )
+            self.rbac_builder.sm.adopt_current_user()
+            if denied is not None:
+                return denied
+            return await f(self, *args, **kwargs)
+    else:
+        def wraps(self, *args, **kwargs):
+            denied = check(self)
+            if denied is not None:
+                return denied
+            return f(self, *args, **kwargs)
+
     f._permission_name = permission_str
     return functools.update_wrapper(wraps, f)
 
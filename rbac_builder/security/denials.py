@@ -0,0 +1,130 @@
+"""Access denial logging off the request path
+
+Requests hand their denials to `DenialLogger`, a background thread logs
+them aggregated per (permission, views, identity) and time window.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from ..const import LOGMSG_WAR_SEC_ACCESS_DENIED_AGG, LOGMSG_WAR_SEC_DENIALS_DROPPED
+
+log = logging.getLogger(__name__)
+
+_STOP = object()
+_FLUSH = object()
+
+
+class DenialLogger(object):
+    """
+        Logs access denials from a background thread. Requests only
+        enqueue the denial, repeats of the same (permission, views,
+        identity) are counted and logged as one record per `window`
+        seconds, so denial storms do not flood the logs or slow down 403s.
+
+        The thread is started on the first denial, and again in forked
+        workers. Denials are dropped (and counted) when the queue is full.
+
+        :param window: Seconds the repeats are aggregated for
+        :param maxsize: Max denials waiting on the queue
+    """
+
+    def __init__(self, window: float = 10, maxsize: int = 10000):
+        self.window = window
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._counts: Dict[Tuple[str, str, Optional[str]], int] = dict()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def record(self, permission_name: str, view_name: str, identity=None) -> None:
+        """
+            Enqueues a denial, called from the request thread
+        """
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put_nowait((permission_name, view_name, identity))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self, timeout: float = None) -> None:
+        """
+            Logs the denials aggregated so far and waits for it
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait(timeout)
+
+    def stop(self) -> None:
+        """
+            Logs the pending denials and stops the thread
+        """
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+        self._pid = None
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.stop)
+            # A forked worker inherits the queue but not the thread
+            self._queue = queue.Queue(self._queue.maxsize)
+            self._counts = dict()
+            self._thread = threading.Thread(
+                target=self._run, name="rbac-denial-logger", daemon=True
+            )
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.window
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._emit()
+                return
+            if isinstance(item, tuple) and item[0] is _FLUSH:
+                self._emit()
+                item[1].set()
+            elif item is not None:
+                self._counts[item] = self._counts.get(item, 0) + 1
+            if time.monotonic() >= deadline:
+                self._emit()
+                deadline = time.monotonic() + self.window
+
+    def _emit(self) -> None:
+        counts, self._counts = self._counts, dict()
+        with self._lock:
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            log.warning(LOGMSG_WAR_SEC_DENIALS_DROPPED.format(dropped))
+        for (permission_name, view_name, identity), count in counts.items():
+            log.warning(
+                LOGMSG_WAR_SEC_ACCESS_DENIED_AGG.format(
+                    permission_name, view_name, identity, count
+                ),
+                extra={
+                    "rbac_denial": {
+                        "permission": permission_name,
+                        "view": view_name,
+                        "identity": identity,
+                        "count": count,
+                    }
+                },
+            )
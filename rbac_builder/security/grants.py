@@ -0,0 +1,292 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from rbac_builder import const as c
+from ..cache import CacheBackend, MemoryCacheBackend
+
+Grants = Dict[Tuple[str, str], str]
+""" {(views name, permission name): permission view id} """
+TenantGrants = Dict[str, Grants]
+""" role id -> grants of the role """
+
+
+def _count_grants(grants: Dict) -> int:
+    return len(grants) or 1
+
+
+GRANTS_TAG = "rbac:grants"
+""" Tag of every cached grants entry, bumped when permission views are deleted """
+
+
+def _count_tenant_grants(grants: TenantGrants) -> int:
+    return sum(len(role_grants) for role_grants in grants.values()) or 1
+
+
+def _encode_grants(grants: Grants) -> List[List[str]]:
+    return [
+        [view_name, permission_name, permission_view_id]
+        for (view_name, permission_name), permission_view_id in grants.items()
+    ]
+
+
+def _decode_grants(rows: List[List[str]]) -> Grants:
+    return {
+        (view_name, permission_name): permission_view_id
+        for view_name, permission_name, permission_view_id in rows
+    }
+
+
+class GrantsCache(object):
+    """
+        Grants loaded from the security manager on first use and kept in
+        an LRU bounded by a number of entries and a total number of grants,
+        or in a shared `CacheBackend`.
+
+        Entries are evicted when the change log records a change on them,
+        the change log is polled at most once every `refresh_interval`
+        seconds. The last `overlap` sequence numbers are read again on each
+        poll, so changes committed after a later one are not missed.
+        Deleted permissions and views invalidate every entry through the
+        `GRANTS_TAG` version. The last applied sequence number is kept in
+        the backend, so a process sharing it resumes from the changes no
+        process applied yet.
+
+        :param backend: A shared backend, defaults to a private in memory one
+        :param ttl: Seconds the entries are kept, None for no expiry
+    """
+
+    namespace = "grants"
+    """ Prefix of the keys, so caches can share a backend """
+    overlap = 1000
+    """ Change log sequence numbers read again before the last one applied """
+
+    def __init__(
+            self,
+            security_manager,
+            maxsize: int = 1024,
+            max_grants: int = None,
+            refresh_interval: float = 5,
+            backend: Optional[CacheBackend] = None,
+            ttl: Optional[float] = 300,
+    ):
+        self.security_manager = security_manager
+        self.cache = backend or MemoryCacheBackend(maxsize, max_grants, self._weigh_value)
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._last_seq = None
+        self._applied = set()
+        self._next_refresh = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def weigh(grants) -> int:
+        return _count_grants(grants)
+
+    @staticmethod
+    def encode(grants):
+        return _encode_grants(grants)
+
+    @staticmethod
+    def decode(value):
+        return _decode_grants(value)
+
+    def _weigh_value(self, value) -> int:
+        if isinstance(value, dict):
+            return self.weigh(value)
+        # The change log cursor
+        return 1
+
+    def key(self, key: Hashable) -> str:
+        return "{0}:{1!r}".format(self.namespace, key)
+
+    @property
+    def cursor_key(self) -> str:
+        return "{0}#last_seq".format(self.namespace)
+
+    @property
+    def generation_tag(self) -> str:
+        """
+            Version bumped by every eviction of the namespace, checked
+            around the loads
+        """
+        return "{0}#generation".format(self.namespace)
+
+    def evict(self, change) -> None:
+        """
+            Evicts the entries affected by a change log `RBACChange`
+        """
+        raise NotImplementedError
+
+    def _set(self, key: Hashable, grants) -> None:
+        cache_key = self.key(key)
+        if self.cache.json_values:
+            grants = self.encode(grants)
+        self.cache.set(cache_key, grants, self.ttl, (GRANTS_TAG,))
+
+    def _get_many(self, keys: List[Hashable]) -> Dict:
+        """
+            Returns the cached grants of `keys`, by key
+        """
+        cached = self.cache.get_many([self.key(key) for key in keys])
+        result = dict()
+        for key in keys:
+            grants = cached.get(self.key(key))
+            if grants is not None:
+                result[key] = self.decode(grants) if self.cache.json_values else grants
+        return result
+
+    def _delete(self, key: Hashable) -> None:
+        """
+            Evicts an entry, bumping the namespace generation first so a
+            load running concurrently does not cache it again
+        """
+        self.cache.bump_version(self.generation_tag)
+        self.cache.delete(self.key(key))
+
+    def _load(self, keys: List[Hashable], load: Callable[[List[Hashable]], Dict]) -> Dict:
+        """
+            Loads the grants of `keys` with `load` and caches them. When
+            an entry of the namespace was evicted while loading, the loaded
+            entries are dropped again: one version per namespace keeps the
+            version store bounded, at the cost of a reload on such races
+        """
+        tags = (GRANTS_TAG, self.generation_tag)
+        versions = self.cache.get_versions(tags)
+        loaded = load(keys)
+        for key in keys:
+            self._set(key, loaded[key])
+        if self.cache.get_versions(tags) != versions:
+            for key in keys:
+                self.cache.delete(self.key(key))
+        return loaded
+
+    def refresh(self, force: bool = False) -> None:
+        """
+            Evicts the entries changed since the last refresh
+        """
+        now = time.monotonic()
+        if not force and now < self._next_refresh:
+            return
+        with self._lock:
+            if not force and now < self._next_refresh:
+                return
+            self._next_refresh = now + self.refresh_interval
+            stored_seq = self.cache.get(self.cursor_key)
+            cursors = [seq for seq in (stored_seq, self._last_seq) if seq is not None]
+            if cursors:
+                last_seq = max(cursors)
+            else:
+                # No process recorded its progress in the backend, its
+                # entries can be older than any change still in the log
+                self.cache.bump_version(GRANTS_TAG)
+                last_seq = self.security_manager.get_last_change_seq()
+            first = self._last_seq is None
+            changes = []
+            for change in self.security_manager.get_changes_since(
+                    max(last_seq - self.overlap, 0)
+            ):
+                if change.seq in self._applied:
+                    continue
+                if first and change.seq <= last_seq:
+                    # Applied before this cache started
+                    self._applied.add(change.seq)
+                else:
+                    changes.append(change)
+            for change in changes:
+                self.evict(change)
+            if any(
+                    change.operation == c.CHANGE_DELETE and
+                    change.target != c.CHANGE_TARGET_ROLE
+                    for change in changes
+            ):
+                self.cache.bump_version(GRANTS_TAG)
+            if changes:
+                last_seq = max(last_seq, changes[-1].seq)
+            self._last_seq = last_seq
+            if stored_seq != last_seq:
+                self.cache.set(self.cursor_key, last_seq)
+            floor = last_seq - self.overlap
+            self._applied = {
+                seq for seq in self._applied.union(change.seq for change in changes)
+                if seq > floor
+            }
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+
+class TenantPermissionCache(GrantsCache):
+    """
+        Grants of the roles of each tenant, loaded the first time the
+        tenant is used. The global roles (without a tenant) are cached
+        under the None key.
+    """
+
+    namespace = "tenant"
+    weigh = staticmethod(_count_tenant_grants)
+
+    @staticmethod
+    def encode(grants: TenantGrants):
+        return {role_id: _encode_grants(role_grants) for role_id, role_grants in grants.items()}
+
+    @staticmethod
+    def decode(value) -> TenantGrants:
+        return {role_id: _decode_grants(rows) for role_id, rows in value.items()}
+
+    def evict(self, change) -> None:
+        if change.target == c.CHANGE_TARGET_ROLE:
+            self._delete(change.tenant)
+
+    def get(self, tenant: str = None) -> TenantGrants:
+        """
+            Returns the grants of the roles of `tenant`, None for the
+            global roles
+        """
+        self.refresh()
+        grants = self._get_many([tenant]).get(tenant)
+        if grants is None:
+            grants = self._load(
+                [tenant],
+                lambda keys: {tenant: self.security_manager.find_tenant_grants(tenant)},
+            )[tenant]
+        return grants
+
+
+class RolePermissionCache(GrantsCache):
+    """
+        Grants of each role, loaded the first time the role is seen. Only
+        the working set of active roles is kept in memory, a user's
+        effective grants are the union of their roles grants.
+    """
+
+    namespace = "role"
+
+    def evict(self, change) -> None:
+        if change.target == c.CHANGE_TARGET_ROLE:
+            self._delete(change.role_id)
+
+    def get_many(self, role_ids: Iterable[str]) -> List[Grants]:
+        """
+            Returns the grants of each role, loading the missing roles
+            with a single query
+        """
+        self.refresh()
+        role_ids = [role_id for role_id in role_ids if role_id is not None]
+        cached = self._get_many(role_ids)
+        result = []
+        missing = []
+        for role_id in role_ids:
+            grants = cached.get(role_id)
+            if grants is None:
+                missing.append(role_id)
+            else:
+                result.append(grants)
+        if missing:
+            loaded = self._load(missing, self._find_role_grants)
+            result.extend(loaded[role_id] for role_id in missing)
+        return result
+
+    def _find_role_grants(self, role_ids: List[str]) -> Dict[str, Grants]:
+        loaded = self.security_manager.find_role_grants(role_ids)
+        return {role_id: loaded.get(role_id, {}) for role_id in role_ids}
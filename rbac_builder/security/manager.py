@@ -1,14 +1,39 @@
 import logging
-from typing import List, Dict, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
-from flask_jwt_extended import current_user
+from flask_jwt_extended import current_user, get_jwt
 
 from rbac_builder import const as c
 from ..base_manager import BaseManager
+from ..cache import CacheBackend
+from ..timing import timed
+from .denials import DenialLogger
+from .grants import Grants, RolePermissionCache, TenantGrants, TenantPermissionCache
 
 log = logging.getLogger(__name__)
 
 
+class RBACChange(NamedTuple):
+    """
+        A change recorded on the RBAC change log, see
+        `BaseSecurityManager.get_changes_since`
+    """
+
+    seq: int
+    operation: str
+    """ One of the const.CHANGE_* operations """
+    target: str
+    """ One of the const.CHANGE_TARGET_* objects """
+    role_id: Optional[str]
+    tenant: Optional[str]
+    permission_view_id: Optional[str]
+    name: Optional[str]
+    """ Name of the role, permission or views menu """
+    permission_name: Optional[str]
+    view_menu_name: Optional[str]
+
+
 class AbstractSecurityManager(BaseManager):
     """
         Abstract SecurityManager class, declares all methods used by the
@@ -71,6 +96,34 @@ class BaseSecurityManager(AbstractSecurityManager):
         # Base Security Config
         app.config.setdefault("AUTH_ROLE_ADMIN", "Super Admin")
         app.config.setdefault("AUTH_ROLE_PUBLIC", "Public")
+        # JWT claim with the role ids of the user, None loads the user roles
+        app.config.setdefault("RBAC_ROLE_IDS_CLAIM", None)
+        # Server-Timing header and log line with the RBAC cost of each request
+        app.config.setdefault("RBAC_SERVER_TIMING", False)
+        # Seconds the repeated access denials are aggregated for
+        app.config.setdefault("RBAC_DENIAL_LOG_WINDOW", 10)
+        # Threads running the access checks of async views
+        app.config.setdefault("RBAC_ASYNC_CHECK_WORKERS", 8)
+        self._check_executor = None
+        self.denial_logger = DenialLogger(window=app.config["RBAC_DENIAL_LOG_WINDOW"])
+        # Per tenant grants cache, tenants and total grants held, refresh seconds
+        app.config.setdefault("RBAC_TENANT_CACHE_SIZE", 1024)
+        app.config.setdefault("RBAC_TENANT_CACHE_MAX_GRANTS", None)
+        app.config.setdefault("RBAC_TENANT_CACHE_REFRESH", 5)
+        # Per role grants cache for the access checks, off by default
+        app.config.setdefault("RBAC_ROLE_CACHE", False)
+        app.config.setdefault("RBAC_ROLE_CACHE_SIZE", 10000)
+        app.config.setdefault("RBAC_ROLE_CACHE_MAX_GRANTS", None)
+        app.config.setdefault("RBAC_ROLE_CACHE_REFRESH", 5)
+        # Shared CacheBackend (or factory called with the app) for the
+        # grants caches, None keeps them in process memory
+        app.config.setdefault("RBAC_CACHE_BACKEND", None)
+        # Seconds the cached grants are kept, None for no expiry
+        app.config.setdefault("RBAC_CACHE_TTL", 300)
+        self._cache_backend = None
+        self._role_ids_loader = None
+        self._tenant_cache = None
+        self._role_cache = None
 
         # Setup Flask-Jwt-Extended
         self.jwt_manager = self.rbac_builder.get_jwt_manager
@@ -93,6 +146,41 @@ class BaseSecurityManager(AbstractSecurityManager):
     def register_views(self):
         pass
 
+    def warmup(self):
+        """
+            Called by `RBACBuilder.warmup` on the pre-fork master, load
+            any permission caches here so workers inherit them
+        """
+        pass
+
+    @property
+    def check_executor(self) -> ThreadPoolExecutor:
+        """
+            Bounded thread pool running the access checks of async views,
+            created on first use so forked workers get their own
+        """
+        if self._check_executor is None:
+            self._check_executor = ThreadPoolExecutor(
+                max_workers=self.rbac_builder.get_app.config["RBAC_ASYNC_CHECK_WORKERS"],
+                thread_name_prefix="rbac-check",
+            )
+        return self._check_executor
+
+    def release_thread_resources(self):
+        """
+            Called on a `check_executor` thread after each check, release
+            the resources held by the thread (database sessions) here
+        """
+        pass
+
+    def adopt_current_user(self):
+        """
+            Called on the event loop thread after the check of an async
+            view, attach the user the `check_executor` thread loaded to
+            the resources of this thread here
+        """
+        pass
+
     """
         ----------------------------------------
             PERMISSION ACCESS CHECK
@@ -108,115 +196,331 @@ class BaseSecurityManager(AbstractSecurityManager):
             :param view_name:
                 the name of the class views (child of BaseView)
         """
-        permissions = self.get_public_permissions()
-        if permissions:
-            for i in permissions:
-                if (view_name == i.view_menu.name) and (
-                        permission_name == i.permission.name
-                ):
-                    return True
-            return False
-        else:
+        public_role_id = self.get_public_role_id()
+        if public_role_id is None:
             return False
+        return self.exist_permission_on_roles(
+            view_name,
+            permission_name,
+            [public_role_id],
+        )
 
-    def _has_view_access(
-            self, user, permission_name: str, view_name: str
-    ) -> bool:
-        roles = user.roles
-        db_role_ids = list()
+    @property
+    def cache_backend(self) -> Optional[CacheBackend]:
+        """
+            The configured RBAC_CACHE_BACKEND, None for the in memory caches
+        """
+        if self._cache_backend is None:
+            backend = self.rbac_builder.get_app.config["RBAC_CACHE_BACKEND"]
+            if backend is not None and not isinstance(backend, CacheBackend):
+                backend = backend(self.rbac_builder.get_app)
+            self._cache_backend = backend
+        return self._cache_backend
 
-        for role in roles:
-            db_role_ids.append(role.id)
+    @property
+    def role_cache(self) -> Optional[RolePermissionCache]:
+        """
+            The per role grants cache, None unless RBAC_ROLE_CACHE is set
+        """
+        if self._role_cache is None:
+            config = self.rbac_builder.get_app.config
+            if not config["RBAC_ROLE_CACHE"]:
+                return None
+            self._role_cache = RolePermissionCache(
+                self,
+                maxsize=config["RBAC_ROLE_CACHE_SIZE"],
+                max_grants=config["RBAC_ROLE_CACHE_MAX_GRANTS"],
+                refresh_interval=config["RBAC_ROLE_CACHE_REFRESH"],
+                backend=self.cache_backend,
+                ttl=config["RBAC_CACHE_TTL"],
+            )
+        return self._role_cache
 
+    def _has_view_access(
+            self, role_ids: List[str], permission_name: str, view_name: str
+    ) -> bool:
+        role_cache = self.role_cache
+        if role_cache is not None:
+            key = (view_name, permission_name)
+            return any(key in grants for grants in role_cache.get_many(role_ids))
         # Check database-stored roles
         return self.exist_permission_on_roles(
             view_name,
             permission_name,
-            db_role_ids,
+            role_ids,
         )
 
     def _get_user_permission_view_menus(
             self,
-            user,
+            role_ids: Optional[List[str]],
             permission_name: str,
             view_menus_name: List[str]
     ) -> Set[str]:
         """
         Return a set of views menu names with a certain permission name
-        that a user has access to. Mainly used to fetch all menu permissions
+        that a group of roles has access to. Mainly used to fetch all menu permissions
         on a single db call, will also check public permissions and builtin roles
         """
-        db_role_ids = list()
-        if user is None:
+        if role_ids is None:
             # include public role
-            roles = [self.get_public_role()]
+            role_ids = [self.get_public_role_id()]
+
+        role_cache = self.role_cache
+        if role_cache is not None:
+            result = {
+                view_name
+                for grants in role_cache.get_many(role_ids)
+                for view_name, grant_permission_name in grants
+                if grant_permission_name == permission_name
+            }
         else:
-            roles = user.roles
-
-        result = set()
-        for role in roles:
-            db_role_ids.append(role.id)
-        # Then check against database-stored roles
-        pvms_names = [
-            pvm.view_menu.name
-            for pvm in self.find_roles_permission_view_menus(permission_name, db_role_ids)
-        ]
-        result.update(pvms_names)
+            # Then check against database-stored roles
+            result = set(self.find_roles_view_menu_names(permission_name, role_ids))
+        if view_menus_name is not None:
+            result.intersection_update(view_menus_name)
         return result
 
-    def _get_permission_view_menus_by_user(self, user, no_menu=True):
+    def _get_permission_view_menus_by_user(
+            self,
+            role_ids: Optional[List[str]],
+            no_menu=True
+    ) -> List[dict]:
         """
-        Return a set of views menu that a user has access to. Mainly used to fetch all menu permissions
+        Return a set of views menu that a group of roles has access to. Mainly used to fetch all menu permissions
         on a single db call, will also check public permissions and builtin roles
         """
-        db_role_ids = list()
-        if user is None:
+        if role_ids is None:
             # include public role
-            roles = [self.get_public_role()]
+            role_ids = [self.get_public_role_id()]
+
+        role_cache = self.role_cache
+        if role_cache is not None:
+            permission_views = dict()
+            for grants in role_cache.get_many(role_ids):
+                for (view_name, permission_name), pv_id in grants.items():
+                    if not (no_menu and permission_name == "menu_access"):
+                        permission_views[pv_id] = (pv_id, permission_name, view_name)
+            rows = permission_views.values()
         else:
-            roles = user.roles
-
-        for role in roles:
-            db_role_ids.append(role.id)
-        # Then check against database-stored roles
-        pvms = [
+            # Then check against database-stored roles
+            rows = self.find_permission_view_tuples_by_roles(role_ids, no_menu)
+        return [
             {
-                'id': pvm.id,
-                'action': pvm.permission.name,
-                'view': pvm.view_menu.name
+                'id': pv_id,
+                'action': permission_name,
+                'view': view_name
             }
-            for pvm in self.find_permission_view_by_roles(db_role_ids, no_menu)
+            for pv_id, permission_name, view_name in rows
         ]
-        return pvms
 
-    def has_access(self, permission_name, view_name):
+    def _iter_permission_view_menus_by_user(
+            self,
+            role_ids: Optional[List[str]],
+            no_menu=True
+    ) -> Iterator[Tuple[str, str, str]]:
+        """
+            Streaming version of `_get_permission_view_menus_by_user`,
+            yields (id, permission name, views name) tuples
+        """
+        if role_ids is None:
+            # include public role
+            role_ids = [self.get_public_role_id()]
+        return self.iter_permission_view_by_roles(role_ids, no_menu)
+
+    def role_ids_loader(self, callback: Callable[[], Optional[List[str]]]):
+        """
+            Registers a callback that returns the role ids of the current
+            request, None for anonymous requests. Use it to hand the role ids
+            from a cache or a token without loading the user and its roles::
+
+                @rbac_builder.sm.role_ids_loader
+                def load_role_ids():
+                    return cache.get(get_jwt_identity())
+
+            Can be used as a decorator.
+        """
+        self._role_ids_loader = callback
+        return callback
+
+    def role_ids_claims(self, user) -> Dict[str, List[str]]:
+        """
+            Returns the claims to add to the tokens of `user` when
+            RBAC_ROLE_IDS_CLAIM is set::
+
+                create_access_token(
+                    identity=user.username,
+                    additional_claims=rbac_builder.sm.role_ids_claims(user)
+                )
+        """
+        claim = self.rbac_builder.get_app.config["RBAC_ROLE_IDS_CLAIM"]
+        if not claim:
+            return dict()
+        return {claim: [role.id for role in user.roles]}
+
+    def get_current_role_ids(self) -> Optional[List[str]]:
+        """
+            Returns the role ids of the current request, from the registered
+            `role_ids_loader`, else from the RBAC_ROLE_IDS_CLAIM claim of the
+            JWT, else from the roles of the current user.
+            None means an anonymous request.
+        """
+        with timed("roles"):
+            if self._role_ids_loader is not None:
+                return self._role_ids_loader()
+            claim = self.rbac_builder.get_app.config["RBAC_ROLE_IDS_CLAIM"]
+            if claim:
+                claims = get_jwt()
+                if not claims:
+                    return None
+                return list(claims.get(claim, ()))
+            if current_user:
+                return [role.id for role in current_user.roles]
+            return None
+
+    def has_access(self, permission_name, view_name, role_ids: List[str] = None):
         """
             Check if current user or public has access to views or menu
+
+            :param role_ids: Check these role ids instead of the current request ones
         """
-        if current_user:
-            return self._has_view_access(current_user, permission_name, view_name)
-        else:
-            return self.is_item_public(permission_name, view_name)
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        with timed("has_access"):
+            if role_ids is not None:
+                return self._has_view_access(role_ids, permission_name, view_name)
+            else:
+                return self.is_item_public(permission_name, view_name)
 
-    def get_user_menu_access(self, menu_names: List[str] = None) -> Set[str]:
-        if current_user:
-            return self._get_user_permission_view_menus(
-                current_user, "menu_access", view_menus_name=menu_names)
-        else:
-            return self._get_user_permission_view_menus(
-                None, "menu_access", view_menus_name=menu_names)
+    def get_user_menu_access(
+            self,
+            menu_names: List[str] = None,
+            role_ids: List[str] = None
+    ) -> Set[str]:
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        return self._get_user_permission_view_menus(
+            role_ids, "menu_access", view_menus_name=menu_names)
+
+    def get_user_permission_view(self, role_ids: List[str] = None) -> List[dict]:
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        return self._get_permission_view_menus_by_user(role_ids)
+
+    def get_user_permission_view_menu(self, role_ids: List[str] = None) -> List[dict]:
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        return self._get_permission_view_menus_by_user(role_ids, no_menu=False)
+
+    def iter_user_permission_view(
+            self,
+            role_ids: List[str] = None,
+            no_menu=True
+    ) -> Iterator[Tuple[str, str, str]]:
+        """
+            Streams the permissions on views of the current user (or of
+            `role_ids`) as (id, permission name, views name) tuples, for
+            listings too large to build in memory
+        """
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        return self._iter_permission_view_menus_by_user(role_ids, no_menu)
 
-    def get_user_permission_view(self) -> List[dict]:
-        if current_user:
-            return self._get_permission_view_menus_by_user(current_user)
-        else:
-            return self._get_permission_view_menus_by_user(None)
+    """
+        ----------------------------------------
+            TENANT ACCESS CHECK
+        ----------------------------------------
+    """
 
-    def get_user_permission_view_menu(self) -> List[dict]:
-        if current_user:
-            return self._get_permission_view_menus_by_user(current_user, no_menu=False)
-        else:
-            return self._get_permission_view_menus_by_user(None, no_menu=False)
+    @property
+    def tenant_cache(self) -> TenantPermissionCache:
+        if self._tenant_cache is None:
+            config = self.rbac_builder.get_app.config
+            self._tenant_cache = TenantPermissionCache(
+                self,
+                maxsize=config["RBAC_TENANT_CACHE_SIZE"],
+                max_grants=config["RBAC_TENANT_CACHE_MAX_GRANTS"],
+                refresh_interval=config["RBAC_TENANT_CACHE_REFRESH"],
+                backend=self.cache_backend,
+                ttl=config["RBAC_CACHE_TTL"],
+            )
+        return self._tenant_cache
+
+    def _iter_tenant_role_grants(self, tenant: str, role_ids: Optional[List[str]]):
+        """
+            Yields the cached grants of the roles of `tenant` and of the
+            global roles held by `role_ids`
+        """
+        if role_ids is None:
+            # include public role
+            role_ids = [self.get_public_role_id()]
+        tenants = (None,) if tenant is None else (tenant, None)
+        for grants in map(self.tenant_cache.get, tenants):
+            for role_id in role_ids:
+                role_grants = grants.get(role_id)
+                if role_grants:
+                    yield role_grants
+
+    def has_tenant_access(
+            self,
+            tenant: str,
+            permission_name: str,
+            view_name: str,
+            role_ids: List[str] = None,
+    ) -> bool:
+        """
+            Check if current user (or `role_ids`) has access to views or
+            menu on a tenant, only the roles of the tenant and the global
+            roles count
+
+            :param tenant: The tenant key
+            :param role_ids: Check these role ids instead of the current request ones
+        """
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        key = (view_name, permission_name)
+        return any(
+            key in role_grants
+            for role_grants in self._iter_tenant_role_grants(tenant, role_ids)
+        )
+
+    def get_tenant_menu_access(
+            self,
+            tenant: str,
+            menu_names: List[str] = None,
+            role_ids: List[str] = None,
+    ) -> Set[str]:
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        result = set()
+        for role_grants in self._iter_tenant_role_grants(tenant, role_ids):
+            result.update(
+                view_name
+                for view_name, permission_name in role_grants
+                if permission_name == "menu_access"
+            )
+        if menu_names is not None:
+            result.intersection_update(menu_names)
+        return result
+
+    def get_tenant_permission_view(
+            self,
+            tenant: str,
+            role_ids: List[str] = None,
+            no_menu=True,
+    ) -> List[dict]:
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        result = dict()
+        for role_grants in self._iter_tenant_role_grants(tenant, role_ids):
+            for (view_name, permission_name), pv_id in role_grants.items():
+                if no_menu and permission_name == "menu_access":
+                    continue
+                result[pv_id] = {
+                    'id': pv_id,
+                    'action': permission_name,
+                    'view': view_name
+                }
+        return list(result.values())
 
     def add_permissions_view(self, base_permissions, view_menu):
         """
@@ -250,12 +554,13 @@ class BaseSecurityManager(AbstractSecurityManager):
                     # Skip this perm_view, it has a null permission
                     continue
                 if perm_view.permission.name not in base_permissions:
-                    # perm to delete
-                    roles = self.get_all_roles()
-                    perm = self.find_permission(perm_view.permission.name)
-                    # del permission from all roles
-                    for role in roles:
-                        self.del_permission_role(role, perm_view)
+                    # perm to delete, del permission from the roles holding it
+                    for role_id, _ in self.get_roles_with_permission(
+                            perm_view.permission.name, view_menu
+                    ):
+                        role = self.find_role_by_id(role_id)
+                        if role is not None:
+                            self.del_permission_role(role, perm_view)
                     self.del_permission_view_menu(perm_view.permission.name, view_menu)
                 elif perm_view not in role_admin.permissions:
                     # Role Admin must have all permissions
@@ -281,29 +586,42 @@ class BaseSecurityManager(AbstractSecurityManager):
             :param baseviews: A list of BaseViews class
             :param menus: Menu class
         """
-        viewsmenus = self.get_all_view_menu()
-        roles = self.get_all_roles()
-        for viewmenu in viewsmenus:
-            found = False
-            for baseview in baseviews:
-                if viewmenu.name == baseview.class_permission_name:
-                    found = True
-                    break
-            if menus.find(viewmenu.name):
-                found = True
-            if sides.find(viewmenu.name):
-                found = True
-            if not found:
-                permissions = self.find_permissions_view_menu(viewmenu)
-                for permission in permissions:
-                    for role in roles:
-                        self.del_permission_role(role, permission)
+        view_names = {baseview.class_permission_name for baseview in baseviews}
+        unused = {
+            name
+            for _, name in self.iter_all_view_menu()
+            if name not in view_names and not menus.find(name) and not sides.find(name)
+        }
+        if unused:
+            self._revoke_grants([
+                (role_id, pv_id)
+                for role_id, pv_id, _, _ in self.find_grants_by_view_menus(unused)
+            ])
+            for view_name in unused:
+                viewmenu = self.find_view_menu(view_name)
+                for permission in self.find_permissions_view_menu(viewmenu):
                     self.del_permission_view_menu(
-                        permission.permission.name, viewmenu.name
+                        permission.permission.name, view_name
                     )
-                self.del_view_menu(viewmenu.name)
+                self.del_view_menu(view_name)
         self.security_converge(baseviews)
 
+    def _revoke_grants(self, grants: List[Tuple[str, str]]) -> None:
+        """
+            Revokes (role id, permission view id) grants, loading only
+            the roles and permission views involved
+        """
+        roles = dict()
+        for role_id, pv_id in grants:
+            if role_id not in roles:
+                roles[role_id] = self.find_role_by_id(role_id)
+            if roles[role_id] is None:
+                # Deleted since the grants were read
+                continue
+            self.del_permission_role(
+                roles[role_id], self.find_permission_view_menu_by_id(pv_id)
+            )
+
     @staticmethod
     def _get_new_old_permissions(baseview) -> Dict:
         ret = dict()
@@ -312,7 +630,7 @@ class BaseSecurityManager(AbstractSecurityManager):
                 method_name
             )
             # Actions do not get prefix when normally defined
-            if (hasattr(baseview, 'actions') and
+            if (getattr(baseview, 'actions', None) and
                     baseview.actions.get(old_permission_name)):
                 permission_prefix = ''
             else:
@@ -446,24 +764,25 @@ class BaseSecurityManager(AbstractSecurityManager):
             log.info("No state transitions found")
             return dict()
         log.debug(f"State transitions: {state_transitions}")
-        roles = self.get_all_roles()
-        for role in roles:
-            permissions = list(role.permissions)
-            for pvm in permissions:
-                new_pvm_states = state_transitions['add'].get(
-                    (pvm.view_menu.name, pvm.permission.name)
+        # Only the roles holding a permission to migrate are touched
+        grants = self.find_grants_by_permission_views(state_transitions['add'])
+        roles = dict()
+        for role_id, pv_id, permission_name, view_name in grants:
+            if role_id not in roles:
+                roles[role_id] = self.find_role_by_id(role_id)
+            role = roles[role_id]
+            if role is None:
+                # Deleted since the grants were read
+                continue
+            for new_pvm_state in state_transitions['add'][(view_name, permission_name)]:
+                new_pvm = self.add_permission_view_menu(
+                    new_pvm_state[1], new_pvm_state[0]
+                )
+                self.add_permission_role(role, new_pvm)
+            if (view_name, permission_name) in state_transitions['del_role_pvm']:
+                self.del_permission_role(
+                    role, self.find_permission_view_menu_by_id(pv_id)
                 )
-                if not new_pvm_states:
-                    continue
-                for new_pvm_state in new_pvm_states:
-                    new_pvm = self.add_permission_view_menu(
-                        new_pvm_state[1], new_pvm_state[0]
-                    )
-                    self.add_permission_role(role, new_pvm)
-                if (pvm.view_menu.name, pvm.permission.name) in state_transitions[
-                    'del_role_pvm'
-                ]:
-                    self.del_permission_role(role, pvm)
         for pvm in state_transitions['del_role_pvm']:
             self.del_permission_view_menu(pvm[1], pvm[0], cascade=False)
         for view_name in state_transitions['del_views']:
@@ -484,13 +803,13 @@ class BaseSecurityManager(AbstractSecurityManager):
     ----------------------
     """
 
-    def find_role(self, name):
+    def find_role(self, name, tenant: str = None):
         raise NotImplementedError
 
     def find_role_by_id(self, pk):
         raise NotImplementedError
 
-    def add_role(self, name):
+    def add_role(self, name, tenant: str = None):
         raise NotImplementedError
 
     def update_role(self, pk, name):
@@ -514,6 +833,14 @@ class BaseSecurityManager(AbstractSecurityManager):
         """
         raise NotImplementedError
 
+    def get_public_role_id(self):
+        """
+            returns the id of the public role, None if it does not exist
+        """
+        role = self.get_public_role()
+        if role:
+            return role.id
+
     def get_public_permissions(self):
         """
             returns all permissions from public role
@@ -536,9 +863,154 @@ class BaseSecurityManager(AbstractSecurityManager):
     def find_permission_view_by_roles(
             self,
             role_ids: List[int],
+            no_menu=True
+    ):
+        raise NotImplementedError
+
+    def permission_filter(
+            self,
+            column,
+            permission_name: str,
+            role_ids: List[str] = None,
+            key: str = "name",
     ):
+        """
+            Returns a query filter clause keeping the rows whose `column`
+            holds a views menu name (or id) on which the current user (or
+            `role_ids`) has `permission_name`
+        """
+        raise NotImplementedError
+
+    def find_role_grants(self, role_ids: List[str]) -> Dict[str, Grants]:
+        """
+            Finds the grants of a group of roles as role id ->
+            {(views name, permission name): permission view id}, roles
+            without grants may be missing. Used by `role_cache`
+        """
         raise NotImplementedError
 
+    def find_tenant_grants(self, tenant: Optional[str]) -> TenantGrants:
+        """
+            Finds the grants of all the roles of a tenant, None for the
+            global roles, as role id -> {(views name, permission name):
+            permission view id}. Used by `tenant_cache`
+        """
+        raise NotImplementedError
+
+    def find_roles_view_menu_names(
+            self,
+            permission_name: str,
+            role_ids: List[int],
+    ) -> List[str]:
+        """
+            Finds the names of the views menus with a permission on
+            a group of roles. Override with a query that does not
+            load PermissionView objects
+        """
+        return [
+            pvm.view_menu.name
+            for pvm in self.find_roles_permission_view_menus(permission_name, role_ids)
+        ]
+
+    def find_permission_view_tuples_by_roles(
+            self,
+            role_ids: List[int],
+            no_menu=True
+    ) -> List[Tuple[str, str, str]]:
+        """
+            Finds the permission views of a group of roles as
+            (id, permission name, views name) tuples. Override with a
+            query that does not load PermissionView objects
+        """
+        return [
+            (pvm.id, pvm.permission.name, pvm.view_menu.name)
+            for pvm in self.find_permission_view_by_roles(role_ids, no_menu)
+        ]
+
+    def iter_permission_view_by_roles(
+            self,
+            role_ids: List[str],
+            no_menu=True
+    ) -> Iterator[Tuple[str, str, str]]:
+        """
+            Streaming version of `find_permission_view_tuples_by_roles`.
+            Override to fetch the rows in chunks
+        """
+        return iter(self.find_permission_view_tuples_by_roles(role_ids, no_menu))
+
+    def iter_all_roles(self) -> Iterator[Tuple[str, str]]:
+        """
+            Streams all the roles as (id, name) tuples. Override to
+            fetch the rows in chunks
+        """
+        return ((role.id, role.name) for role in self.get_all_roles())
+
+    def iter_all_view_menu(self) -> Iterator[Tuple[str, str]]:
+        """
+            Streams all the views menus as (id, name) tuples. Override
+            to fetch the rows in chunks
+        """
+        return ((view_menu.id, view_menu.name) for view_menu in self.get_all_view_menu())
+
+    def iter_role_grants(self) -> Iterator[Tuple[str, str, str, str]]:
+        """
+            Streams every grant as (role id, permission view id,
+            permission name, views name) tuples. Used by
+            `security_cleanup` and `security_converge`, override to
+            fetch the rows in chunks
+        """
+        for role in self.get_all_roles():
+            for pvm in role.permissions:
+                yield role.id, pvm.id, pvm.permission.name, pvm.view_menu.name
+
+    """
+    ---------------
+     REVERSE INDEX
+    ---------------
+    """
+
+    def get_roles_with_permission(
+            self,
+            permission_name: str,
+            view_name: str,
+    ) -> List[Tuple[str, str]]:
+        """
+            Returns the (id, name) of the roles holding `permission_name`
+            on `view_name`, "who can do X on view Y". Override with an
+            indexed query, this default checks every role
+        """
+        return [
+            (role.id, role.name)
+            for role in self.get_all_roles()
+            if self.exist_permission_on_roles(view_name, permission_name, [role.id])
+        ]
+
+    def find_grants_by_permission_views(
+            self,
+            permission_views: Iterable[Tuple[str, str]],
+    ) -> List[Tuple[str, str, str, str]]:
+        """
+            Finds the grants of a group of (views name, permission name)
+            as (role id, permission view id, permission name, views name)
+            tuples. Override with an indexed query, this default scans
+            `iter_role_grants`
+        """
+        keys = set(permission_views)
+        return [
+            grant for grant in self.iter_role_grants() if (grant[3], grant[2]) in keys
+        ]
+
+    def find_grants_by_view_menus(
+            self,
+            view_names: Iterable[str],
+    ) -> List[Tuple[str, str, str, str]]:
+        """
+            Finds the grants on a group of views menus, same tuples as
+            `find_grants_by_permission_views`
+        """
+        names = set(view_names)
+        return [grant for grant in self.iter_role_grants() if grant[3] in names]
+
     def exist_permission_on_roles(
             self,
             view_name: str,
@@ -679,3 +1151,40 @@ class BaseSecurityManager(AbstractSecurityManager):
                 The PermissionViewMenu object
         """
         raise NotImplementedError
+
+    def update_permissions_roles(self, role_permission_views):
+        """
+            Sets all the permission views granted to one or many roles
+
+            :param role_permission_views:
+                role id -> all the permission view ids the role must have
+        """
+        raise NotImplementedError
+
+    def get_row_counts(self) -> Dict[str, int]:
+        """
+            Returns the number of rows of each security table, by table name
+        """
+        raise NotImplementedError
+
+    """
+    ------------
+     CHANGE LOG
+    ------------
+    """
+
+    def get_changes_since(self, seq: int, limit: int = None) -> List[RBACChange]:
+        """
+            Returns the changes recorded after the `seq` sequence number,
+            oldest first
+
+            :param seq: Last sequence number already applied, 0 for all
+            :param limit: Max number of changes to return
+        """
+        raise NotImplementedError
+
+    def get_last_change_seq(self) -> int:
+        """
+            Returns the sequence number of the last recorded change, 0 if none
+        """
+        raise NotImplementedError
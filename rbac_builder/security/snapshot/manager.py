@@ -0,0 +1,221 @@
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from rbac_builder import const as c
+from .matrix import PermissionMatrix
+from .snapshot import RBACSnapshot, SnapshotRole
+from ..manager import BaseSecurityManager
+
+log = logging.getLogger(__name__)
+
+
+class SnapshotSecurityManager(BaseSecurityManager):
+    """
+        Read only security manager that serves all permission checks
+        from an RBAC snapshot file, without a database connection.
+
+        Export the snapshot from a service connected to the security
+        database with `rbac_builder.security.snapshot.snapshot.export_snapshot`
+        and configure:
+
+        - RBAC_SNAPSHOT_PATH: path of the snapshot file
+        - RBAC_SNAPSHOT_RELOAD_INTERVAL: seconds between checks for a new
+          snapshot file, None disables reloading (default 5)
+
+        All write primitives refuse to run and log a warning.
+    """
+
+    snapshot_class = RBACSnapshot
+
+    def __init__(self, rbac_builder):
+        super(SnapshotSecurityManager, self).__init__(rbac_builder)
+        app = self.rbac_builder.get_app
+        app.config.setdefault("RBAC_SNAPSHOT_RELOAD_INTERVAL", 5)
+        self.snapshot_path = app.config["RBAC_SNAPSHOT_PATH"]
+        self.reload_interval = app.config["RBAC_SNAPSHOT_RELOAD_INTERVAL"]
+        self._snapshot = None
+        self._snapshot_stat = None
+        self._checked_at = 0.0
+        try:
+            self.load_snapshot()
+        except Exception as e:
+            log.error(c.LOGMSG_ERR_SEC_LOAD_SNAPSHOT.format(self.snapshot_path, str(e)))
+            exit(1)
+
+    @staticmethod
+    def _stat_key(stat):
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load_snapshot(self) -> RBACSnapshot:
+        """
+            (Re)loads the snapshot file
+        """
+        stat = os.stat(self.snapshot_path)
+        self._snapshot = self.snapshot_class.load(self.snapshot_path)
+        self._snapshot_stat = self._stat_key(stat)
+        self._checked_at = time.monotonic()
+        log.info(c.LOGMSG_INF_SEC_LOAD_SNAPSHOT.format(self.snapshot_path))
+        return self._snapshot
+
+    @property
+    def snapshot(self) -> RBACSnapshot:
+        """
+            The current snapshot, reloaded when the file has changed
+            at most once every `reload_interval` seconds
+        """
+        if (
+                self.reload_interval is not None and
+                time.monotonic() - self._checked_at >= self.reload_interval
+        ):
+            self._checked_at = time.monotonic()
+            try:
+                if self._stat_key(os.stat(self.snapshot_path)) != self._snapshot_stat:
+                    self.load_snapshot()
+            except Exception as e:
+                # Keep serving the last good snapshot
+                log.error(
+                    c.LOGMSG_ERR_SEC_LOAD_SNAPSHOT.format(self.snapshot_path, str(e))
+                )
+        return self._snapshot
+
+    def _refuse_write(self, operation: str) -> None:
+        log.warning(c.LOGMSG_WAR_SEC_READ_ONLY.format(operation))
+
+    """
+    ---------------------------------
+     REGISTRATION AND MAINTENANCE
+    ---------------------------------
+    """
+
+    def add_permissions_view(self, base_permissions, view_menu):
+        # Views are still registered on a read only manager, nothing to store
+        pass
+
+    def add_permissions_menu(self, view_menu_name):
+        pass
+
+    def security_cleanup(self, baseviews, menus, sides):
+        self._refuse_write("cleanup security")
+
+    def security_converge(self, baseviews: List, dry=False) -> Dict:
+        if dry:
+            return super(SnapshotSecurityManager, self).security_converge(
+                baseviews, dry=True
+            )
+        self._refuse_write("converge security")
+        return dict()
+
+    """
+    ----------------------
+     PRIMITIVES FOR ROLES
+    ----------------------
+    """
+
+    def find_role(self, name, tenant: str = None) -> Optional[SnapshotRole]:
+        return self.snapshot.find_role(name, tenant)
+
+    def find_role_by_id(self, pk) -> Optional[SnapshotRole]:
+        return self.snapshot.find_role_by_id(pk)
+
+    def get_all_roles(self) -> List[SnapshotRole]:
+        return self.snapshot.get_all_roles()
+
+    def add_role(self, name, tenant: str = None):
+        self._refuse_write("add role {0}".format(name))
+
+    def update_role(self, pk, name):
+        self._refuse_write("update role {0}".format(pk))
+
+    def del_role(self, pk):
+        self._refuse_write("delete role {0}".format(pk))
+        return False
+
+    """
+    ----------------------------
+     PRIMITIVES FOR PERMISSIONS
+    ----------------------------
+    """
+
+    def get_public_role(self) -> Optional[SnapshotRole]:
+        snapshot = self.snapshot
+        if snapshot.public_role_id is not None:
+            return snapshot.find_role_by_id(snapshot.public_role_id)
+
+    def get_public_role_id(self) -> Optional[str]:
+        return self.snapshot.public_role_id
+
+    def exist_permission_on_roles(
+            self,
+            view_name: str,
+            permission_name: str,
+            role_ids: List[str],
+    ) -> bool:
+        return self.snapshot.exist_permission_on_roles(
+            view_name, permission_name, role_ids
+        )
+
+    def find_roles_view_menu_names(
+            self,
+            permission_name: str,
+            role_ids: List[str],
+    ) -> List[str]:
+        return list(self.snapshot.find_roles_view_menu_names(permission_name, role_ids))
+
+    def find_permission_view_tuples_by_roles(
+            self,
+            role_ids: List[str],
+            no_menu=True
+    ) -> List[Tuple[str, str, str]]:
+        return self.snapshot.find_permission_view_by_roles(role_ids, no_menu)
+
+    def add_permission(self, name):
+        self._refuse_write("add permission {0}".format(name))
+
+    def del_permission(self, name):
+        self._refuse_write("delete permission {0}".format(name))
+        return False
+
+    def add_view_menu(self, name):
+        self._refuse_write("add views menu {0}".format(name))
+
+    def del_view_menu(self, name):
+        self._refuse_write("delete views menu {0}".format(name))
+        return False
+
+    def add_permission_view_menu(self, permission_name, view_menu_name):
+        self._refuse_write(
+            "add permission {0} on {1}".format(permission_name, view_menu_name)
+        )
+
+    def del_permission_view_menu(self, permission_name, view_menu_name, cascade=True):
+        self._refuse_write(
+            "delete permission {0} on {1}".format(permission_name, view_menu_name)
+        )
+
+    def add_permission_role(self, role, perm_view):
+        self._refuse_write("add permission to role {0}".format(role))
+
+    def del_permission_role(self, role, perm_view):
+        self._refuse_write("delete permission from role {0}".format(role))
+
+    def update_permission_role(self, role, perm_views):
+        self._refuse_write("update permissions of role {0}".format(role))
+
+    def update_permissions_roles(self, role_permission_views):
+        self._refuse_write("update permissions of roles")
+        return dict()
+
+
+class MatrixSecurityManager(SnapshotSecurityManager):
+    """
+        Read only security manager backed by a memory mapped permission
+        matrix shared by all the worker processes of a host.
+
+        RBAC_SNAPSHOT_PATH points to a matrix file written by
+        `rbac_builder.security.snapshot.matrix.export_matrix`, new
+        versions are renamed over it and picked up on reload.
+    """
+
+    snapshot_class = PermissionMatrix
@@ -0,0 +1,313 @@
+import mmap
+import os
+import struct
+import tempfile
+from typing import Iterable, List, Optional, Set, Tuple
+
+from .snapshot import RBACSnapshot, SnapshotRole, _replace_file
+
+MATRIX_MAGIC = b"RBACMTX1"
+MATRIX_VERSION = 1
+
+# magic, version, roles, permission views, row bytes, public role index
+_HEADER = struct.Struct("<8sIIIIi")
+# offsets of the role ids, role names, permission view keys,
+# permission view ids string tables and of the grants matrix
+_SECTIONS = struct.Struct("<5Q")
+_OFFSET = struct.Struct("<I")
+_KEY_SEP = b"\x00"
+
+
+def _pack_strings(values: List[bytes]) -> bytes:
+    """
+        Packs a string table: n + 1 offsets followed by the utf-8 blob
+    """
+    offsets = [0]
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return struct.pack("<{0}I".format(len(offsets)), *offsets) + b"".join(values)
+
+
+def _role_key(name: str, tenant: Optional[str]) -> bytes:
+    """
+        Entry of the role names table, the tenant roles names are
+        followed by their tenant
+    """
+    key = name.encode("utf-8")
+    if tenant is not None:
+        key += _KEY_SEP + tenant.encode("utf-8")
+    return key
+
+
+class _StringTable(object):
+    """
+        Read only view of a string table packed by `_pack_strings`
+    """
+
+    __slots__ = ("buf", "offset", "size", "blob")
+
+    def __init__(self, buf, offset: int, size: int):
+        self.buf = buf
+        self.offset = offset
+        self.size = size
+        self.blob = offset + _OFFSET.size * (size + 1)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> bytes:
+        start, = _OFFSET.unpack_from(self.buf, self.offset + _OFFSET.size * index)
+        end, = _OFFSET.unpack_from(self.buf, self.offset + _OFFSET.size * (index + 1))
+        return self.buf[self.blob + start:self.blob + end]
+
+    def index(self, value: bytes) -> int:
+        """
+            Binary search on a sorted table, returns -1 if not found
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.size and self[low] == value:
+            return low
+        return -1
+
+
+class PermissionMatrix(object):
+    """
+        Role/permission matrix stored in a memory mapped file.
+
+        Every worker process maps the same file read only, so a host keeps
+        a single copy of the data in the page cache and no per process
+        structures are built. Lookups binary search the sorted role ids and
+        (view, permission) keys and test one bit of the grants matrix.
+
+        Files are never modified in place, `build` writes a new file and
+        renames it over the previous one, readers keep their mapping of
+        the old file until they reload.
+
+        Exposes the same query methods as `RBACSnapshot`, so it can back
+        a `SnapshotSecurityManager` (see `MatrixSecurityManager`).
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        (
+            magic,
+            version,
+            self.n_roles,
+            self.n_permission_views,
+            self.row_bytes,
+            self._public_role_index,
+        ) = _HEADER.unpack_from(buf, 0)
+        if magic != MATRIX_MAGIC:
+            raise ValueError("Not an RBAC permission matrix")
+        if version != MATRIX_VERSION:
+            raise ValueError("Unsupported RBAC permission matrix version {0}".format(version))
+        (
+            role_ids_offset,
+            role_names_offset,
+            pv_keys_offset,
+            pv_ids_offset,
+            self._matrix_offset,
+        ) = _SECTIONS.unpack_from(buf, _HEADER.size)
+        self._role_ids = _StringTable(buf, role_ids_offset, self.n_roles)
+        self._role_names = _StringTable(buf, role_names_offset, self.n_roles)
+        self._pv_keys = _StringTable(buf, pv_keys_offset, self.n_permission_views)
+        self._pv_ids = _StringTable(buf, pv_ids_offset, self.n_permission_views)
+
+    @classmethod
+    def load(cls, path: str) -> "PermissionMatrix":
+        """
+            Maps a matrix file read only
+        """
+        with open(path, "rb") as fd:
+            buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buf)
+
+    @staticmethod
+    def build(snapshot: RBACSnapshot, path: str) -> None:
+        """
+            Writes the matrix for `snapshot` to a new file and atomically
+            renames it to `path`
+        """
+        roles = sorted(
+            (pk.encode("utf-8"), _role_key(name, snapshot.tenants.get(pk)))
+            for pk, name in snapshot.roles.items()
+        )
+        permission_views = sorted(
+            (
+                view_name.encode("utf-8") + _KEY_SEP + permission_name.encode("utf-8"),
+                pv_id.encode("utf-8"),
+                index,
+            )
+            for index, (pv_id, permission_name, view_name)
+            in enumerate(snapshot.permission_views)
+        )
+        positions = {index: position for position, (_, _, index) in enumerate(permission_views)}
+        row_bytes = (len(permission_views) + 7) // 8
+        matrix = bytearray(row_bytes * len(roles))
+        public_role_index = -1
+        for role_index, (pk, _) in enumerate(roles):
+            role_id = pk.decode("utf-8")
+            if role_id == snapshot.public_role_id:
+                public_role_index = role_index
+            for index in snapshot.grants.get(role_id, ()):
+                position = positions[index]
+                matrix[role_index * row_bytes + position // 8] |= 1 << (position % 8)
+
+        sections = [
+            _pack_strings([pk for pk, _ in roles]),
+            _pack_strings([name for _, name in roles]),
+            _pack_strings([key for key, _, _ in permission_views]),
+            _pack_strings([pv_id for _, pv_id, _ in permission_views]),
+            bytes(matrix),
+        ]
+        offsets = []
+        offset = _HEADER.size + _SECTIONS.size
+        for section in sections:
+            offsets.append(offset)
+            offset += len(section)
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(_HEADER.pack(
+                    MATRIX_MAGIC,
+                    MATRIX_VERSION,
+                    len(roles),
+                    len(permission_views),
+                    row_bytes,
+                    public_role_index,
+                ))
+                tmp.write(_SECTIONS.pack(*offsets))
+                for section in sections:
+                    tmp.write(section)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            _replace_file(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _role_indexes(self, role_ids: Iterable[str]) -> List[int]:
+        indexes = []
+        for role_id in role_ids:
+            if role_id is None:
+                continue
+            index = self._role_ids.index(role_id.encode("utf-8"))
+            if index >= 0:
+                indexes.append(index)
+        return indexes
+
+    def _granted(self, role_indexes: List[int]) -> int:
+        """
+            Union of the grants rows of the roles as an int bitmap
+        """
+        granted = 0
+        for role_index in role_indexes:
+            start = self._matrix_offset + role_index * self.row_bytes
+            granted |= int.from_bytes(self.buf[start:start + self.row_bytes], "little")
+        return granted
+
+    def _iter_positions(self, granted: int):
+        while granted:
+            low = granted & -granted
+            yield low.bit_length() - 1
+            granted ^= low
+
+    def _role(self, index: int) -> SnapshotRole:
+        name, _, tenant = self._role_names[index].partition(_KEY_SEP)
+        return SnapshotRole(
+            self._role_ids[index].decode("utf-8"),
+            name.decode("utf-8"),
+            tenant.decode("utf-8") or None,
+        )
+
+    """
+    ---------------
+     QUERY METHODS
+    ---------------
+    """
+
+    @property
+    def public_role_id(self) -> Optional[str]:
+        if self._public_role_index >= 0:
+            return self._role_ids[self._public_role_index].decode("utf-8")
+
+    def find_role(self, name: str, tenant: str = None) -> Optional[SnapshotRole]:
+        encoded = _role_key(name, tenant)
+        for index in range(self.n_roles):
+            if self._role_names[index] == encoded:
+                return self._role(index)
+
+    def find_role_by_id(self, pk: str) -> Optional[SnapshotRole]:
+        index = self._role_ids.index(pk.encode("utf-8"))
+        if index >= 0:
+            return self._role(index)
+
+    def get_all_roles(self) -> List[SnapshotRole]:
+        return [self._role(index) for index in range(self.n_roles)]
+
+    def exist_permission_on_roles(
+            self,
+            view_name: str,
+            permission_name: str,
+            role_ids: Iterable[str],
+    ) -> bool:
+        position = self._pv_keys.index(
+            view_name.encode("utf-8") + _KEY_SEP + permission_name.encode("utf-8")
+        )
+        if position < 0:
+            return False
+        byte, mask = position // 8, 1 << (position % 8)
+        for role_index in self._role_indexes(role_ids):
+            if self.buf[self._matrix_offset + role_index * self.row_bytes + byte] & mask:
+                return True
+        return False
+
+    def find_roles_view_menu_names(
+            self,
+            permission_name: str,
+            role_ids: Iterable[str],
+    ) -> Set[str]:
+        suffix = _KEY_SEP + permission_name.encode("utf-8")
+        result = set()
+        for position in self._iter_positions(self._granted(self._role_indexes(role_ids))):
+            key = self._pv_keys[position]
+            if key.endswith(suffix):
+                result.add(key[:-len(suffix)].decode("utf-8"))
+        return result
+
+    def find_permission_view_by_roles(
+            self,
+            role_ids: Iterable[str],
+            no_menu=True,
+    ) -> List[Tuple[str, str, str]]:
+        result = []
+        for position in self._iter_positions(self._granted(self._role_indexes(role_ids))):
+            view_name, permission_name = self._pv_keys[position].decode("utf-8").split(
+                "\x00", 1
+            )
+            if no_menu and permission_name == "menu_access":
+                continue
+            result.append(
+                (self._pv_ids[position].decode("utf-8"), permission_name, view_name)
+            )
+        return result
+
+
+def export_matrix(security_manager, path: str) -> None:
+    """
+        Writes the RBAC state of `security_manager` to a permission
+        matrix file, replacing `path` atomically
+
+        :param security_manager: A security manager connected to the database
+        :param path: The matrix file path
+    """
+    PermissionMatrix.build(RBACSnapshot.from_security_manager(security_manager), path)
@@ -0,0 +1,262 @@
+import json
+import os
+import stat
+import tempfile
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from rbac_builder import const as c
+
+SNAPSHOT_FORMAT = "rbac-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+def _replace_file(tmp_path: str, path: str) -> None:
+    """
+        Renames `tmp_path` over `path` with the mode of the replaced file,
+        or 0644 less the umask: mkstemp files are only readable by their
+        owner, and the workers can run as another user than the exporter
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o644 & ~umask
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+
+class SnapshotRole(NamedTuple):
+    """
+        Read only role loaded from a snapshot
+    """
+
+    id: str
+    name: str
+    tenant: Optional[str] = None
+
+
+class RBACSnapshot(object):
+    """
+        Immutable in memory copy of the whole RBAC state: roles,
+        permission views, grants and the public role.
+
+        Snapshots are written as compact JSON documents::
+
+            {
+                "format": "rbac-snapshot",
+                "version": 1,
+                "schema_version": <SECURITY_SCHEMA_VERSION>,
+                "public_role": <ROLE ID>,
+                "roles": [[<ROLE ID>, <ROLE NAME>(, <TENANT>)], ...],
+                "permission_views": [[<PV ID>, <PERM>, <VIEW>], ...],
+                "grants": {<ROLE ID>: [<PV INDEX>, ...], ...}
+            }
+    """
+
+    def __init__(
+            self,
+            roles: Dict[str, str],
+            permission_views: List[Tuple[str, str, str]],
+            grants: Dict[str, List[int]],
+            public_role_id: Optional[str] = None,
+            tenants: Optional[Dict[str, str]] = None,
+    ):
+        """
+            :param roles: role id -> role name
+            :param permission_views: list of (id, permission name, view name)
+            :param grants: role id -> indexes on `permission_views`
+            :param public_role_id: The id of the public role, if any
+            :param tenants: role id -> tenant, for the tenant roles
+        """
+        self.roles = roles
+        self.permission_views = permission_views
+        self.grants = grants
+        self.public_role_id = public_role_id
+        self.tenants = tenants or dict()
+
+        self._role_ids_by_name = {
+            (name, self.tenants.get(pk)): pk for pk, name in roles.items()
+        }
+        self._role_permission_views = dict()
+        self._role_pairs = dict()
+        self._role_views_by_permission = dict()
+        for role_id, indexes in grants.items():
+            views_by_permission = dict()
+            pairs = set()
+            for index in indexes:
+                _, permission_name, view_name = permission_views[index]
+                pairs.add((view_name, permission_name))
+                views_by_permission.setdefault(permission_name, set()).add(view_name)
+            self._role_permission_views[role_id] = frozenset(indexes)
+            self._role_pairs[role_id] = frozenset(pairs)
+            self._role_views_by_permission[role_id] = {
+                permission_name: frozenset(view_names)
+                for permission_name, view_names in views_by_permission.items()
+            }
+
+    @classmethod
+    def from_security_manager(cls, security_manager) -> "RBACSnapshot":
+        """
+            Builds a snapshot from the current state of a security manager
+        """
+        permission_views = list()
+        pv_indexes = dict()
+        roles = dict()
+        tenants = dict()
+        grants = dict()
+        for role in security_manager.get_all_roles():
+            roles[role.id] = role.name
+            if role.tenant is not None:
+                tenants[role.id] = role.tenant
+            grants[role.id] = list()
+        for role_id, pv_id, permission_name, view_name in security_manager.iter_role_grants():
+            if role_id not in grants:
+                # Created after the roles were read
+                continue
+            if pv_id not in pv_indexes:
+                pv_indexes[pv_id] = len(permission_views)
+                permission_views.append((pv_id, permission_name, view_name))
+            grants[role_id].append(pv_indexes[pv_id])
+        for indexes in grants.values():
+            indexes.sort()
+        public_role = security_manager.get_public_role()
+        return cls(
+            roles,
+            permission_views,
+            grants,
+            public_role.id if public_role else None,
+            tenants,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "RBACSnapshot":
+        """
+            Loads a snapshot file
+
+            :raises ValueError: If the file is not a supported snapshot,
+                or was exported from another security schema version
+        """
+        with open(path, "r", encoding="utf-8") as fd:
+            data = json.load(fd)
+        if data.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError("{0} is not an RBAC snapshot".format(path))
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                "Unsupported RBAC snapshot version {0}".format(data.get("version"))
+            )
+        if data.get("schema_version") != c.SECURITY_SCHEMA_VERSION:
+            raise ValueError(
+                "RBAC snapshot exported from schema version {0}, expected {1}".format(
+                    data.get("schema_version"), c.SECURITY_SCHEMA_VERSION
+                )
+            )
+        return cls(
+            {row[0]: row[1] for row in data["roles"]},
+            [tuple(pv) for pv in data["permission_views"]],
+            data["grants"],
+            data.get("public_role"),
+            {row[0]: row[2] for row in data["roles"] if len(row) > 2},
+        )
+
+    def dump(self, path: str) -> None:
+        """
+            Writes the snapshot to `path`, the file is replaced atomically
+            so readers never see a partial snapshot.
+        """
+        data = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "schema_version": c.SECURITY_SCHEMA_VERSION,
+            "public_role": self.public_role_id,
+            "roles": sorted(
+                [pk, name] + ([self.tenants[pk]] if pk in self.tenants else [])
+                for pk, name in self.roles.items()
+            ),
+            "permission_views": self.permission_views,
+            "grants": self.grants,
+        }
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+                json.dump(data, tmp, separators=(",", ":"))
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            _replace_file(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    """
+    ---------------
+     QUERY METHODS
+    ---------------
+    """
+
+    def find_role(self, name: str, tenant: str = None) -> Optional[SnapshotRole]:
+        pk = self._role_ids_by_name.get((name, tenant))
+        if pk is not None:
+            return SnapshotRole(pk, name, tenant)
+
+    def find_role_by_id(self, pk: str) -> Optional[SnapshotRole]:
+        name = self.roles.get(pk)
+        if name is not None:
+            return SnapshotRole(pk, name, self.tenants.get(pk))
+
+    def get_all_roles(self) -> List[SnapshotRole]:
+        return [
+            SnapshotRole(pk, name, self.tenants.get(pk)) for pk, name in self.roles.items()
+        ]
+
+    def exist_permission_on_roles(
+            self,
+            view_name: str,
+            permission_name: str,
+            role_ids: Iterable[str],
+    ) -> bool:
+        pair = (view_name, permission_name)
+        for role_id in role_ids:
+            if pair in self._role_pairs.get(role_id, ()):
+                return True
+        return False
+
+    def find_roles_view_menu_names(
+            self,
+            permission_name: str,
+            role_ids: Iterable[str],
+    ) -> Set[str]:
+        result = set()
+        for role_id in role_ids:
+            views_by_permission = self._role_views_by_permission.get(role_id)
+            if views_by_permission:
+                result.update(views_by_permission.get(permission_name, ()))
+        return result
+
+    def find_permission_view_by_roles(
+            self,
+            role_ids: Iterable[str],
+            no_menu=True,
+    ) -> List[Tuple[str, str, str]]:
+        indexes = set()
+        for role_id in role_ids:
+            indexes.update(self._role_permission_views.get(role_id, ()))
+        return [
+            self.permission_views[index]
+            for index in sorted(indexes)
+            if not (no_menu and self.permission_views[index][1] == "menu_access")
+        ]
+
+
+def export_snapshot(security_manager, path: str) -> RBACSnapshot:
+    """
+        Writes the full RBAC state of `security_manager` to a snapshot file
+
+        :param security_manager: A security manager connected to the database
+        :param path: The snapshot file path
+        :return: The exported snapshot
+    """
+    snapshot = RBACSnapshot.from_security_manager(security_manager)
+    snapshot.dump(path)
+    return snapshot
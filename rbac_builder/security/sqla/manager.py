@@ -1,16 +1,48 @@
+import datetime
+import itertools
 import logging
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from sqlalchemy import and_, literal
+from flask import g
+from sqlalchemy import (
+    Column,
+    Index,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+    and_,
+    bindparam,
+    create_engine,
+    exists,
+    func,
+    literal,
+    select,
+)
 from sqlalchemy.engine.reflection import Inspector
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import DropConstraint
+from sqlalchemy.ext import baked
+from sqlalchemy.orm import contains_eager, scoped_session
 
 from rbac_builder import const as c
 from rbac_builder.models import Base
-from .models import PermissionView, Permission, ViewMenu, Role, assoc_permissionview_role
-from ..manager import BaseSecurityManager
+from rbac_builder.utils import generate_uuid
+from .models import (
+    PermissionView,
+    Permission,
+    ViewMenu,
+    Role,
+    SchemaVersion,
+    ChangeLog,
+    assoc_permissionview_role
+)
+from ..manager import BaseSecurityManager, RBACChange
 
 log = logging.getLogger(__name__)
 
+_bakery = baked.bakery()
+
 
 class SecurityManager(BaseSecurityManager):
     """
@@ -25,28 +57,375 @@ class SecurityManager(BaseSecurityManager):
     permission_model = Permission
     viewmenu_model = ViewMenu
     permissionview_model = PermissionView
+    schemaversion_model = SchemaVersion
+    changelog_model = ChangeLog
+    bulk_chunk_size = 1000
+    """ Max rows on a single multi-row insert """
+    stream_chunk_size = 1000
+    """ Rows fetched at a time by the streaming queries """
+    lookup_chunk_size = 200
+    """ Max (views name, permission name) pairs resolved by a single query """
 
     def __init__(self, rbac_builder):
         super(SecurityManager, self).__init__(rbac_builder)
+        # Record changes on the RBAC change log
+        self.rbac_builder.get_app.config.setdefault("RBAC_CHANGE_LOG", True)
+        self._read_engine = None
+        self._read_dialect_name = None
+        # Hot read statements, built once and compiled once per dialect
+        self._statements = dict()
+        self._compiled_cache = dict()
         self.create_db()
 
     @property
     def get_session(self):
         return self.rbac_builder.get_session
 
+    @property
+    def read_engine(self):
+        """
+            Engine for the read only RBAC queries, created on first use
+            from RBAC_READ_DATABASE_URI (a replica or a dedicated small
+            pool) with RBAC_READ_ENGINE_OPTIONS. None when not configured,
+            reads then run on the session connection.
+        """
+        if self._read_engine is None:
+            config = self.rbac_builder.get_app.config
+            uri = config.get("RBAC_READ_DATABASE_URI")
+            if uri:
+                self._read_engine = create_engine(
+                    uri, **config.get("RBAC_READ_ENGINE_OPTIONS", {})
+                )
+        return self._read_engine
+
+    @property
+    def read_dialect_name(self) -> str:
+        if self._read_dialect_name is None:
+            engine = self.read_engine
+            if engine is None:
+                engine = self.get_session.get_bind(mapper=None, clause=None)
+            self._read_dialect_name = engine.dialect.name
+        return self._read_dialect_name
+
+    def execute_read(self, statement, params: Dict = None) -> List:
+        """
+            Executes a read only Core statement on the read engine and
+            returns its rows, nothing is added to the session identity map
+        """
+        engine = self.read_engine
+        if engine is None:
+            return self.get_session.execute(statement, params).fetchall()
+        with engine.connect() as connection:
+            return connection.execute(statement, params or {}).fetchall()
+
+    def read_statement(self, name: str, build: Callable):
+        """
+            Returns the hot read statement `name`, built by `build` on
+            first use. Values are passed as bind parameters (expanding for
+            the role ids lists) so the statement is reused by every call
+        """
+        statement = self._statements.get(name)
+        if statement is None:
+            statement = self._statements[name] = build()
+        return statement
+
+    def execute_cached(self, name: str, build: Callable, **params) -> List:
+        """
+            `execute_read` of the `read_statement` named `name`, its SQL is
+            compiled once per dialect, each call only binds `params`
+        """
+        statement = self.read_statement(name, build)
+        engine = self.read_engine
+        if engine is None:
+            connection = self.get_session.connection()
+            return connection.execution_options(
+                compiled_cache=self._compiled_cache
+            ).execute(statement, params).fetchall()
+        with engine.connect() as connection:
+            return connection.execution_options(
+                compiled_cache=self._compiled_cache
+            ).execute(statement, params).fetchall()
+
+    def stream_read(
+            self, statement, primary: bool = False, params: Dict = None
+    ) -> Iterator[Tuple]:
+        """
+            Executes a read only Core statement and yields its rows as
+            tuples, fetching `stream_chunk_size` rows at a time with a
+            server side cursor where the driver supports one.
+
+            The generator must be exhausted (or closed) before writing
+            on the same session.
+
+            :param statement: The Core statement
+            :param primary: If True runs on the session connection,
+                even when a read engine is configured
+            :param params: The statement bind parameters
+        """
+        engine = None if primary else self.read_engine
+        if engine is None:
+            yield from self._stream_rows(self.get_session.connection(), statement, params)
+        else:
+            with engine.connect() as connection:
+                yield from self._stream_rows(connection, statement, params)
+
+    def _stream_rows(self, connection, statement, params: Dict = None) -> Iterator[Tuple]:
+        result = connection.execution_options(stream_results=True).execute(
+            statement, params or {}
+        )
+        try:
+            while True:
+                rows = result.fetchmany(self.stream_chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield tuple(row)
+        finally:
+            result.close()
+
+    @property
+    def security_tables(self):
+        """
+            The tables owned by the security manager
+        """
+        return [
+            self.role_model.__table__,
+            self.permission_model.__table__,
+            self.viewmenu_model.__table__,
+            self.permissionview_model.__table__,
+            assoc_permissionview_role,
+            self.schemaversion_model.__table__,
+            self.changelog_model.__table__,
+        ]
+
+    def get_row_counts(self) -> Dict[str, int]:
+        tables = [
+            self.role_model.__table__,
+            self.permission_model.__table__,
+            self.viewmenu_model.__table__,
+            self.permissionview_model.__table__,
+            assoc_permissionview_role,
+        ]
+        statement = select([
+            select([func.count()]).select_from(table).as_scalar().label(table.name)
+            for table in tables
+        ])
+        row = self.get_session.execute(statement).fetchone()
+        return {table.name: row[index] for index, table in enumerate(tables)}
+
     def create_db(self):
+        """
+            Checks the schema version stamp with a single query, the tables
+            are only created and the builtin roles seeded when the stamp
+            is missing or older than `SECURITY_SCHEMA_VERSION`.
+        """
         try:
+            version = self.find_schema_version()
+            if version is not None and version >= c.SECURITY_SCHEMA_VERSION:
+                return
             engine = self.get_session.get_bind(mapper=None, clause=None)
-            inspector = Inspector.from_engine(engine)
-            if "permission" not in inspector.get_table_names():
-                log.info(c.LOGMSG_INF_SEC_NO_DB)
-                Base.metadata.create_all(engine)
-                log.info(c.LOGMSG_INF_SEC_ADD_DB)
+            if version is None:
+                inspector = Inspector.from_engine(engine)
+                if "permission" not in inspector.get_table_names():
+                    log.info(c.LOGMSG_INF_SEC_NO_DB)
+                    Base.metadata.create_all(engine)
+                    log.info(c.LOGMSG_INF_SEC_ADD_DB)
+                else:
+                    # Tables created before the version stamp existed
+                    version = 0
+            Base.metadata.create_all(engine, tables=self.security_tables)
+            if version is not None:
+                self._add_missing_columns(engine)
+                self._drop_role_name_unique(engine)
+                self._add_missing_indexes(engine)
+                self._delete_orphan_grants(engine)
             super(SecurityManager, self).create_db()
+            self.stamp_schema_version(c.SECURITY_SCHEMA_VERSION)
         except Exception as e:
             log.error(c.LOGMSG_ERR_SEC_CREATE_DB.format(str(e)))
             exit(1)
 
+    def _add_missing_columns(self, engine):
+        """
+            Adds the nullable columns introduced by newer schema versions
+            to security tables created by an older version
+        """
+        inspector = Inspector.from_engine(engine)
+        for table in self.security_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                engine.execute(
+                    "ALTER TABLE {0} ADD COLUMN {1} {2}".format(
+                        table.name,
+                        column.name,
+                        column.type.compile(dialect=engine.dialect),
+                    )
+                )
+                log.info(c.LOGMSG_INF_SEC_ADD_COLUMN.format(table.name, column.name))
+
+    def _drop_role_name_unique(self, engine):
+        """
+            Drops the unique constraint on the role name alone left by the
+            schema versions without tenants, tenants can reuse global names
+        """
+        role = self.role_model.__table__
+        inspector = Inspector.from_engine(engine)
+        constraints = {
+            constraint["name"]
+            for constraint in inspector.get_unique_constraints(role.name)
+            if constraint["column_names"] == ["name"]
+        }
+        indexes = {
+            index["name"]
+            for index in inspector.get_indexes(role.name)
+            if index["unique"] and index["column_names"] == ["name"] and
+            "duplicates_constraint" not in index
+        } - constraints - {index.name for index in role.indexes}
+        if not constraints and not indexes:
+            return
+        if engine.dialect.name == "sqlite":
+            # SQLite cannot drop a constraint, the table is rebuilt
+            self._rebuild_sqlite_table(engine, role)
+        else:
+            old_role = Table(role.name, MetaData(), Column("name", String(64)))
+            for name in constraints:
+                engine.execute(DropConstraint(UniqueConstraint(old_role.c.name, name=name)))
+            for name in indexes:
+                Index(name, old_role.c.name).drop(engine)
+        log.info(c.LOGMSG_INF_SEC_DEL_ROLE_NAME_UNIQUE)
+
+    def _rebuild_sqlite_table(self, engine, table):
+        """
+            Recreates a SQLite table from its model and copies its rows
+        """
+        columns = [
+            column["name"]
+            for column in Inspector.from_engine(engine).get_columns(table.name)
+            if column["name"] in table.c
+        ]
+        with engine.connect() as connection:
+            foreign_keys = connection.execute("PRAGMA foreign_keys").scalar()
+            # Dropping the table must not cascade to the grants
+            connection.execute("PRAGMA foreign_keys=OFF")
+            try:
+                with connection.begin():
+                    rows = connection.execute(
+                        select([table.c[name] for name in columns])
+                    ).fetchall()
+                    connection.execute("DROP TABLE {0}".format(table.name))
+                    table.create(connection)
+                    if rows:
+                        connection.execute(
+                            table.insert(), [dict(zip(columns, row)) for row in rows]
+                        )
+            finally:
+                connection.execute("PRAGMA foreign_keys={0}".format(int(foreign_keys)))
+
+    def _add_missing_indexes(self, engine):
+        """
+            Creates the indexes introduced by newer schema versions
+            on security tables created by an older version
+        """
+        inspector = Inspector.from_engine(engine)
+        for table in self.security_tables:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(engine)
+                    log.info(c.LOGMSG_INF_SEC_ADD_INDEX.format(table.name, index.name))
+
+    def _delete_orphan_grants(self, engine):
+        """
+            Deletes the grants left by roles deleted without foreign key
+            enforcement, the access checks do not join the role table
+        """
+        role = self.role_model.__table__
+        result = engine.execute(
+            assoc_permissionview_role.delete().where(
+                ~assoc_permissionview_role.c.role_id.in_(select([role.c.id]))
+            )
+        )
+        if result.rowcount:
+            log.info(c.LOGMSG_INF_SEC_DEL_ORPHAN_GRANTS.format(result.rowcount))
+
+    def warmup(self):
+        """
+            Loads the grants caches, so the first checks of the workers run
+            from memory, then releases the database connections opened
+            while warming up, forked workers must not share the master
+            connections.
+
+            At most RBAC_ROLE_CACHE_SIZE roles are loaded, warming more
+            would only evict the first ones
+        """
+        super(SecurityManager, self).warmup()
+        if self.role_cache is not None:
+            self.role_cache.refresh(force=True)
+            roles = self.iter_all_roles()
+            try:
+                role_ids = [
+                    role_id for role_id, _ in itertools.islice(
+                        roles, self.rbac_builder.get_app.config["RBAC_ROLE_CACHE_SIZE"]
+                    )
+                ]
+            finally:
+                roles.close()
+            for start in range(0, len(role_ids), self.bulk_chunk_size):
+                self.role_cache.get_many(role_ids[start:start + self.bulk_chunk_size])
+        self.tenant_cache.refresh(force=True)
+        self.tenant_cache.get(None)
+        self._release_session()
+        self.get_session.get_bind(mapper=None, clause=None).dispose()
+        if self._read_engine is not None:
+            self._read_engine.dispose()
+
+    def release_thread_resources(self):
+        """
+            Removes the thread scoped session used by an async view check,
+            the objects it loaded (current_user) are detached, see
+            `adopt_current_user`
+        """
+        self._release_session()
+
+    def _release_session(self):
+        session = self.get_session
+        # A plain session given to init_app is closed, not removed
+        if hasattr(session, "remove"):
+            session.remove()
+        else:
+            session.close()
+
+    def adopt_current_user(self):
+        """
+            Merges the user loaded by the check thread, detached when its
+            session was removed, into this thread session so current_user
+            lazy loads its relationships again
+        """
+        jwt_user = g.get("_jwt_extended_jwt_user")
+        if jwt_user and jwt_user.get("loaded_user") is not None:
+            jwt_user["loaded_user"] = self.get_session.merge(
+                jwt_user["loaded_user"], load=False
+            )
+
+    def find_schema_version(self) -> Optional[int]:
+        """
+            Returns the stamped schema version, None if there is no stamp
+        """
+        try:
+            return self.get_session.query(
+                func.max(self.schemaversion_model.version)
+            ).scalar()
+        except SQLAlchemyError:
+            self.get_session.rollback()
+            return None
+
+    def stamp_schema_version(self, version: int):
+        self.get_session.merge(self.schemaversion_model(id=1, version=version))
+        self.get_session.commit()
+        log.info(c.LOGMSG_INF_SEC_UPD_DB.format(version))
+
     """
     -----------------------
      PERMISSION MANAGEMENT
@@ -58,13 +437,22 @@ class SecurityManager(BaseSecurityManager):
     ----------------------
     """
 
-    def add_role(self, name: str) -> Optional[Role]:
-        role = self.find_role(name)
+    def add_role(self, name: str, tenant: str = None) -> Optional[Role]:
+        role = self.find_role(name, tenant)
         if role is None:
             try:
                 role = self.role_model()
                 role.name = name
+                role.tenant = tenant
                 self.get_session.add(role)
+                self.get_session.flush()
+                self.add_change(
+                    c.CHANGE_CREATE,
+                    c.CHANGE_TARGET_ROLE,
+                    role_id=role.id,
+                    tenant=tenant,
+                    name=name,
+                )
                 self.get_session.commit()
                 log.info(c.LOGMSG_INF_SEC_ADD_ROLE.format(name))
                 return role
@@ -80,6 +468,13 @@ class SecurityManager(BaseSecurityManager):
         try:
             role.name = name
             self.get_session.merge(role)
+            self.add_change(
+                c.CHANGE_UPDATE,
+                c.CHANGE_TARGET_ROLE,
+                role_id=pk,
+                tenant=role.tenant,
+                name=name,
+            )
             self.get_session.commit()
             log.info(c.LOGMSG_INF_SEC_UPD_ROLE.format(role))
             return role
@@ -88,8 +483,12 @@ class SecurityManager(BaseSecurityManager):
             self.get_session.rollback()
             return
 
-    def find_role(self, name):
-        return self.get_session.query(self.role_model).filter_by(name=name).first()
+    def find_role(self, name, tenant: str = None):
+        return (
+            self.get_session.query(self.role_model)
+                .filter_by(name=name, tenant=tenant)
+                .first()
+        )
 
     def find_role_by_id(self, pk):
         return self.get_session.query(self.role_model).filter_by(id=pk).first()
@@ -97,12 +496,34 @@ class SecurityManager(BaseSecurityManager):
     def get_all_roles(self):
         return self.get_session.query(self.role_model).all()
 
+    def iter_all_roles(self) -> Iterator[Tuple[str, str]]:
+        role = self.role_model.__table__
+        return self.stream_read(select([role.c.id, role.c.name]), primary=True)
+
     def del_role(self, pk):
         role = self.get_session.query(self.role_model).get(pk)
-        if not role or role.name == "Super Admin" or role.name == "Public":
+        if not role or (
+                role.tenant is None and
+                role.name in (self.auth_role_admin, self.auth_role_public)
+        ):
             return False
         try:
             self.get_session.delete(role)
+            self.get_session.flush()
+            # Grants are not left to the foreign key cascade, SQLite
+            # does not enforce it and the checks do not join role
+            self.get_session.execute(
+                assoc_permissionview_role.delete().where(
+                    assoc_permissionview_role.c.role_id == pk
+                )
+            )
+            self.add_change(
+                c.CHANGE_DELETE,
+                c.CHANGE_TARGET_ROLE,
+                role_id=pk,
+                tenant=role.tenant,
+                name=role.name,
+            )
             self.get_session.commit()
             log.info(c.LOGMSG_INF_SEC_UPD_ROLE.format(role))
             return True
@@ -118,12 +539,25 @@ class SecurityManager(BaseSecurityManager):
     """
 
     def get_public_role(self):
+        # A tenant role with the same name must not become the anonymous role
         return (
             self.get_session.query(self.role_model)
-                .filter_by(name=self.auth_role_public)
+                .filter_by(name=self.auth_role_public, tenant=None)
                 .first()
         )
 
+    def get_public_role_id(self):
+        role_table = self.role_model.__table__
+        rows = self.execute_cached(
+            "public_role_id",
+            lambda: select([role_table.c.id]).where(
+                and_(role_table.c.name == bindparam("role_name"), role_table.c.tenant.is_(None))
+            ),
+            role_name=self.auth_role_public,
+        )
+        if rows:
+            return rows[0][0]
+
     def get_public_permissions(self):
         role = self.get_public_role()
         if role:
@@ -138,22 +572,49 @@ class SecurityManager(BaseSecurityManager):
             self.get_session.query(self.permission_model).filter_by(name=name).first()
         )
 
+    def _baked_permission_views_by_roles(self):
+        """
+            Baked query of the permission views granted to the
+            :role_ids roles, cached per models
+        """
+        return _bakery(
+            lambda session: (
+                session.query(self.permissionview_model)
+                    .join(
+                    assoc_permissionview_role,
+                    and_(
+                        (self.permissionview_model.id ==
+                         assoc_permissionview_role.c.permission_view_id),
+                    ),
+                )
+                    .join(self.permission_model)
+                    .join(self.viewmenu_model)
+                    .options(
+                    contains_eager(self.permissionview_model.permission),
+                    contains_eager(self.permissionview_model.view_menu),
+                )
+                    .filter(
+                    assoc_permissionview_role.c.role_id.in_(
+                        bindparam("role_ids", expanding=True)
+                    )
+                )
+            ),
+            self.permissionview_model,
+            self.permission_model,
+            self.viewmenu_model,
+        )
+
+    def _baked_session(self):
+        session = self.get_session
+        if isinstance(session, scoped_session):
+            return session()
+        return session
+
     def find_roles_permission_view_menus(self, permission_name: str, role_ids: List[int]):
-        return (
-            self.rbac_builder.get_session.query(self.permissionview_model)
-                .join(
-                assoc_permissionview_role,
-                and_(
-                    (self.permissionview_model.id ==
-                     assoc_permissionview_role.c.permission_view_id),
-                ),
-            )
-                .join(self.role_model)
-                .join(self.permission_model)
-                .join(self.viewmenu_model)
-                .filter(
-                self.permission_model.name == permission_name,
-                self.role_model.id.in_(role_ids))
+        query = self._baked_permission_views_by_roles()
+        query += lambda q: q.filter(self.permission_model.name == bindparam("permission_name"))
+        return query(self._baked_session()).params(
+            role_ids=list(role_ids), permission_name=permission_name
         ).all()
 
     def find_permission_view_by_roles(
@@ -161,22 +622,322 @@ class SecurityManager(BaseSecurityManager):
             role_ids: List[int],
             no_menu=True
     ):
+        query = self._baked_permission_views_by_roles()
+        if no_menu:
+            query += lambda q: q.filter(self.permission_model.name != "menu_access")
+        return query(self._baked_session()).params(role_ids=list(role_ids)).all()
+
+    def _permission_view_join(self):
+        """
+            permission_view_role joined to its permission view and the
+            permission and view_menu tables, role ids are filtered on
+            permission_view_role.role_id without joining role
+        """
+        pv = self.permissionview_model.__table__
         return (
-            self.rbac_builder.get_session.query(self.permissionview_model)
+            assoc_permissionview_role
+                .join(pv, pv.c.id == assoc_permissionview_role.c.permission_view_id)
                 .join(
-                assoc_permissionview_role,
-                and_(
-                    (self.permissionview_model.id ==
-                     assoc_permissionview_role.c.permission_view_id),
+                self.permission_model.__table__,
+                self.permission_model.__table__.c.id == pv.c.permission_id,
+            )
+                .join(
+                self.viewmenu_model.__table__,
+                self.viewmenu_model.__table__.c.id == pv.c.view_menu_id,
+            )
+        )
+
+    def _permission_view_role_join(self):
+        """
+            `_permission_view_join` with the role table, for the queries
+            reading role columns
+        """
+        return self._permission_view_join().join(
+            self.role_model.__table__,
+            self.role_model.__table__.c.id == assoc_permissionview_role.c.role_id,
+        )
+
+    def _permission_id_query(self, permission_name):
+        """
+            Scalar subquery of the id of a permission, a probe of the
+            permission name unique index
+        """
+        permission = self.permission_model.__table__
+        return select([permission.c.id]).where(permission.c.name == permission_name).as_scalar()
+
+    def _permission_view_id_query(self, view_name, permission_name):
+        """
+            Scalar subquery of the id of a permission view, probes of the
+            names unique indexes and of the permission_view unique index
+        """
+        pv = self.permissionview_model.__table__
+        view_menu = self.viewmenu_model.__table__
+        return select([pv.c.id]).where(
+            and_(
+                pv.c.permission_id == self._permission_id_query(permission_name),
+                pv.c.view_menu_id == (
+                    select([view_menu.c.id]).where(view_menu.c.name == view_name).as_scalar()
                 ),
             )
-                .join(self.role_model)
-                .join(self.permission_model)
-                .join(self.viewmenu_model)
-                .filter(
-                self.permission_model.name != 'menu_access' if no_menu else self.permission_model.name is not None,
-                self.role_model.id.in_(role_ids))
-        ).all()
+        ).as_scalar()
+
+    def _roles_view_menus_statement(self, permission_name, role_ids, key: str = "name"):
+        """
+            The views menus (names, or ids with key="id") on which
+            `role_ids` have `permission_name`, from the grants role index
+        """
+        pv = self.permissionview_model.__table__
+        grants = assoc_permissionview_role.join(
+            pv, pv.c.id == assoc_permissionview_role.c.permission_view_id
+        )
+        if key == "id":
+            column = pv.c.view_menu_id
+        else:
+            view_menu = self.viewmenu_model.__table__
+            grants = grants.join(view_menu, view_menu.c.id == pv.c.view_menu_id)
+            column = view_menu.c[key]
+        return (
+            select([column])
+                .select_from(grants)
+                .where(
+                and_(
+                    assoc_permissionview_role.c.role_id.in_(role_ids),
+                    pv.c.permission_id == self._permission_id_query(permission_name),
+                )
+            )
+        )
+
+    def find_roles_view_menu_names(
+            self,
+            permission_name: str,
+            role_ids: List[int]
+    ) -> List[str]:
+        """
+            Core version of `find_roles_permission_view_menus`, runs
+            on the read engine and returns only the views menu names
+        """
+        rows = self.execute_cached(
+            "roles_view_menu_names",
+            lambda: self._roles_view_menus_statement(
+                bindparam("permission_name"), bindparam("role_ids", expanding=True)
+            ),
+            permission_name=permission_name,
+            role_ids=list(role_ids),
+        )
+        return [row[0] for row in rows]
+
+    def _permission_view_by_roles_statement(self, no_menu=True):
+        """
+            Statement of the permission view tuples of the :role_ids roles
+        """
+        def build():
+            permission = self.permission_model.__table__
+            statement = (
+                select([
+                    self.permissionview_model.__table__.c.id,
+                    permission.c.name,
+                    self.viewmenu_model.__table__.c.name,
+                ])
+                    .select_from(self._permission_view_join())
+                    .where(
+                    assoc_permissionview_role.c.role_id.in_(
+                        bindparam("role_ids", expanding=True)
+                    )
+                )
+            )
+            if no_menu:
+                statement = statement.where(permission.c.name != "menu_access")
+            return statement
+
+        return "permission_view_by_roles:{0}".format(no_menu), build
+
+    def allowed_view_menus_query(
+            self,
+            permission_name: str,
+            role_ids: List[str] = None,
+            key: str = "name",
+    ):
+        """
+            Subquery of the views menus names (or ids with key="id") on
+            which the current user (or `role_ids`) has `permission_name`,
+            built like `find_roles_view_menu_names`. Meant to be embedded
+            in an application query, see `permission_filter`
+        """
+        if role_ids is None:
+            role_ids = self.get_current_role_ids()
+        if role_ids is None:
+            # include public role
+            role_ids = [self.get_public_role_id()]
+        return self._roles_view_menus_statement(permission_name, role_ids, key)
+
+    def permission_filter(
+            self,
+            column,
+            permission_name: str,
+            role_ids: List[str] = None,
+            key: str = "name",
+    ):
+        """
+            Filter clause keeping the rows whose `column` holds the name
+            (or id with key="id") of a views menu on which the current user
+            has `permission_name`, so the database filters and pages the
+            accessible rows in one pass::
+
+                query.filter(sm.permission_filter(Document.view_name, "can_read"))
+
+            :param column: Column of the application table
+            :param permission_name: The permission: can_read, can_edit...
+            :param role_ids: Filter for these role ids instead of the current request ones
+            :param key: "name" or "id", what `column` holds
+        """
+        return column.in_(
+            self.allowed_view_menus_query(permission_name, role_ids, key)
+        )
+
+    def find_permission_view_tuples_by_roles(
+            self,
+            role_ids: List[int],
+            no_menu=True
+    ) -> List[Tuple[str, str, str]]:
+        """
+            Core version of `find_permission_view_by_roles`, runs on the
+            read engine and returns (id, permission name, views name) tuples
+        """
+        name, build = self._permission_view_by_roles_statement(no_menu)
+        return [tuple(row) for row in self.execute_cached(name, build, role_ids=list(role_ids))]
+
+    def iter_permission_view_by_roles(
+            self,
+            role_ids: List[int],
+            no_menu=True
+    ) -> Iterator[Tuple[str, str, str]]:
+        name, build = self._permission_view_by_roles_statement(no_menu)
+        return self.stream_read(
+            self.read_statement(name, build), params={"role_ids": list(role_ids)}
+        )
+
+    def iter_role_grants(self) -> Iterator[Tuple[str, str, str, str]]:
+        return self.stream_read(self._grants_statement(), primary=True)
+
+    def _find_grants(self, criterion, join=None) -> Dict[str, Dict]:
+        statement = (
+            select([
+                assoc_permissionview_role.c.role_id,
+                self.viewmenu_model.__table__.c.name,
+                self.permission_model.__table__.c.name,
+                self.permissionview_model.__table__.c.id,
+            ])
+                .select_from(join if join is not None else self._permission_view_join())
+                .where(criterion)
+        )
+        grants = dict()
+        for role_id, view_name, permission_name, pv_id in self.execute_read(statement):
+            grants.setdefault(role_id, dict())[(view_name, permission_name)] = pv_id
+        return grants
+
+    def find_role_grants(self, role_ids: List[str]) -> Dict[str, Dict]:
+        return self._find_grants(assoc_permissionview_role.c.role_id.in_(role_ids))
+
+    def find_tenant_grants(self, tenant: Optional[str]) -> Dict[str, Dict]:
+        return self._find_grants(
+            self.role_model.__table__.c.tenant == tenant, self._permission_view_role_join()
+        )
+
+    def get_roles_with_permission(
+            self,
+            permission_name: str,
+            view_name: str,
+    ) -> List[Tuple[str, str]]:
+        role = self.role_model.__table__
+        statement = (
+            select([role.c.id, role.c.name])
+                .select_from(self._permission_view_role_join())
+                .where(
+                and_(
+                    self.viewmenu_model.__table__.c.name == view_name,
+                    self.permission_model.__table__.c.name == permission_name,
+                )
+            )
+        )
+        return [tuple(row) for row in self.get_session.execute(statement)]
+
+    def _grants_statement(self):
+        return (
+            select([
+                assoc_permissionview_role.c.role_id,
+                self.permissionview_model.__table__.c.id,
+                self.permission_model.__table__.c.name,
+                self.viewmenu_model.__table__.c.name,
+            ])
+                .select_from(self._permission_view_role_join())
+        )
+
+    def find_grants_by_permission_views(
+            self,
+            permission_views: Iterable[Tuple[str, str]],
+    ) -> List[Tuple[str, str, str, str]]:
+        """
+            Runs on the session, the grants feed maintenance writes. The
+            pairs are resolved to permission view ids `lookup_chunk_size`
+            at a time, then the grants are read through the
+            (permission_view_id, role_id) unique index
+        """
+        pv_ids = self._find_permission_view_ids(permission_views)
+        result = []
+        for start in range(0, len(pv_ids), self.bulk_chunk_size):
+            statement = self._grants_statement().where(
+                assoc_permissionview_role.c.permission_view_id.in_(
+                    pv_ids[start:start + self.bulk_chunk_size]
+                )
+            )
+            result.extend(tuple(row) for row in self.get_session.execute(statement))
+        return result
+
+    def _find_permission_view_ids(
+            self,
+            permission_views: Iterable[Tuple[str, str]],
+    ) -> List[str]:
+        """
+            Returns the ids of the (views name, permission name) pairs that
+            exist. Each chunk filters on the names with two IN lists and
+            keeps the requested pairs, flat expressions whatever the
+            number of pairs
+        """
+        pv = self.permissionview_model.__table__
+        view_menu = self.viewmenu_model.__table__
+        permission = self.permission_model.__table__
+        keys = list(permission_views)
+        result = []
+        for start in range(0, len(keys), self.lookup_chunk_size):
+            chunk = set(keys[start:start + self.lookup_chunk_size])
+            statement = (
+                select([pv.c.id, view_menu.c.name, permission.c.name])
+                    .select_from(
+                    pv.join(view_menu, view_menu.c.id == pv.c.view_menu_id)
+                        .join(permission, permission.c.id == pv.c.permission_id)
+                )
+                    .where(
+                    and_(
+                        view_menu.c.name.in_(sorted({view_name for view_name, _ in chunk})),
+                        permission.c.name.in_(sorted({name for _, name in chunk})),
+                    )
+                )
+            )
+            result.extend(
+                pv_id
+                for pv_id, view_name, permission_name in self.get_session.execute(statement)
+                if (view_name, permission_name) in chunk
+            )
+        return result
+
+    def find_grants_by_view_menus(
+            self,
+            view_names: Iterable[str],
+    ) -> List[Tuple[str, str, str, str]]:
+        statement = self._grants_statement().where(
+            self.viewmenu_model.__table__.c.name.in_(list(view_names))
+        )
+        return [tuple(row) for row in self.get_session.execute(statement)]
 
     def exist_permission_on_roles(
             self,
@@ -193,29 +954,36 @@ class SecurityManager(BaseSecurityManager):
         :param role_ids: a list of Role ids
         :return: Boolean
         """
-        q = (
-            self.rbac_builder.get_session.query(self.permissionview_model)
-                .join(
-                assoc_permissionview_role,
+        rows = self.execute_cached(
+            "exist_permission_on_roles",
+            self._exist_permission_on_roles_statement,
+            view_name=view_name,
+            permission_name=permission_name,
+            role_ids=list(role_ids),
+        )
+        return bool(rows and rows[0][0])
+
+    def _exist_permission_on_roles_statement(self):
+        # Resolves the permission view id and probes the
+        # (permission_view_id, role_id) unique index of the grants
+        q = exists(
+            select([literal(True)])
+                .select_from(assoc_permissionview_role)
+                .where(
                 and_(
-                    (self.permissionview_model.id ==
-                     assoc_permissionview_role.c.permission_view_id),
-                ),
-            )
-                .join(self.role_model)
-                .join(self.permission_model)
-                .join(self.viewmenu_model)
-                .filter(
-                self.viewmenu_model.name == view_name,
-                self.permission_model.name == permission_name,
-                self.role_model.id.in_(role_ids),
+                    assoc_permissionview_role.c.permission_view_id == self._permission_view_id_query(
+                        bindparam("view_name"), bindparam("permission_name")
+                    ),
+                    assoc_permissionview_role.c.role_id.in_(
+                        bindparam("role_ids", expanding=True)
+                    ),
+                )
             )
-                .exists()
         )
         # Special case for MSSQL/Oracle (works on PG and MySQL > 8)
-        if self.rbac_builder.get_session.bind.dialect.name in ("mssql", "oracle"):
-            return self.rbac_builder.get_session.query(literal(True)).filter(q).scalar()
-        return self.rbac_builder.get_session.query(q).scalar()
+        if self.read_dialect_name in ("mssql", "oracle"):
+            return select([literal(True)]).where(q)
+        return select([q])
 
     def add_permission(self, name):
         """
@@ -230,6 +998,7 @@ class SecurityManager(BaseSecurityManager):
                 perm = self.permission_model()
                 perm.name = name
                 self.get_session.add(perm)
+                self.add_change(c.CHANGE_CREATE, c.CHANGE_TARGET_PERMISSION, name=name)
                 self.get_session.commit()
                 return perm
             except Exception as e:
@@ -256,6 +1025,7 @@ class SecurityManager(BaseSecurityManager):
                 log.warning(c.LOGMSG_WAR_SEC_DEL_PERM_PVM.format(perm, pvms))
                 return False
             self.get_session.delete(perm)
+            self.add_change(c.CHANGE_DELETE, c.CHANGE_TARGET_PERMISSION, name=name)
             self.get_session.commit()
             return True
         except Exception as e:
@@ -278,6 +1048,12 @@ class SecurityManager(BaseSecurityManager):
     def get_all_view_menu(self):
         return self.get_session.query(self.viewmenu_model).all()
 
+    def iter_all_view_menu(self) -> Iterator[Tuple[str, str]]:
+        view_menu = self.viewmenu_model.__table__
+        return self.stream_read(
+            select([view_menu.c.id, view_menu.c.name]), primary=True
+        )
+
     def add_view_menu(self, name):
         """
             Adds a views or menu to the backend, models view_menu
@@ -290,6 +1066,7 @@ class SecurityManager(BaseSecurityManager):
                 view_menu = self.viewmenu_model()
                 view_menu.name = name
                 self.get_session.add(view_menu)
+                self.add_change(c.CHANGE_CREATE, c.CHANGE_TARGET_VIEW_MENU, name=name)
                 self.get_session.commit()
                 return view_menu
             except Exception as e:
@@ -316,6 +1093,7 @@ class SecurityManager(BaseSecurityManager):
                 log.warning(c.LOGMSG_WAR_SEC_DEL_VIEWMENU_PVM.format(view_menu, pvms))
                 return False
             self.get_session.delete(view_menu)
+            self.add_change(c.CHANGE_DELETE, c.CHANGE_TARGET_VIEW_MENU, name=name)
             self.get_session.commit()
             return True
         except Exception as e:
@@ -385,6 +1163,14 @@ class SecurityManager(BaseSecurityManager):
         pv.view_menu_id, pv.permission_id = vm.id, perm.id
         try:
             self.get_session.add(pv)
+            self.get_session.flush()
+            self.add_change(
+                c.CHANGE_CREATE,
+                c.CHANGE_TARGET_PERMISSION_VIEW,
+                permission_view_id=pv.id,
+                permission_name=permission_name,
+                view_menu_name=view_menu_name,
+            )
             self.get_session.commit()
             log.info(c.LOGMSG_INF_SEC_ADD_PERMVIEW.format(str(pv)))
             return pv
@@ -411,6 +1197,13 @@ class SecurityManager(BaseSecurityManager):
         try:
             # delete permission on views
             self.get_session.delete(pv)
+            self.add_change(
+                c.CHANGE_DELETE,
+                c.CHANGE_TARGET_PERMISSION_VIEW,
+                permission_view_id=pv.id,
+                permission_name=permission_name,
+                view_menu_name=view_menu_name,
+            )
             self.get_session.commit()
             # if no more permission on permission views, delete permission
             if not cascade:
@@ -453,6 +1246,13 @@ class SecurityManager(BaseSecurityManager):
             try:
                 role.permissions.append(perm_view)
                 self.get_session.merge(role)
+                self.add_change(
+                    c.CHANGE_GRANT,
+                    c.CHANGE_TARGET_ROLE,
+                    role_id=role.id,
+                    tenant=role.tenant,
+                    permission_view_id=perm_view.id,
+                )
                 self.get_session.commit()
                 log.info(
                     c.LOGMSG_INF_SEC_ADD_PERMROLE.format(str(perm_view), role.name)
@@ -474,6 +1274,13 @@ class SecurityManager(BaseSecurityManager):
             try:
                 role.permissions.remove(perm_view)
                 self.get_session.merge(role)
+                self.add_change(
+                    c.CHANGE_REVOKE,
+                    c.CHANGE_TARGET_ROLE,
+                    role_id=role.id,
+                    tenant=role.tenant,
+                    permission_view_id=perm_view.id,
+                )
                 self.get_session.commit()
                 log.info(
                     c.LOGMSG_INF_SEC_DEL_PERMROLE.format(str(perm_view), role.name)
@@ -483,10 +1290,229 @@ class SecurityManager(BaseSecurityManager):
                 self.get_session.rollback()
 
     def update_permissions_role(self, role, perm_views):
+        """
+            Replaces all the permissions of a role, see `update_permissions_roles`
+
+            :param role:
+                The role object
+            :param perm_views:
+                List of PermissionViewMenu objects
+        """
+        self.update_permissions_roles({role.id: [pv.id for pv in perm_views]})
+
+    def _find_existing_permission_view_ids(self, pv_ids: Iterable[str]) -> Set[str]:
+        """
+            Returns the ids of `pv_ids` found on permission_view
+        """
+        pv = self.permissionview_model.__table__
+        pv_ids = list(pv_ids)
+        result = set()
+        for start in range(0, len(pv_ids), self.bulk_chunk_size):
+            result.update(
+                row[0] for row in self.get_session.execute(
+                    select([pv.c.id]).where(
+                        pv.c.id.in_(pv_ids[start:start + self.bulk_chunk_size])
+                    )
+                )
+            )
+        return result
+
+    def update_permissions_roles(
+            self,
+            role_permission_views: Dict[str, Iterable[str]]
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+            Sets the permission views granted to one or many roles.
+            Computes the difference against permission_view_role and applies
+            it without loading ORM objects: one multi-row insert (per
+            `bulk_chunk_size` rows) and one delete per changed role (per
+            `bulk_chunk_size` revoked grants). Role and permission view ids
+            that do not exist are logged and skipped, instead of failing the
+            whole batch on the foreign key or, without foreign keys, leaving
+            dangling grants.
+
+            :param role_permission_views:
+                role id -> all the permission view ids the role must have
+            :return: role id -> (number of grants added, number removed)
+        """
+        assoc = assoc_permissionview_role
+        role = self.role_model.__table__
+        role_ids = list(role_permission_views)
+        current = dict()
+        tenants = dict()
+        rows = self.get_session.execute(
+            select([role.c.id, role.c.tenant, assoc.c.permission_view_id])
+                .select_from(role.outerjoin(assoc, assoc.c.role_id == role.c.id))
+                .where(role.c.id.in_(role_ids))
+        )
+        for role_id, tenant, permission_view_id in rows:
+            tenants[role_id] = tenant
+            if permission_view_id is not None:
+                current.setdefault(role_id, set()).add(permission_view_id)
+        unknown = [role_id for role_id in role_ids if role_id not in tenants]
+        if unknown:
+            log.warning(c.LOGMSG_WAR_SEC_UNKNOWN_ROLES.format(unknown))
+            role_permission_views = {
+                role_id: permission_view_ids
+                for role_id, permission_view_ids in role_permission_views.items()
+                if role_id in tenants
+            }
+        added = set()
+        for role_id, permission_view_ids in role_permission_views.items():
+            added.update(set(permission_view_ids) - current.get(role_id, set()))
+        known = self._find_existing_permission_view_ids(added)
+        if added - known:
+            log.warning(c.LOGMSG_WAR_SEC_UNKNOWN_PERMVIEWS.format(sorted(added - known)))
+
+        result = dict()
+        inserts = list()
+        changes = list()
         try:
-            role.permissions = perm_views
-            self.get_session.merge(role)
+            for role_id, permission_view_ids in role_permission_views.items():
+                target = set(permission_view_ids)
+                existing = current.get(role_id, set())
+                to_add = (target - existing) & known
+                to_del = existing - target
+                inserts.extend(
+                    {
+                        "id": generate_uuid(),
+                        "role_id": role_id,
+                        "permission_view_id": permission_view_id,
+                    }
+                    for permission_view_id in to_add
+                )
+                changes.extend(
+                    self._change_row(
+                        c.CHANGE_GRANT,
+                        c.CHANGE_TARGET_ROLE,
+                        role_id=role_id,
+                        tenant=tenants.get(role_id),
+                        permission_view_id=permission_view_id,
+                    )
+                    for permission_view_id in to_add
+                )
+                changes.extend(
+                    self._change_row(
+                        c.CHANGE_REVOKE,
+                        c.CHANGE_TARGET_ROLE,
+                        role_id=role_id,
+                        tenant=tenants.get(role_id),
+                        permission_view_id=permission_view_id,
+                    )
+                    for permission_view_id in to_del
+                )
+                to_del = list(to_del)
+                for start in range(0, len(to_del), self.bulk_chunk_size):
+                    self.get_session.execute(
+                        assoc.delete().where(
+                            and_(
+                                assoc.c.role_id == role_id,
+                                assoc.c.permission_view_id.in_(
+                                    to_del[start:start + self.bulk_chunk_size]
+                                ),
+                            )
+                        )
+                    )
+                result[role_id] = (len(to_add), len(to_del))
+            for start in range(0, len(inserts), self.bulk_chunk_size):
+                self.get_session.execute(
+                    assoc.insert().values(inserts[start:start + self.bulk_chunk_size])
+                )
+            if self.change_log_enabled:
+                change_log = self.changelog_model.__table__
+                for start in range(0, len(changes), self.bulk_chunk_size):
+                    self.get_session.execute(
+                        change_log.insert().values(
+                            changes[start:start + self.bulk_chunk_size]
+                        )
+                    )
             self.get_session.commit()
+            for role_id, (added, removed) in result.items():
+                log.info(c.LOGMSG_INF_SEC_UPD_PERMROLE.format(role_id, added, removed))
+            return result
         except Exception as e:
             log.error(c.LOGMSG_ERR_SEC_ADD_PERMROLE.format(str(e)))
-            self.get_session.rollback()
\ No newline at end of file
+            self.get_session.rollback()
+            return dict()
+
+    """
+    ------------
+     CHANGE LOG
+    ------------
+    """
+
+    @property
+    def change_log_enabled(self) -> bool:
+        return self.rbac_builder.get_app.config["RBAC_CHANGE_LOG"]
+
+    @staticmethod
+    def _change_row(
+            operation: str,
+            target: str,
+            role_id: str = None,
+            tenant: str = None,
+            permission_view_id: str = None,
+            name: str = None,
+            permission_name: str = None,
+            view_menu_name: str = None,
+    ) -> Dict:
+        return {
+            "operation": operation,
+            "target": target,
+            "role_id": role_id,
+            "tenant": tenant,
+            "permission_view_id": permission_view_id,
+            "name": name,
+            "permission_name": permission_name,
+            "view_menu_name": view_menu_name,
+            "created_on": datetime.datetime.utcnow(),
+        }
+
+    def add_change(self, operation: str, target: str, **kwargs) -> None:
+        """
+            Records a change on the change log, on the current transaction
+            so it is committed (or rolled back) with the change itself
+
+            :param operation: One of the const.CHANGE_* operations
+            :param target: One of the const.CHANGE_TARGET_* objects
+        """
+        if self.change_log_enabled:
+            self.get_session.add(
+                self.changelog_model(**self._change_row(operation, target, **kwargs))
+            )
+
+    def get_changes_since(self, seq: int, limit: int = None) -> List[RBACChange]:
+        """
+            Returns the changes recorded after the `seq` sequence number,
+            oldest first. Sequence numbers are assigned on insert, a
+            transaction committing late can add a change below the last
+            seq a reader has seen; readers that need every change should
+            re-read a small window before their last seq.
+
+            :param seq: Last sequence number already applied, 0 for all
+            :param limit: Max number of changes to return
+        """
+        change_log = self.changelog_model.__table__
+        statement = (
+            select([
+                change_log.c.seq,
+                change_log.c.operation,
+                change_log.c.target,
+                change_log.c.role_id,
+                change_log.c.tenant,
+                change_log.c.permission_view_id,
+                change_log.c.name,
+                change_log.c.permission_name,
+                change_log.c.view_menu_name,
+            ])
+                .where(change_log.c.seq > seq)
+                .order_by(change_log.c.seq)
+        )
+        if limit is not None:
+            statement = statement.limit(limit)
+        return [RBACChange(*row) for row in self.execute_read(statement)]
+
+    def get_last_change_seq(self) -> int:
+        change_log = self.changelog_model.__table__
+        rows = self.execute_read(select([func.max(change_log.c.seq)]))
+        return rows[0][0] or 0
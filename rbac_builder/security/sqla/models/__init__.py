@@ -2,3 +2,5 @@ from .permission import Permission
 from .permission_view import PermissionView
 from .view_menu import ViewMenu
 from .role import Role, assoc_permissionview_role
+from .schema_version import SchemaVersion
+from .change_log import ChangeLog
@@ -0,0 +1,31 @@
+import datetime
+
+from sqlalchemy import Column
+from sqlalchemy import (
+    DateTime, Integer, String
+)
+
+from rbac_builder.models import Model
+
+
+class ChangeLog(Model):
+    """
+        Append only log of the changes done by the security manager
+        primitives, `seq` orders the changes
+    """
+    __tablename__ = "rbac_change_log"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    operation = Column(String(16), nullable=False)
+    target = Column(String(32), nullable=False)
+    role_id = Column(String(36))
+    tenant = Column(String(64))
+    permission_view_id = Column(String(36))
+    name = Column(String(255))
+    permission_name = Column(String(100))
+    view_menu_name = Column(String(100))
+    created_on = Column(DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return "{0} {1} {2}".format(self.seq, self.operation, self.target)
@@ -14,7 +14,7 @@ class PermissionView(Model):
     id = Column(String(36), primary_key=True, default=generate_uuid)
     permission_id = Column(String(36), ForeignKey("permission.id", ondelete='CASCADE'))
     permission = relationship("Permission", backref=backref('permission', passive_deletes=True))
-    view_menu_id = Column(String(36), ForeignKey("view_menu.id", ondelete='CASCADE'))
+    view_menu_id = Column(String(36), ForeignKey("view_menu.id", ondelete='CASCADE'), index=True)
     view_menu = relationship("ViewMenu", backref=backref('view_menu', passive_deletes=True))
 
     def __repr__(self):
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Index, UniqueConstraint
 from sqlalchemy import (
-    String, Table
+    String, Table, text
 )
 from sqlalchemy.orm import relationship
 
@@ -15,13 +15,30 @@ assoc_permissionview_role = Table(
            ForeignKey("permission_view.id", ondelete='CASCADE')),
     Column("role_id", String(36), ForeignKey("role.id", ondelete='CASCADE')),
     UniqueConstraint("permission_view_id", "role_id"),
+    # The access checks and listings filter the grants by role id
+    Index("ix_permission_view_role_role_id", "role_id", "permission_view_id"),
 )
 
 
 class Role(Model):
     __tablename__ = "role"
+    __table_args__ = (
+        UniqueConstraint("name", "tenant"),
+        # NULL tenants are distinct above, global role names are unique
+        # through a partial index (a plain unique name index where partial
+        # indexes are not supported)
+        Index(
+            "ux_role_name_global",
+            "name",
+            unique=True,
+            sqlite_where=text("tenant IS NULL"),
+            postgresql_where=text("tenant IS NULL"),
+        ),
+    )
     id = Column(String(36), primary_key=True, default=generate_uuid)
-    name = Column(String(64), unique=True, nullable=False)
+    name = Column(String(64), nullable=False)
+    # Roles without a tenant are global and apply to every tenant
+    tenant = Column(String(64), index=True)
     permissions = relationship(
         "PermissionView", secondary=assoc_permissionview_role, backref="role", passive_deletes=True
     )
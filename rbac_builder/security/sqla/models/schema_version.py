@@ -0,0 +1,20 @@
+from sqlalchemy import Column
+from sqlalchemy import (
+    Integer
+)
+
+from rbac_builder.models import Model
+
+
+class SchemaVersion(Model):
+    """
+        Single row stamp with the version of the security tables,
+        checked on boot instead of reflecting the database catalog
+    """
+    __tablename__ = "rbac_schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return str(self.version)
@@ -0,0 +1,220 @@
+"""
+    Testing helpers for applications built on rbac_builder.
+
+    Use `assert_max_statements` to fail a test when a block of code issues
+    more SQL statements than expected, this catches lazy loads that turn
+    simple operations into N+1 query storms::
+
+        from rbac_builder.testing import assert_max_statements
+
+        def test_has_access(app, db):
+            with assert_max_statements(db.engine, 2):
+                app.rbac_builder.sm.has_access("can_list", "MyView")
+
+Subclass `CacheBackendConformance` to check a cache backend implements
+the `rbac_builder.cache.CacheBackend` contract::
+
+    from rbac_builder.testing import CacheBackendConformance
+
+    class TestMyBackend(CacheBackendConformance):
+        def make_backend(self):
+            return MyBackend()
+"""
+import contextlib
+import threading
+from typing import List
+
+from sqlalchemy import event
+
+
+class StatementBudgetExceeded(AssertionError):
+    """
+        Raised when a block issues more SQL statements than its budget
+    """
+
+
+class StatementCounter(object):
+    """
+        Counts the SQL statements executed on an engine while active.
+
+        Can be used as a context manager or started and stopped explicitly::
+
+            with StatementCounter(engine) as counter:
+                ...
+            print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: List[str] = []
+        self._active = False
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(
+            self, conn, cursor, statement, parameters, context, executemany
+    ):
+        self.statements.append(statement)
+
+    def start(self):
+        if not self._active:
+            event.listen(
+                self.engine, "before_cursor_execute", self._before_cursor_execute
+            )
+            self._active = True
+        return self
+
+    def stop(self):
+        if self._active:
+            event.remove(
+                self.engine, "before_cursor_execute", self._before_cursor_execute
+            )
+            self._active = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+@contextlib.contextmanager
+def assert_max_statements(engine, budget: int):
+    """
+        Context manager that fails if the block executes more than `budget`
+        SQL statements on `engine`.
+
+        :param engine: The SQLAlchemy engine to watch
+        :param budget: Maximum number of statements allowed
+        :raises StatementBudgetExceeded: If the budget is exceeded
+    """
+    counter = StatementCounter(engine)
+    with counter:
+        yield counter
+    if counter.count > budget:
+        raise StatementBudgetExceeded(
+            "Expected at most {0} statements, {1} were executed:\n{2}".format(
+                budget,
+                counter.count,
+                "\n".join(
+                    "{0}: {1}".format(i, statement)
+                    for i, statement in enumerate(counter.statements, start=1)
+                ),
+            )
+        )
+
+
+class FakeClock(object):
+    """
+        A clock advanced by hand, to test expiry without sleeping
+    """
+
+    def __init__(self, now: float = 1000000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class CacheBackendConformance(object):
+    """
+        Tests every `CacheBackend` must pass, collected by pytest on the
+        subclasses named `Test*` that implement `make_backend`
+    """
+
+    def make_backend(self):
+        """
+            Returns a new, empty backend
+        """
+        raise NotImplementedError
+
+    def _backend(self):
+        backend = self.make_backend()
+        backend.clock = FakeClock()
+        return backend
+
+    def test_get_set_delete(self):
+        backend = self._backend()
+        assert backend.get("a") is None
+        assert backend.get("a", "default") == "default"
+        backend.set("a", {"grants": [1, 2]})
+        assert backend.get("a") == {"grants": [1, 2]}
+        backend.set("a", "replaced")
+        assert backend.get("a") == "replaced"
+        assert backend.delete("a")
+        assert not backend.delete("a")
+        assert backend.get("a") is None
+
+    def test_falsy_values(self):
+        backend = self._backend()
+        backend.set("empty", {})
+        backend.set("zero", 0)
+        assert backend.get("empty", "default") == {}
+        assert backend.get("zero", "default") == 0
+
+    def test_get_many(self):
+        backend = self._backend()
+        backend.set_many({"a": 1, "b": 2})
+        assert backend.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+        assert backend.get_many([]) == {}
+
+    def test_clear(self):
+        backend = self._backend()
+        backend.set_many({"a": 1, "b": 2})
+        backend.clear()
+        assert backend.get_many(["a", "b"]) == {}
+
+    def test_ttl(self):
+        backend = self._backend()
+        backend.set("short", 1, ttl=10)
+        backend.set("long", 2, ttl=100)
+        backend.set("forever", 3)
+        backend.clock.advance(9)
+        assert backend.get("short") == 1
+        backend.clock.advance(1)
+        assert backend.get("short") is None
+        assert backend.get_many(["short", "long", "forever"]) == {"long": 2, "forever": 3}
+        backend.clock.advance(1000)
+        assert backend.get_many(["long", "forever"]) == {"forever": 3}
+
+    def test_version_tags(self):
+        backend = self._backend()
+        assert backend.get_version("role:1") == 0
+        backend.set("a", 1, tags=["role:1"])
+        backend.set("b", 2, tags=["role:1", "role:2"])
+        backend.set("c", 3, tags=["role:2"])
+        assert backend.bump_version("role:1") == 1
+        assert backend.get_version("role:1") == 1
+        assert backend.get_many(["a", "b", "c"]) == {"c": 3}
+        # Entries set after the bump are valid until the next one
+        backend.set("a", 4, tags=["role:1"])
+        assert backend.get("a") == 4
+        assert backend.bump_version("role:1") == 2
+        assert backend.get("a") is None
+
+    def test_threads(self):
+        backend = self._backend()
+        errors = []
+
+        def work(n):
+            try:
+                for i in range(50):
+                    backend.set("{0}:{1}".format(n, i), i, tags=["shared"])
+                    assert backend.get("{0}:{1}".format(n, i)) in (i, None)
+                    if i % 10 == 0:
+                        backend.bump_version("shared")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert backend.get_version("shared") == 20
@@ -0,0 +1,137 @@
+"""Per request RBAC timings, opt-in with RBAC_SERVER_TIMING
+
+Time spent verifying the JWT, resolving the roles, checking access and
+rendering menus is accumulated on `flask.g` with the number of SQL
+statements each section ran. Responses get a `Server-Timing` header and a
+log line with the totals. Sections can nest (menu rendering resolves roles),
+a statement is counted on the innermost running section.
+"""
+import logging
+import time
+from contextlib import nullcontext
+from typing import Dict
+
+from flask import g, has_request_context, request
+
+from .const import LOGMSG_INF_RBAC_TIMINGS
+
+log = logging.getLogger(__name__)
+
+_NULL_TIMER = nullcontext()
+_enabled = False
+""" Set once an app enables the timings, keeps `timed` free otherwise """
+
+
+class RequestTimings(object):
+    """
+        The RBAC sections timings of a request, by section name:
+        [seconds, calls, statements]
+    """
+
+    __slots__ = ("metrics", "active")
+
+    def __init__(self):
+        self.metrics = dict()
+        self.active = None
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "dur_ms": round(seconds * 1000, 3),
+                "calls": calls,
+                "statements": statements,
+            }
+            for name, (seconds, calls, statements) in self.metrics.items()
+        }
+
+    def header(self) -> str:
+        return ", ".join(
+            'rbac-{0};dur={1:.3f};desc="calls={2} statements={3}"'.format(
+                name, seconds * 1000, calls, statements
+            )
+            for name, (seconds, calls, statements) in self.metrics.items()
+        )
+
+
+class _Timer(object):
+    __slots__ = ("timings", "name", "parent", "start")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        metric = self.timings.metrics.get(self.name)
+        if metric is None:
+            self.timings.metrics[self.name] = [0.0, 0, 0]
+        self.parent = self.timings.active
+        self.timings.active = self.name
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        metric = self.timings.metrics[self.name]
+        metric[0] += time.perf_counter() - self.start
+        metric[1] += 1
+        self.timings.active = self.parent
+        return False
+
+
+def get_request_timings():
+    """
+        The timings of the current request, None when not enabled
+    """
+    if _enabled and has_request_context():
+        return g.get("_rbac_timings")
+
+
+def timed(name: str):
+    """
+        Context manager timing an RBAC section of the current request,
+        a no-op unless the app enabled RBAC_SERVER_TIMING
+    """
+    timings = get_request_timings()
+    if timings is None:
+        return _NULL_TIMER
+    return _Timer(timings, name)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    timings = get_request_timings()
+    if timings is not None and timings.active is not None:
+        timings.metrics[timings.active][2] += 1
+
+
+def _start_timings():
+    g._rbac_timings = RequestTimings()
+
+
+def _emit_timings(response):
+    timings = get_request_timings()
+    if timings is not None and timings.metrics:
+        response.headers.add("Server-Timing", timings.header())
+        log.info(
+            LOGMSG_INF_RBAC_TIMINGS.format(
+                request.method,
+                request.path,
+                " ".join(
+                    "{0}={1:.3f}ms/{2}/{3}".format(name, seconds * 1000, calls, statements)
+                    for name, (seconds, calls, statements) in timings.metrics.items()
+                ),
+            ),
+            extra={"rbac_timings": timings.as_dict()},
+        )
+    return response
+
+
+def init_app(app) -> None:
+    """
+        Collects the RBAC timings on every request of `app`
+    """
+    global _enabled
+    if not _enabled:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, "before_cursor_execute", _count_statement)
+        _enabled = True
+    app.before_request(_start_timings)
+    app.after_request(_emit_timings)
@@ -0,0 +1,121 @@
+"""Shared fixtures for the rbac_builder tests"""
+# Third party imports
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import Column, ForeignKey, String, Table
+from sqlalchemy.orm import relationship
+
+# RBAC Builder imports
+from rbac_builder import BaseView, Model, RBACBuilder, SQLA, has_access, permission_name
+from rbac_builder.security.sqla.models import Role  # noqa: F401
+from rbac_builder.utils import generate_uuid
+
+assoc_user_role = Table(
+    "test_user_role",
+    Model.metadata,
+    Column("user_id", String(36), ForeignKey("test_user.id")),
+    Column("role_id", String(36), ForeignKey("role.id")),
+)
+
+
+class User(Model):
+    __tablename__ = "test_user"
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    username = Column(String(64), unique=True, nullable=False)
+    roles = relationship("Role", secondary=assoc_user_role)
+
+
+class ItemView(BaseView):
+    @has_access
+    def list(self):
+        return "list"
+
+    @has_access
+    def show(self):
+        return "show"
+
+    @has_access
+    @permission_name("edit")
+    def update(self):
+        return "update"
+
+
+class ReportView(BaseView):
+    class_permission_name = "Reports"
+    method_permission_name = {"download": "read"}
+
+    @has_access
+    def download(self):
+        return "download"
+
+
+class Legacy(BaseView):
+    """View renamed from Legacy to Renamed"""
+
+    class_permission_name = "Renamed"
+
+    @has_access
+    def list(self):
+        return "list"
+
+
+@pytest.fixture
+def database_uri():
+    """In memory database, override to use another one"""
+    return "sqlite://"
+
+
+@pytest.fixture
+def app(database_uri):
+    """Flask app with a security database"""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["JWT_SECRET_KEY"] = "rbac-builder-tests-secret-key-0123456789"
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def db(app):
+    db = SQLA(app)
+    Model.metadata.create_all(db.engine)
+    yield db
+    db.session.remove()
+    Model.metadata.drop_all(db.engine)
+
+
+@pytest.fixture
+def rbac(app, db):
+    """RBACBuilder with a couple of registered views and menus"""
+    jwt = JWTManager(app)
+
+    @jwt.user_lookup_loader
+    def user_lookup(jwt_header, jwt_data):
+        return db.session.query(User).filter_by(username=jwt_data["sub"]).first()
+
+    rbac = RBACBuilder()
+    rbac.init_app(app, db.session, jwt)
+    app.rbac_builder = rbac
+    rbac.add_view(ItemView, "Items", category="Catalog")
+    rbac.add_view(ReportView, "Reports", category="Catalog")
+    rbac.add_side("Main", items=["Catalog"])
+    return rbac
+
+
+@pytest.fixture
+def admin_user(rbac, db):
+    user = User(username="admin", roles=[rbac.sm.find_role(rbac.sm.auth_role_admin)])
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def user_request(app, admin_user):
+    """Request context authenticated as the admin user"""
+    token = create_access_token(identity=admin_user.username)
+    headers = {"Authorization": "Bearer {0}".format(token)}
+    with app.test_request_context(headers=headers):
+        yield
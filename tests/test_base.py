@@ -0,0 +1,48 @@
+"""Tests for the rbac_builder.base module"""
+# Standard library imports
+import gc
+
+# Third party imports
+from flask import Flask
+
+# RBAC Builder imports
+from rbac_builder import RBACBuilder
+from conftest import ItemView
+
+
+#
+# Tests
+#
+def test_warmup(app, db, rbac, monkeypatch):
+    """Test warmup registers pending views and freezes the collector"""
+    builder = RBACBuilder()
+    builder.add_view(ItemView, "Pending", category="Later")
+    builder.init_app(app, db.session, rbac.jwt_manager)
+    assert builder.sm.find_view_menu("Pending") is None
+    # The in memory database does not survive disposing the engine
+    warmed_up = []
+    monkeypatch.setattr(builder.sm, "warmup", lambda: warmed_up.append(True))
+    try:
+        builder.warmup()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    assert warmed_up
+    assert builder.sm.find_permission_view_menu("menu_access", "Pending")
+    assert builder.sm.find_permission_view_menu("menu_access", "Later")
+    assert builder.get_view("ItemView")._permission_guards["list"] == ("can_list", "ItemView")
+    assert builder.menu._skeleton is not None
+
+
+def test_init_app_custom_security_manager(db):
+    """Test a security manager not built on BaseSecurityManager can be used"""
+
+    class SecurityManager(object):
+        def __init__(self, rbac_builder):
+            self.rbac_builder = rbac_builder
+
+    app = Flask(__name__)
+    builder = RBACBuilder(security_manager_class=SecurityManager)
+    builder.init_app(app, db.session, None)
+    assert isinstance(builder.sm, SecurityManager)
+    assert "rbac" in app.cli.commands
@@ -0,0 +1,66 @@
+"""Tests for the rbac_builder.baseview module"""
+# RBAC Builder imports
+from rbac_builder import BaseView, has_access
+from conftest import ItemView, ReportView
+
+
+class PropertyView(ItemView):
+    evaluated = 0
+
+    @property
+    def expensive(self):
+        PropertyView.evaluated += 1
+        return None
+
+    def show(self):
+        """Overridden without has_access, no longer protected"""
+        return "show"
+
+
+#
+# Tests
+#
+def test_metadata_cached_per_class():
+    """Test that permission metadata is collected once per class"""
+    metadata = ItemView.get_permission_metadata()
+    assert ItemView().get_permission_metadata() is metadata
+    assert ReportView.get_permission_metadata() is not metadata
+    assert metadata.protected_methods == {"list": "list", "show": "show", "update": "edit"}
+    assert metadata.base_permissions == frozenset({"can_list", "can_show", "can_edit"})
+
+
+def test_metadata_skips_properties():
+    """Test that collecting metadata does not evaluate properties"""
+    view = PropertyView()
+    assert PropertyView.evaluated == 0
+    assert view.base_permissions == frozenset({"can_list", "can_edit"})
+
+
+def test_previous_method_permission_name():
+    """Test previous names are inferred and not shared between instances"""
+    first, second = ReportView(), ReportView()
+    assert first.previous_method_permission_name == {"download": "download"}
+    assert first.previous_method_permission_name is not second.previous_method_permission_name
+    assert first.base_permissions == frozenset({"can_read"})
+
+
+def test_explicit_base_permissions():
+    """Test that declared base_permissions are kept"""
+
+    class LimitedView(BaseView):
+        base_permissions = ["can_list"]
+
+        @has_access
+        def list(self):
+            return "list"
+
+        @has_access
+        def delete(self):
+            return "delete"
+
+    view = LimitedView()
+    assert view.base_permissions == frozenset({"can_list"})
+    assert view._compile_permission_guards() == {
+        "list": ("can_list", "LimitedView"),
+        "delete": None,
+    }
@@ -0,0 +1,117 @@
+"""Tests for the rbac_builder.cache module"""
+# Standard library imports
+import json
+import os
+import pickle
+import sqlite3
+
+# Third party imports
+import pytest
+
+# RBAC Builder imports
+from rbac_builder.cache import LRUCache, MemoryCacheBackend, SQLiteCacheBackend
+from rbac_builder.testing import CacheBackendConformance
+
+
+#
+# Tests
+#
+def test_lru_cache_bounds():
+    """Test entries are evicted by count and by weight, oldest first"""
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache = LRUCache(maxsize=10, max_weight=5, weigh=len)
+    cache.set("a", "xxx")
+    cache.set("b", "yyy")
+    assert "a" not in cache
+    assert cache.weight == 3
+    assert cache.delete("b") and cache.weight == 0
+
+
+class TestMemoryCacheBackend(CacheBackendConformance):
+    def make_backend(self):
+        return MemoryCacheBackend()
+
+
+class TestSQLiteCacheBackend(CacheBackendConformance):
+    @pytest.fixture(autouse=True)
+    def cache_path(self, tmp_path):
+        self.path = os.path.join(str(tmp_path), "cache.db")
+
+    def make_backend(self):
+        return SQLiteCacheBackend(self.path)
+
+
+def test_sqlite_backend_shared(tmp_path):
+    """Test two backends on the same file see each other's writes"""
+    path = os.path.join(str(tmp_path), "cache.db")
+    first, second = SQLiteCacheBackend(path), SQLiteCacheBackend(path)
+    first.set("a", 1, tags=["role:1"])
+    assert second.get("a") == 1
+    second.bump_version("role:1")
+    assert first.get("a") is None
+
+
+def test_shared_role_cache(app, rbac, db, tmp_path):
+    """Test a grant change evicts the role grants of every node"""
+    app.config["RBAC_ROLE_CACHE"] = True
+    app.config["RBAC_CACHE_BACKEND"] = SQLiteCacheBackend(
+        os.path.join(str(tmp_path), "cache.db")
+    )
+    sm = rbac.sm
+    other = rbac.security_manager_class(rbac)
+    public_id = sm.find_role(sm.auth_role_public).id
+    assert not sm.has_access("can_list", "ItemView", role_ids=[public_id])
+    assert not other.has_access("can_list", "ItemView", role_ids=[public_id])
+
+    sm.add_permission_role(
+        sm.find_role(sm.auth_role_public),
+        sm.find_permission_view_menu("can_list", "ItemView"),
+    )
+    sm.role_cache.refresh(force=True)
+    other.role_cache._next_refresh = float("inf")
+    assert other.has_access("can_list", "ItemView", role_ids=[public_id])
+
+
+def test_sqlite_backend_json(tmp_path):
+    """Test values are stored as JSON and old pickled rows are ignored"""
+    path = os.path.join(str(tmp_path), "cache.db")
+    backend = SQLiteCacheBackend(path)
+    backend.set("a", {"grants": [["ItemView", "can_list", "1"]]}, tags=["role:1"])
+    conn = sqlite3.connect(path)
+    value, tags = conn.execute("SELECT value, tags FROM rbac_cache WHERE key = 'a'").fetchone()
+    assert json.loads(value) == {"grants": [["ItemView", "can_list", "1"]]}
+    assert json.loads(tags) == [["role:1", 0]]
+
+    with conn:
+        conn.execute(
+            "INSERT INTO rbac_cache (key, value, expires, tags) VALUES ('old', ?, NULL, ?)",
+            (pickle.dumps({"a": 1}), pickle.dumps(())),
+        )
+    assert backend.get_many(["a", "old"]) == {"a": {"grants": [["ItemView", "can_list", "1"]]}}
+    assert conn.execute("SELECT count(*) FROM rbac_cache WHERE key = 'old'").fetchone()[0] == 0
+
+
+def test_shared_cursor(app, rbac, db, tmp_path):
+    """Test a change made while no node polls is applied by the next node"""
+    app.config["RBAC_ROLE_CACHE"] = True
+    app.config["RBAC_CACHE_BACKEND"] = SQLiteCacheBackend(
+        os.path.join(str(tmp_path), "cache.db")
+    )
+    sm = rbac.sm
+    public_id = sm.find_role(sm.auth_role_public).id
+    assert not sm.has_access("can_list", "ItemView", role_ids=[public_id])
+
+    sm.add_permission_role(
+        sm.find_role(sm.auth_role_public),
+        sm.find_permission_view_menu("can_list", "ItemView"),
+    )
+    other = rbac.security_manager_class(rbac)
+    assert other.has_access("can_list", "ItemView", role_ids=[public_id])
+    assert other.role_cache.cache.get(other.role_cache.cursor_key) == sm.get_last_change_seq()
@@ -0,0 +1,44 @@
+"""Tests for the rbac_builder.cli module"""
+# RBAC Builder imports
+from conftest import Legacy
+
+
+#
+# Tests
+#
+def test_sync(app, rbac):
+    """Test sync adds the permissions of views registered without them"""
+    rbac.update_perms = False
+    rbac.add_view(Legacy, "Legacy")
+    assert rbac.sm.find_view_menu("Renamed") is None
+
+    result = app.test_cli_runner().invoke(args=["rbac", "sync"])
+    assert result.exit_code == 0, result.output
+    assert "Sync finished in" in result.output
+    assert "permission_view 10 (+2)" in result.output
+    assert rbac.sm.find_permission_view_menu("can_list", "Renamed")
+
+
+def test_plan(app, rbac):
+    """Test plan prints the converge operations without applying them"""
+    rbac.sm.add_permissions_view(["can_list"], "Legacy")
+    rbac.add_view(Legacy, "Legacy")
+
+    result = app.test_cli_runner().invoke(args=["rbac", "plan"])
+    assert result.exit_code == 0, result.output
+    assert "Legacy.can_list -> Renamed.can_list" in result.output
+    assert "- delete view Legacy" in result.output
+    assert rbac.sm.find_view_menu("Legacy")
+
+
+def test_converge_and_cleanup(app, rbac):
+    """Test converge and cleanup report their changes"""
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["rbac", "converge"])
+    assert result.exit_code == 0, result.output
+    assert "ReportView.can_download -> Reports.can_read" in result.output
+
+    rbac.sm.add_permissions_view(["can_list"], "Stale")
+    result = runner.invoke(args=["rbac", "cleanup"])
+    assert result.exit_code == 0, result.output
+    assert "view_menu 5 (-1)" in result.output
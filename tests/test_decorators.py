@@ -0,0 +1,133 @@
+"""Tests for the rbac_builder.security.decorators module"""
+# Standard library imports
+import asyncio
+import os
+import threading
+
+# Third party imports
+import pytest
+from flask_jwt_extended import create_access_token, current_user
+from sqlalchemy import inspect
+
+# RBAC Builder imports
+from conftest import User
+from rbac_builder import BaseView, has_access
+
+
+class AsyncItemView(BaseView):
+    class_permission_name = "ItemView"
+
+    @has_access
+    async def list(self):
+        return threading.current_thread().name
+
+    @has_access
+    async def delete(self):
+        return "delete"
+
+
+class AsyncUserView(BaseView):
+    class_permission_name = "ItemView"
+
+    @has_access
+    async def show(self):
+        return current_user
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    """File database, so the async check threads can read it"""
+    return "sqlite:///{0}".format(os.path.join(str(tmp_path), "rbac.db"))
+
+
+@pytest.fixture
+def public_request(app, rbac, db):
+    """Request context authenticated as a user with the public role only"""
+    user = User(username="guest", roles=[rbac.sm.find_role(rbac.sm.auth_role_public)])
+    db.session.add(user)
+    db.session.commit()
+    token = create_access_token(identity=user.username)
+    headers = {"Authorization": "Bearer {0}".format(token)}
+    with app.test_request_context(headers=headers):
+        yield
+
+
+#
+# Tests
+#
+def test_guards_compiled_on_registration(rbac):
+    """Test that permissions are resolved when the view is registered"""
+    view = rbac.get_view("ItemView")
+    assert view.base_permissions == frozenset({"can_list", "can_show", "can_edit"})
+    assert view._permission_guards == {
+        "list": ("can_list", "ItemView"),
+        "show": ("can_show", "ItemView"),
+        "update": ("can_edit", "ItemView"),
+    }
+
+
+def test_method_permission_name_override(rbac):
+    """Test that method_permission_name overrides the decorated name"""
+    view = rbac.get_view("Reports")
+    assert view._permission_guards == {"download": ("can_read", "Reports")}
+
+
+def test_access_granted(rbac, user_request):
+    """Test that a user holding the permission reaches the method"""
+    assert rbac.get_view("ItemView").update() == "update"
+    assert rbac.get_view("Reports").download() == "download"
+
+
+def test_access_denied(rbac, public_request, caplog):
+    """Test that a user without the permission gets a 403"""
+    response, status = rbac.get_view("ItemView").list()
+    assert status == 403
+    with caplog.at_level("WARNING", logger="rbac_builder.security.denials"):
+        rbac.sm.denial_logger.flush(timeout=5)
+    assert caplog.records[-1].rbac_denial == {
+        "permission": "can_list",
+        "view": "ItemView",
+        "identity": "guest",
+        "count": 1,
+    }
+
+
+def test_async_view_shares_permissions(rbac):
+    """Test that async views get the same permission metadata as sync ones"""
+    view = AsyncItemView()
+    view.rbac_builder = rbac
+    assert view.base_permissions == frozenset({"can_list", "can_delete"})
+    assert view._compile_permission_guards() == {
+        "list": ("can_list", "ItemView"),
+        "delete": ("can_delete", "ItemView"),
+    }
+    assert asyncio.iscoroutinefunction(AsyncItemView.list)
+
+
+def test_async_access_granted(rbac, user_request):
+    """Test that the check of an async view runs off the event loop"""
+    view = AsyncItemView()
+    view.rbac_builder = rbac
+    view._compile_permission_guards()
+    assert asyncio.run(view.list()) == "MainThread"
+    assert rbac.sm.check_executor._thread_name_prefix == "rbac-check"
+
+
+def test_async_access_denied(rbac, public_request):
+    """Test that an async view denied in the check pool gets a 403"""
+    view = AsyncItemView()
+    view.rbac_builder = rbac
+    view._compile_permission_guards()
+    response, status = asyncio.run(view.delete())
+    assert status == 403
+
+
+def test_async_current_user(rbac, db, user_request):
+    """Test that the user loaded in the check pool is usable in an async view"""
+    view = AsyncUserView()
+    view.rbac_builder = rbac
+    view._compile_permission_guards()
+    db.session.expunge_all()
+    user = asyncio.run(view.show())
+    assert not inspect(user).detached
+    assert [role.name for role in user.roles] == [rbac.sm.auth_role_admin]
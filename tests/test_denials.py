@@ -0,0 +1,36 @@
+"""Tests for the rbac_builder.security.denials module"""
+# RBAC Builder imports
+from rbac_builder.security.denials import DenialLogger
+
+
+#
+# Tests
+#
+def test_denials_aggregated(caplog):
+    """Test repeated denials are logged once with their count"""
+    denial_logger = DenialLogger(window=3600)
+    with caplog.at_level("WARNING", logger="rbac_builder.security.denials"):
+        for _ in range(3):
+            denial_logger.record("can_list", "ItemView", "guest")
+        denial_logger.record("can_list", "ItemView", "other")
+        denial_logger.flush(timeout=5)
+        assert {record.rbac_denial["identity"]: record.rbac_denial["count"]
+                for record in caplog.records} == {"guest": 3, "other": 1}
+        assert caplog.records[0].getMessage() == (
+            "Access is Denied for: can_list on: ItemView to: guest, 3 times"
+        )
+
+        caplog.clear()
+        denial_logger.record("can_edit", "ItemView")
+        denial_logger.stop()
+        assert [record.rbac_denial["count"] for record in caplog.records] == [1]
+
+
+def test_denials_window(caplog):
+    """Test the aggregated denials are logged when the window ends"""
+    denial_logger = DenialLogger(window=0.01)
+    with caplog.at_level("WARNING", logger="rbac_builder.security.denials"):
+        denial_logger.record("can_list", "ItemView", "guest")
+        denial_logger._thread.join(0.5)
+        assert len(caplog.records) == 1
+    denial_logger.stop()
@@ -0,0 +1,186 @@
+"""Tests for the rbac_builder.security.grants module"""
+# RBAC Builder imports
+from rbac_builder import const as c
+from rbac_builder.security.grants import GRANTS_TAG, RolePermissionCache
+from rbac_builder.security.manager import RBACChange
+from rbac_builder.testing import assert_max_statements
+
+
+class ChangeLog(object):
+    """
+        Security manager stand in serving a change log built by the tests
+    """
+
+    def __init__(self):
+        self.changes = []
+        self.on_load = None
+
+    def grant(self, seq, role_id):
+        self.changes.append(RBACChange(
+            seq, c.CHANGE_GRANT, c.CHANGE_TARGET_ROLE, role_id, None, None, None, None, None
+        ))
+
+    def get_last_change_seq(self):
+        return max((change.seq for change in self.changes), default=0)
+
+    def get_changes_since(self, seq, limit=None):
+        return sorted(
+            (change for change in self.changes if change.seq > seq),
+            key=lambda change: change.seq,
+        )[:limit]
+
+    def find_role_grants(self, role_ids):
+        if self.on_load:
+            self.on_load()
+        return {role_id: {("ItemView", "can_list"): role_id} for role_id in role_ids}
+
+
+#
+# Tests
+#
+def test_late_changes_applied():
+    """Test a change committed below the last applied seq still evicts"""
+    change_log = ChangeLog()
+    cache = RolePermissionCache(change_log)
+    cache.refresh(force=True)
+    cache.get_many(["r1", "r2"])
+    change_log.grant(2, "r2")
+    cache.refresh(force=True)
+    assert cache.cache.get(cache.key("r2")) is None
+    cache.get_many(["r2"])
+
+    change_log.grant(1, "r1")
+    cache.refresh(force=True)
+    assert cache.cache.get(cache.key("r1")) is None
+    assert cache.cache.get(cache.key("r2")) is not None
+
+
+def test_eviction_during_load():
+    """Test an entry evicted while loading is not cached stale"""
+    change_log = ChangeLog()
+    cache = RolePermissionCache(change_log)
+    cache.refresh(force=True)
+    change_log.on_load = lambda: cache.evict(change_log.changes[-1])
+    change_log.grant(1, "r1")
+    assert cache.get_many(["r1", "r2"])
+    assert cache.cache.get(cache.key("r1")) is None
+    change_log.on_load = None
+    cache.get_many(["r1", "r2"])
+    assert cache.cache.get(cache.key("r1")) is not None
+
+
+def test_evictions_keep_versions_bounded():
+    """Test evicting many keys adds no version per key"""
+    change_log = ChangeLog()
+    cache = RolePermissionCache(change_log)
+    cache.refresh(force=True)
+    for seq in range(1, 101):
+        change_log.grant(seq, "r{0}".format(seq))
+    cache.get_many(["r{0}".format(seq) for seq in range(1, 101)])
+    cache.refresh(force=True)
+    assert set(cache.cache._versions) <= {GRANTS_TAG, cache.generation_tag}
+
+
+def test_tenant_roles(rbac, db):
+    """Test tenants can reuse role names and checks only see their roles"""
+    sm = rbac.sm
+    sm.tenant_cache.refresh_interval = 0
+    acme = sm.add_role("Editor", tenant="acme")
+    globex = sm.add_role("Editor", tenant="globex")
+    assert acme.id != globex.id
+    assert sm.find_role("Editor", tenant="acme") is acme
+    assert sm.find_role("Editor") is None
+
+    list_pv = sm.find_permission_view_menu("can_list", "ItemView")
+    sm.add_permission_role(acme, list_pv)
+    role_ids = [acme.id, globex.id]
+    assert sm.has_tenant_access("acme", "can_list", "ItemView", role_ids=role_ids)
+    assert not sm.has_tenant_access("globex", "can_list", "ItemView", role_ids=role_ids)
+    assert sm.get_tenant_permission_view("acme", role_ids=role_ids) == [
+        {"id": list_pv.id, "action": "can_list", "view": "ItemView"}
+    ]
+
+    # Global roles apply to every tenant
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    assert sm.has_tenant_access("globex", "can_list", "ItemView", role_ids=[admin_id])
+    assert "Items" in sm.get_tenant_menu_access("globex", role_ids=[admin_id])
+
+
+def test_tenant_cache_refresh(rbac, db):
+    """Test tenants are loaded once and evicted by their changes"""
+    sm = rbac.sm
+    sm.tenant_cache.refresh_interval = 0
+    role = sm.add_role("Editor", tenant="acme")
+    list_pv = sm.find_permission_view_menu("can_list", "ItemView")
+    assert not sm.has_tenant_access("acme", "can_list", "ItemView", role_ids=[role.id])
+    grants = sm.tenant_cache.get("acme")
+    assert sm.tenant_cache.get("acme") is grants
+
+    sm.add_permission_role(role, list_pv)
+    assert sm.has_tenant_access("acme", "can_list", "ItemView", role_ids=[role.id])
+    sm.update_permissions_roles({role.id: []})
+    assert not sm.has_tenant_access("acme", "can_list", "ItemView", role_ids=[role.id])
+
+
+def test_tenant_column_added(rbac, db):
+    """Test an old schema gets the tenant columns on boot"""
+    db.engine.execute("ALTER TABLE rbac_change_log DROP COLUMN tenant")
+    rbac.sm.stamp_schema_version(2)
+    rbac.security_manager_class(rbac)
+    last_seq = rbac.sm.get_last_change_seq()
+    rbac.sm.add_role("Editor", tenant="acme")
+    assert rbac.sm.get_changes_since(last_seq)[0].tenant == "acme"
+
+
+def test_role_cache(app, rbac, db):
+    """Test roles are loaded once and checks then run from memory"""
+    app.config["RBAC_ROLE_CACHE"] = True
+    sm = rbac.sm
+    sm.role_cache.refresh_interval = 3600
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    public_id = sm.find_role(sm.auth_role_public).id
+    assert sm.has_access("can_list", "ItemView", role_ids=[admin_id, public_id])
+    with assert_max_statements(db.engine, 0):
+        assert not sm.has_access("can_list", "ItemView", role_ids=[public_id])
+        assert sm.has_access("can_list", "ItemView", role_ids=[admin_id])
+        assert sm.get_user_menu_access(["Items", "Nope"], role_ids=[admin_id]) == {"Items"}
+        assert len(sm.get_user_permission_view(role_ids=[admin_id])) == 4
+    assert set(sm.role_cache.cache.lru._data) == {
+        sm.role_cache.key(admin_id), sm.role_cache.key(public_id), sm.role_cache.cursor_key
+    }
+
+    sm.add_permission_role(
+        sm.find_role(sm.auth_role_public),
+        sm.find_permission_view_menu("can_list", "ItemView"),
+    )
+    assert not sm.has_access("can_list", "ItemView", role_ids=[public_id])
+    sm.role_cache.refresh(force=True)
+    assert sm.has_access("can_list", "ItemView", role_ids=[public_id])
+
+
+def test_grants_tag_bumped_on_delete(app, rbac, db):
+    """Test deleted permission views invalidate every cached grants entry"""
+    app.config["RBAC_ROLE_CACHE"] = True
+    sm = rbac.sm
+    public_id = sm.find_role(sm.auth_role_public).id
+    sm.has_access("can_list", "ItemView", role_ids=[public_id])
+    sm.add_permission_view_menu("can_archive", "ItemView")
+    sm.role_cache.refresh(force=True)
+    assert sm.role_cache.cache.get(sm.role_cache.key(public_id)) == {}
+
+    sm.del_permission_view_menu("can_archive", "ItemView")
+    sm.role_cache.refresh(force=True)
+    assert sm.role_cache.cache.get(sm.role_cache.key(public_id)) is None
+
+
+def test_tenant_builtin_role_names(rbac, db):
+    """Test a tenant role named like a builtin role is not the builtin role"""
+    sm = rbac.sm
+    public = sm.find_role(sm.auth_role_public)
+    tenant_public = sm.add_role(sm.auth_role_public, tenant="acme")
+    sm.add_permission_role(tenant_public, sm.find_permission_view_menu("can_list", "ItemView"))
+    assert sm.get_public_role_id() == public.id
+    assert sm.get_public_role() is public
+    assert not sm.is_item_public("can_list", "ItemView")
+    assert sm.del_role(tenant_public.id)
+    assert not sm.del_role(public.id)
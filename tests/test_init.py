@@ -0,0 +1,47 @@
+"""Tests for the lazy rbac_builder package namespace"""
+# Standard library imports
+import os.path
+import subprocess
+import sys
+
+# Third party imports
+import pytest
+
+# RBAC Builder imports
+import rbac_builder
+
+# Repository root, so the subprocess imports this checkout
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#
+# Tests
+#
+def test_decorators_do_not_import_dependencies():
+    """Test that declaring protected views imports no database or JWT code"""
+    code = (
+        "import sys\n"
+        "from rbac_builder import BaseView, has_access, permission_name\n"
+        "class MyView(BaseView):\n"
+        "    @has_access\n"
+        "    @permission_name('read')\n"
+        "    def show(self):\n"
+        "        pass\n"
+        "MyView()\n"
+        "heavy = ('sqlalchemy', 'flask_sqlalchemy', 'flask_jwt_extended')\n"
+        "print(','.join(m for m in heavy if m in sys.modules))\n"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    assert output.strip() == b""
+
+
+def test_public_names_resolve():
+    """Test that every public name is importable from the package"""
+    for name in rbac_builder.__all__:
+        assert getattr(rbac_builder, name) is not None
+
+
+def test_unknown_name():
+    """Test that unknown names raise AttributeError"""
+    with pytest.raises(AttributeError):
+        rbac_builder.NotAName
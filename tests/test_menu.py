@@ -0,0 +1,75 @@
+"""Tests for the rbac_builder.menu module"""
+# Standard library imports
+import json
+
+# Third party imports
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+
+# RBAC Builder imports
+from rbac_builder.testing import assert_max_statements
+
+
+class LazyLabel(object):
+    """Label converted to a string on each render, like lazy_gettext"""
+
+    value = "Lazy"
+
+    def __str__(self):
+        return self.value
+
+
+@pytest.fixture
+def menu(rbac, user_request):
+    verify_jwt_in_request()
+    rbac.menu.add_separator("Catalog")
+    rbac.add_menu("Help", href="/help", category="Catalog", label=LazyLabel())
+    return rbac.menu
+
+
+#
+# Tests
+#
+def test_get_data(menu):
+    """Test the rendered menu keeps its structure and hides denied items"""
+    assert menu.get_data() == [{
+        "name": "Catalog",
+        "icon": "",
+        "label": "Catalog",
+        "childs": [
+            {"name": "Items", "icon": "", "label": "Items", "url": ""},
+            {"name": "Reports", "icon": "", "label": "Reports", "url": ""},
+            "-",
+            {"name": "Help", "icon": "", "label": "Lazy", "url": "/help"},
+        ],
+    }]
+    LazyLabel.value = "Translated"
+    try:
+        assert menu.get_data()[0]["childs"][-1]["label"] == "Translated"
+    finally:
+        LazyLabel.value = "Lazy"
+
+
+def test_get_json(rbac, menu):
+    """Test the stitched JSON fragments match the rendered data"""
+    assert json.loads(menu.get_json()) == menu.get_data()
+    assert json.loads(rbac.side.get_json()) == rbac.side.get_data()
+
+
+def test_freeze_reused_until_changed(rbac, menu):
+    """Test the skeleton is built once and rebuilt after a change"""
+    skeleton = menu.freeze()
+    menu.get_data()
+    assert menu.freeze() is skeleton
+    rbac.add_menu("About", href="/about", category="Catalog")
+    assert menu.freeze() is not skeleton
+    assert "About" in menu.freeze().menu_names
+
+
+def test_side_single_query(rbac, db, menu):
+    """Test the sides and their menus are resolved with one query"""
+    rbac.side.get_data()
+    with assert_max_statements(db.engine, 1):
+        data = rbac.side.get_data()
+    assert list(data) == ["Main"]
+    assert data["Main"]["items"] == menu.get_data()
@@ -0,0 +1,139 @@
+"""Tests for the rbac_builder.security.manager module"""
+# Third party imports
+import pytest
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+
+# RBAC Builder imports
+from conftest import Legacy
+from rbac_builder.security.sqla.models import assoc_permissionview_role
+from rbac_builder.testing import assert_max_statements
+
+
+@pytest.fixture
+def claim_request(app, rbac, admin_user):
+    """Request authenticated with a token carrying the role ids"""
+    app.config["RBAC_ROLE_IDS_CLAIM"] = "roles"
+    token = create_access_token(
+        identity=admin_user.username,
+        additional_claims=rbac.sm.role_ids_claims(admin_user),
+    )
+    headers = {"Authorization": "Bearer {0}".format(token)}
+    with app.test_request_context(headers=headers):
+        yield
+
+
+#
+# Tests
+#
+def test_explicit_role_ids(rbac, db):
+    """Test checks and listings accept role ids directly"""
+    sm = rbac.sm
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    public_id = sm.find_role(sm.auth_role_public).id
+    with assert_max_statements(db.engine, 3):
+        assert sm.has_access("can_list", "ItemView", role_ids=[admin_id])
+        assert not sm.has_access("can_list", "ItemView", role_ids=[public_id])
+        assert "Items" in sm.get_user_menu_access(role_ids=[admin_id])
+    assert sm.get_user_permission_view(role_ids=[public_id]) == []
+    assert len(sm.get_user_permission_view_menu(role_ids=[admin_id])) == 8
+
+
+def test_role_ids_from_claim(rbac, db, claim_request):
+    """Test role ids are read from the JWT without loading the user"""
+    verify_jwt_in_request()
+    db.session.expire_all()
+    with assert_max_statements(db.engine, 1):
+        assert rbac.sm.has_access("can_list", "ItemView")
+
+
+def test_role_ids_loader(rbac, db, user_request):
+    """Test a registered loader replaces the user roles"""
+    sm = rbac.sm
+    public_id = sm.find_role(sm.auth_role_public).id
+
+    @sm.role_ids_loader
+    def load_role_ids():
+        return [public_id]
+
+    verify_jwt_in_request()
+    assert sm.get_current_role_ids() == [public_id]
+    assert not sm.has_access("can_list", "ItemView")
+
+
+def test_iter_user_permission_view(rbac):
+    """Test the streaming listing yields the same grants in chunks"""
+    sm = rbac.sm
+    sm.stream_chunk_size = 1
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    assert set(sm.iter_user_permission_view(role_ids=[admin_id])) == {
+        (pv["id"], pv["action"], pv["view"])
+        for pv in sm.get_user_permission_view(role_ids=[admin_id])
+    }
+    assert {name for _, name in sm.iter_all_roles()} == {
+        sm.auth_role_admin, sm.auth_role_public
+    }
+
+
+def test_security_converge(rbac):
+    """Test converge moves the grants of renamed views"""
+    sm = rbac.sm
+    sm.stream_chunk_size = 1
+    public = sm.find_role(sm.auth_role_public)
+    sm.add_permissions_view(["can_list"], "Legacy")
+    sm.add_permission_role(public, sm.find_permission_view_menu("can_list", "Legacy"))
+
+    sm.security_converge([Legacy()])
+    assert sm.has_access("can_list", "Renamed", role_ids=[public.id])
+    assert sm.find_permission_view_menu("can_list", "Legacy") is None
+    assert sm.find_view_menu("Legacy") is None
+
+
+def test_security_converge_orphan_grants(rbac, db):
+    """Test converge skips the grants of deleted roles"""
+    sm = rbac.sm
+    sm.add_permissions_view(["can_list"], "Legacy")
+    db.engine.execute(assoc_permissionview_role.insert().values(
+        id="orphan",
+        role_id="deleted",
+        permission_view_id=sm.find_permission_view_menu("can_list", "Legacy").id,
+    ))
+
+    sm.security_converge([Legacy()])
+    assert sm.find_permission_view_menu("can_list", "Legacy") is None
+    assert sm.find_role_grants(["deleted"]) == {}
+
+
+def test_security_cleanup(rbac):
+    """Test cleanup revokes and removes views no longer registered"""
+    sm = rbac.sm
+    public = sm.find_role(sm.auth_role_public)
+    sm.add_permissions_view(["can_list"], "Stale")
+    sm.add_permission_role(public, sm.find_permission_view_menu("can_list", "Stale"))
+
+    rbac.security_cleanup()
+    assert sm.find_view_menu("Stale") is None
+    assert sm.get_user_permission_view(role_ids=[public.id]) == []
+    assert sm.find_view_menu("ItemView")
+
+
+def test_get_roles_with_permission(rbac, db):
+    """Test the roles holding a permission are found with one query"""
+    sm = rbac.sm
+    admin = sm.find_role(sm.auth_role_admin)
+    public = sm.find_role(sm.auth_role_public)
+    sm.add_permission_role(public, sm.find_permission_view_menu("can_list", "ItemView"))
+    with assert_max_statements(db.engine, 1):
+        roles = sm.get_roles_with_permission("can_list", "ItemView")
+    assert sorted(roles) == sorted([(admin.id, admin.name), (public.id, public.name)])
+    assert sm.get_roles_with_permission("can_read", "ItemView") == []
+
+
+def test_add_permissions_view_revokes_removed(rbac):
+    """Test permissions removed from a view are revoked from their roles"""
+    sm = rbac.sm
+    public = sm.find_role(sm.auth_role_public)
+    sm.add_permission_role(public, sm.find_permission_view_menu("can_show", "ItemView"))
+
+    sm.add_permissions_view(["can_list", "can_edit"], "ItemView")
+    assert sm.find_permission_view_menu("can_show", "ItemView") is None
+    assert sm.get_roles_with_permission("can_show", "ItemView") == []
@@ -0,0 +1,168 @@
+"""Tests for the rbac_builder.security.snapshot package"""
+# Standard library imports
+import json
+import os
+import stat
+
+# Third party imports
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+
+# RBAC Builder imports
+from rbac_builder import RBACBuilder, const as c
+from rbac_builder.security.snapshot.manager import (
+    MatrixSecurityManager,
+    SnapshotSecurityManager,
+)
+from rbac_builder.security.snapshot.matrix import PermissionMatrix, export_matrix
+from rbac_builder.security.snapshot.snapshot import RBACSnapshot, export_snapshot
+from rbac_builder.testing import assert_max_statements
+
+
+@pytest.fixture
+def snapshot_path(rbac, tmp_path):
+    path = os.path.join(str(tmp_path), "rbac.json")
+    export_snapshot(rbac.sm, path)
+    return path
+
+
+@pytest.fixture
+def snapshot_sm(app, rbac, snapshot_path):
+    """Read only security manager loaded from the exported snapshot"""
+    app.config["RBAC_SNAPSHOT_PATH"] = snapshot_path
+    app.config["RBAC_SNAPSHOT_RELOAD_INTERVAL"] = 0
+    builder = RBACBuilder(security_manager_class=SnapshotSecurityManager)
+    builder.init_app(app, None, rbac.jwt_manager)
+    return builder.sm
+
+
+#
+# Tests
+#
+def test_round_trip(rbac, snapshot_path):
+    """Test that a dumped snapshot loads back the same state"""
+    snapshot = RBACSnapshot.load(snapshot_path)
+    assert set(snapshot.roles.values()) == {"Super Admin", "Public"}
+    assert snapshot.public_role_id == rbac.sm.get_public_role().id
+    admin = rbac.sm.find_role("Super Admin")
+    assert len(snapshot.grants[admin.id]) == len(admin.permissions)
+
+
+def test_schema_version_checked(snapshot_path):
+    """Test a snapshot exported from another schema version is refused"""
+    with open(snapshot_path, encoding="utf-8") as fd:
+        data = json.load(fd)
+    data["schema_version"] = c.SECURITY_SCHEMA_VERSION - 1
+    with open(snapshot_path, "w", encoding="utf-8") as fd:
+        json.dump(data, fd)
+    with pytest.raises(ValueError, match="schema version"):
+        RBACSnapshot.load(snapshot_path)
+
+
+def test_exported_files_readable(rbac, tmp_path):
+    """Test exports are readable by other users and keep a replaced file mode"""
+    path = os.path.join(str(tmp_path), "rbac.json")
+    matrix_path = os.path.join(str(tmp_path), "rbac.matrix")
+    umask = os.umask(0o022)
+    try:
+        export_snapshot(rbac.sm, path)
+        export_matrix(rbac.sm, matrix_path)
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert stat.S_IMODE(os.stat(matrix_path).st_mode) == 0o644
+
+    os.chmod(path, 0o640)
+    export_snapshot(rbac.sm, path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+def test_export_tenant_roles(rbac, db, tmp_path):
+    """Test the export reads the grants in one pass and keeps the role tenants"""
+    sm = rbac.sm
+    tenant_public = sm.add_role("Public", tenant="acme")
+    sm.add_permission_role(tenant_public, sm.find_permission_view_menu("can_list", "ItemView"))
+    path = os.path.join(str(tmp_path), "rbac.json")
+    matrix_path = os.path.join(str(tmp_path), "rbac.matrix")
+    with assert_max_statements(db.engine, 3):
+        export_snapshot(sm, path)
+    export_matrix(sm, matrix_path)
+
+    for snapshot in (RBACSnapshot.load(path), PermissionMatrix.load(matrix_path)):
+        assert snapshot.find_role("Public").id == sm.get_public_role_id()
+        assert snapshot.find_role("Public", "acme") == (tenant_public.id, "Public", "acme")
+        assert snapshot.find_role("Public", "other") is None
+        assert snapshot.exist_permission_on_roles("ItemView", "can_list", [tenant_public.id])
+
+
+def test_checks_match_database(rbac, snapshot_sm, db, user_request):
+    """Test the snapshot answers like the database, without any query"""
+    verify_jwt_in_request()
+    expected_views = rbac.sm.get_user_permission_view()
+    expected_menus = rbac.sm.get_user_menu_access()
+    with assert_max_statements(db.engine, 1):
+        # The roles of the current user are lazy loaded once
+        assert snapshot_sm.has_access("can_list", "ItemView")
+        assert not snapshot_sm.has_access("can_delete", "ItemView")
+        assert snapshot_sm.get_user_menu_access() == expected_menus
+        views = snapshot_sm.get_user_permission_view()
+    assert sorted(views, key=lambda pv: pv["id"]) == sorted(
+        expected_views, key=lambda pv: pv["id"]
+    )
+
+
+def test_reload_on_change(rbac, snapshot_sm, snapshot_path, db, user_request):
+    """Test a new snapshot file is picked up"""
+    verify_jwt_in_request()
+    assert not snapshot_sm.has_access("can_delete", "ItemView")
+    pv = rbac.sm.add_permission_view_menu("can_delete", "ItemView")
+    rbac.sm.add_permission_role(rbac.sm.find_role("Super Admin"), pv)
+    export_snapshot(rbac.sm, snapshot_path)
+    assert snapshot_sm.has_access("can_delete", "ItemView")
+
+
+def test_writes_refused(snapshot_sm):
+    """Test that the read only manager does not write"""
+    assert snapshot_sm.add_role("Editor") is None
+    assert snapshot_sm.find_role("Editor") is None
+    assert not snapshot_sm.del_role(snapshot_sm.find_role("Public").id)
+
+
+def test_matrix_matches_snapshot(rbac, snapshot_path, tmp_path):
+    """Test the memory mapped matrix answers like the snapshot"""
+    matrix_path = os.path.join(str(tmp_path), "rbac.matrix")
+    export_matrix(rbac.sm, matrix_path)
+    snapshot = RBACSnapshot.load(snapshot_path)
+    matrix = PermissionMatrix.load(matrix_path)
+    admin_id = rbac.sm.find_role("Super Admin").id
+    role_ids = [admin_id, "missing"]
+
+    assert matrix.public_role_id == snapshot.public_role_id
+    assert matrix.find_role("Super Admin") == snapshot.find_role("Super Admin")
+    assert sorted(matrix.get_all_roles()) == sorted(snapshot.get_all_roles())
+    assert matrix.exist_permission_on_roles("ItemView", "can_edit", role_ids)
+    assert not matrix.exist_permission_on_roles("ItemView", "can_edit", ["missing"])
+    assert not matrix.exist_permission_on_roles("ItemView", "can_drop", role_ids)
+    assert matrix.find_roles_view_menu_names("menu_access", role_ids) == \
+        snapshot.find_roles_view_menu_names("menu_access", role_ids)
+    for no_menu in (True, False):
+        assert sorted(matrix.find_permission_view_by_roles(role_ids, no_menu)) == \
+            sorted(snapshot.find_permission_view_by_roles(role_ids, no_menu))
+
+
+def test_matrix_security_manager(app, rbac, tmp_path, user_request):
+    """Test the matrix backed manager picks up a file renamed over it"""
+    verify_jwt_in_request()
+    matrix_path = os.path.join(str(tmp_path), "rbac.matrix")
+    export_matrix(rbac.sm, matrix_path)
+    app.config["RBAC_SNAPSHOT_PATH"] = matrix_path
+    app.config["RBAC_SNAPSHOT_RELOAD_INTERVAL"] = 0
+    builder = RBACBuilder(security_manager_class=MatrixSecurityManager)
+    builder.init_app(app, None, rbac.jwt_manager)
+    assert builder.sm.has_access("can_list", "ItemView")
+    assert not builder.sm.has_access("can_delete", "ItemView")
+
+    pv = rbac.sm.add_permission_view_menu("can_delete", "ItemView")
+    rbac.sm.add_permission_role(rbac.sm.find_role("Super Admin"), pv)
+    export_matrix(rbac.sm, matrix_path)
+    assert builder.sm.has_access("can_delete", "ItemView")
@@ -0,0 +1,323 @@
+"""Tests for the rbac_builder.security.sqla.manager module"""
+# Standard library imports
+import os.path
+
+# Third party imports
+import pytest
+from flask_jwt_extended import JWTManager, verify_jwt_in_request
+from sqlalchemy import Column, Integer, String, inspect
+from sqlalchemy.exc import IntegrityError
+
+# RBAC Builder imports
+from rbac_builder import Model, RBACBuilder, const as c
+from rbac_builder.security.sqla.models import assoc_permissionview_role
+from rbac_builder.testing import StatementCounter
+
+
+BASELINE_SCHEMA = [
+    "CREATE TABLE permission (id VARCHAR(36) NOT NULL, name VARCHAR(100) NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE view_menu (id VARCHAR(36) NOT NULL, name VARCHAR(100) NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE role (id VARCHAR(36) NOT NULL, name VARCHAR(64) NOT NULL, "
+    "PRIMARY KEY (id), UNIQUE (name))",
+    "CREATE TABLE permission_view (id VARCHAR(36) NOT NULL, permission_id VARCHAR(36), "
+    "view_menu_id VARCHAR(36), PRIMARY KEY (id), UNIQUE (permission_id, view_menu_id), "
+    "FOREIGN KEY(permission_id) REFERENCES permission (id) ON DELETE CASCADE, "
+    "FOREIGN KEY(view_menu_id) REFERENCES view_menu (id) ON DELETE CASCADE)",
+    "CREATE TABLE permission_view_role (id VARCHAR(36) NOT NULL, "
+    "permission_view_id VARCHAR(36), role_id VARCHAR(36), PRIMARY KEY (id), "
+    "UNIQUE (permission_view_id, role_id), "
+    "FOREIGN KEY(permission_view_id) REFERENCES permission_view (id) ON DELETE CASCADE, "
+    "FOREIGN KEY(role_id) REFERENCES role (id) ON DELETE CASCADE)",
+]
+""" The security tables as created by the first releases, without a version stamp """
+
+
+class Document(Model):
+    """Application rows scoped by the views menu they belong to"""
+
+    __tablename__ = "test_document"
+    id = Column(Integer, primary_key=True)
+    view_name = Column(String(100))
+
+
+@pytest.fixture
+def database_uri(tmp_path):
+    """File database, so a second engine can read it"""
+    return "sqlite:///{0}".format(os.path.join(str(tmp_path), "rbac.db"))
+
+
+#
+# Tests
+#
+def test_warmup_loads_caches(app, rbac, db):
+    """Test the first checks after warmup run from the grants caches"""
+    app.config["RBAC_ROLE_CACHE"] = True
+    sm = rbac.sm
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    public_id = sm.find_role(sm.auth_role_public).id
+    sm.warmup()
+    with StatementCounter(db.engine) as counter:
+        assert sm.has_access("can_list", "ItemView", role_ids=[admin_id])
+        assert not sm.has_access("can_list", "ItemView", role_ids=[public_id])
+        assert not sm.has_tenant_access(None, "can_list", "ItemView", role_ids=[public_id])
+    assert counter.count == 0
+
+
+def test_warmup_bounded_by_cache_size(app, rbac, monkeypatch):
+    """Test warmup loads no more roles than the role cache holds"""
+    app.config["RBAC_ROLE_CACHE"] = True
+    app.config["RBAC_ROLE_CACHE_SIZE"] = 1
+    sm = rbac.sm
+    warmed = []
+    get_many = sm.role_cache.get_many
+
+    def spy(role_ids):
+        warmed.extend(role_ids)
+        return get_many(role_ids)
+
+    monkeypatch.setattr(sm.role_cache, "get_many", spy)
+    sm.warmup()
+    assert len(warmed) == 1
+
+
+def test_reads_on_read_engine(app, rbac, db, database_uri, user_request):
+    """Test read only checks run on the configured read engine"""
+    app.config["RBAC_READ_DATABASE_URI"] = database_uri
+    verify_jwt_in_request()
+    sm = rbac.sm
+    sm.has_access("can_list", "ItemView")
+    with StatementCounter(db.engine) as primary, \
+            StatementCounter(sm.read_engine) as replica:
+        assert sm.has_access("can_list", "ItemView")
+        assert not sm.has_access("can_delete", "ItemView")
+        assert sm.get_user_menu_access() == {"Catalog", "Items", "Reports", "Main"}
+        assert len(sm.get_user_permission_view()) == 4
+        assert sm.is_item_public("can_list", "ItemView") is False
+    assert primary.count == 0
+    assert replica.count == 6
+
+
+def test_reads_return_tuples(rbac, db):
+    """Test the Core read primitives return plain values"""
+    sm = rbac.sm
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    db.session.expunge_all()
+    names = sm.find_roles_view_menu_names("menu_access", [admin_id])
+    assert sorted(names) == ["Catalog", "Items", "Main", "Reports"]
+    rows = sm.find_permission_view_tuples_by_roles([admin_id])
+    assert all(type(row) is tuple and len(row) == 3 for row in rows)
+    assert len(db.session.identity_map) == 0
+
+
+def test_hot_statements_compiled_once(rbac, db):
+    """Test the hot checks reuse their statements and only bind values"""
+    sm = rbac.sm
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    public_id = sm.find_role(sm.auth_role_public).id
+    assert sm.exist_permission_on_roles("ItemView", "can_list", [admin_id])
+    sm.find_roles_view_menu_names("menu_access", [admin_id])
+    sm.find_permission_view_tuples_by_roles([admin_id])
+    statements = dict(sm._statements)
+    compiled = len(sm._compiled_cache)
+
+    assert not sm.exist_permission_on_roles("ItemView", "can_list", [public_id])
+    assert sm.exist_permission_on_roles("Reports", "can_read", [public_id, admin_id])
+    assert sm.find_roles_view_menu_names("menu_access", []) == []
+    sm.find_permission_view_tuples_by_roles([public_id, admin_id])
+    assert sm._statements == statements
+    assert len(sm._compiled_cache) == compiled
+
+    # The baked ORM queries return the same rows
+    assert sorted(sm.find_roles_view_menu_names("menu_access", [admin_id])) == sorted(
+        pvm.view_menu.name
+        for pvm in sm.find_roles_permission_view_menus("menu_access", [admin_id])
+    )
+    for no_menu in (True, False):
+        assert sorted(sm.find_permission_view_tuples_by_roles([admin_id], no_menu)) == sorted(
+            (pvm.id, pvm.permission.name, pvm.view_menu.name)
+            for pvm in sm.find_permission_view_by_roles([admin_id], no_menu)
+        )
+
+
+def test_deleted_role_grants(rbac, db):
+    """Test a deleted role leaves no grants for stale role id claims"""
+    sm = rbac.sm
+    role = sm.add_role("Editor")
+    sm.add_permission_role(role, sm.find_permission_view_menu("can_list", "ItemView"))
+    role_id = role.id
+    assert sm.exist_permission_on_roles("ItemView", "can_list", [role_id])
+    assert sm.del_role(role_id)
+    assert not sm.exist_permission_on_roles("ItemView", "can_list", [role_id])
+    assert sm.find_role_grants([role_id]) == {}
+
+
+def test_upgrade_adds_indexes(rbac, db):
+    """Test a version 3 schema gets the grants indexes and loses orphan grants"""
+    db.engine.execute("DROP INDEX ix_permission_view_role_role_id")
+    db.engine.execute(assoc_permissionview_role.insert().values(
+        id="orphan",
+        role_id="deleted",
+        permission_view_id=rbac.sm.find_permission_view_menu("can_list", "ItemView").id,
+    ))
+    rbac.sm.stamp_schema_version(3)
+    rbac.security_manager_class(rbac)
+    indexes = {index["name"] for index in inspect(db.engine).get_indexes("permission_view_role")}
+    assert "ix_permission_view_role_role_id" in indexes
+    assert rbac.sm.find_role_grants(["deleted"]) == {}
+
+
+def test_upgrade_unstamped_schema(app, db):
+    """Test tables created before the version stamp are migrated on boot"""
+    Model.metadata.drop_all(db.engine)
+    for statement in BASELINE_SCHEMA:
+        db.engine.execute(statement)
+    db.engine.execute("INSERT INTO role (id, name) VALUES ('editor', 'Editor')")
+    rbac = RBACBuilder()
+    rbac.init_app(app, db.session, JWTManager(app))
+    sm = rbac.sm
+    assert sm.find_schema_version() == c.SECURITY_SCHEMA_VERSION
+    assert sm.find_role("Editor").id == "editor"
+    indexes = {index["name"] for index in inspect(db.engine).get_indexes("permission_view_role")}
+    assert "ix_permission_view_role_role_id" in indexes
+    # Tenants can reuse the global role names
+    assert sm.add_role("Editor", tenant="acme").id != "editor"
+
+
+def test_global_role_names_unique(rbac, db):
+    """Test global role names stay unique, tenant ones per tenant"""
+    role = rbac.sm.role_model.__table__
+    db.engine.execute(role.insert().values(id="a", name="Editor", tenant="acme"))
+    db.engine.execute(role.insert().values(id="b", name="Editor"))
+    for values in ({"id": "c", "name": "Editor"}, {"id": "d", "name": "Editor", "tenant": "acme"}):
+        with pytest.raises(IntegrityError):
+            db.engine.execute(role.insert().values(**values))
+
+
+def test_update_permissions_roles(rbac, db):
+    """Test bulk grants apply only the difference, without ORM objects"""
+    sm = rbac.sm
+    admin = sm.find_role(sm.auth_role_admin)
+    public = sm.find_role(sm.auth_role_public)
+    admin_pvs = {pv.id for pv in admin.permissions}
+    list_pv = sm.find_permission_view_menu("can_list", "ItemView")
+    read_pv = sm.find_permission_view_menu("can_read", "Reports")
+    targets = {
+        admin.id: admin_pvs - {read_pv.id},
+        public.id: [list_pv.id, read_pv.id],
+    }
+    with StatementCounter(db.engine) as counter:
+        result = sm.update_permissions_roles(targets)
+    # select current grants, select the added permission views, one delete,
+    # one multi-row insert, one change log insert
+    assert counter.count == 5
+    assert result == {admin.id: (0, 1), public.id: (2, 0)}
+    assert {pv.id for pv in admin.permissions} == admin_pvs - {read_pv.id}
+    assert {pv.id for pv in public.permissions} == {list_pv.id, read_pv.id}
+
+    sm.update_permissions_role(public, [list_pv])
+    assert public.permissions == [list_pv]
+
+
+def test_update_permissions_unknown_roles(rbac, db, caplog):
+    """Test grants on unknown roles or permission views are skipped, the others applied"""
+    sm = rbac.sm
+    public = sm.find_role(sm.auth_role_public)
+    list_pv = sm.find_permission_view_menu("can_list", "ItemView")
+    result = sm.update_permissions_roles({public.id: [list_pv.id], "deleted": [list_pv.id]})
+    assert result == {public.id: (1, 0)}
+    assert public.permissions == [list_pv]
+    assert sm.find_role_grants(["deleted"]) == {}
+    assert "Skipped the grants of unknown roles: ['deleted']" in caplog.text
+
+    read_pv = sm.find_permission_view_menu("can_read", "Reports")
+    result = sm.update_permissions_roles({public.id: [list_pv.id, read_pv.id, "stale"]})
+    assert result == {public.id: (1, 0)}
+    assert {pv.id for pv in public.permissions} == {list_pv.id, read_pv.id}
+    assert "Skipped the grants of unknown permission views: ['stale']" in caplog.text
+    assert all(change.permission_view_id != "stale" for change in sm.get_changes_since(0))
+
+
+def test_update_permissions_revokes_in_chunks(rbac, db):
+    """Test revoking more grants than bulk_chunk_size"""
+    sm = rbac.sm
+    sm.bulk_chunk_size = 2
+    admin = sm.find_role(sm.auth_role_admin)
+    count = len(admin.permissions)
+    assert count > 2
+    assert sm.update_permissions_roles({admin.id: []}) == {admin.id: (0, count)}
+    assert sm.find_role_grants([admin.id]) == {}
+
+
+def test_grants_by_many_permission_views(rbac, db):
+    """Test grants lookups of more pairs than SQLite's expression depth limit"""
+    sm = rbac.sm
+    admin_id = sm.find_role(sm.auth_role_admin).id
+    list_pv = sm.find_permission_view_menu("can_list", "ItemView")
+    pairs = [("View{0}".format(i), "can_list") for i in range(1500)]
+    pairs.append(("ItemView", "can_list"))
+    with StatementCounter(db.engine) as counter:
+        grants = sm.find_grants_by_permission_views(pairs)
+    assert counter.count == 9
+    assert grants == [(admin_id, list_pv.id, "can_list", "ItemView")]
+
+
+def test_change_log(rbac, db):
+    """Test primitives record their changes and can be read incrementally"""
+    sm = rbac.sm
+    last_seq = sm.get_last_change_seq()
+    assert last_seq > 0
+    role = sm.add_role("Auditor")
+    list_pv = sm.find_permission_view_menu("can_list", "ItemView")
+    sm.add_permission_role(role, list_pv)
+    sm.update_permissions_roles({role.id: []})
+    sm.del_role(role.id)
+
+    changes = sm.get_changes_since(last_seq)
+    assert [(change.operation, change.target) for change in changes] == [
+        (c.CHANGE_CREATE, c.CHANGE_TARGET_ROLE),
+        (c.CHANGE_GRANT, c.CHANGE_TARGET_ROLE),
+        (c.CHANGE_REVOKE, c.CHANGE_TARGET_ROLE),
+        (c.CHANGE_DELETE, c.CHANGE_TARGET_ROLE),
+    ]
+    assert changes[0].name == "Auditor"
+    assert {change.role_id for change in changes} == {role.id}
+    assert changes[1].permission_view_id == list_pv.id
+    assert sm.get_last_change_seq() == changes[-1].seq
+    assert sm.get_changes_since(changes[-1].seq) == []
+    assert sm.get_changes_since(last_seq, limit=1) == changes[:1]
+
+
+def test_change_log_disabled(app, rbac, db):
+    """Test RBAC_CHANGE_LOG disables recording"""
+    sm = rbac.sm
+    app.config["RBAC_CHANGE_LOG"] = False
+    last_seq = sm.get_last_change_seq()
+    sm.add_role("Auditor")
+    assert sm.get_changes_since(last_seq) == []
+
+
+def test_permission_filter(rbac, db, user_request):
+    """Test rows are filtered by the user permissions in the database"""
+    sm = rbac.sm
+    db.session.add_all([
+        Document(view_name="ItemView"),
+        Document(view_name="Reports"),
+        Document(view_name="Other"),
+    ])
+    db.session.commit()
+    verify_jwt_in_request()
+
+    query = db.session.query(Document.view_name)
+    rows = query.filter(sm.permission_filter(Document.view_name, "can_list")).all()
+    assert rows == [("ItemView",)]
+    rows = query.filter(sm.permission_filter(Document.view_name, "can_read")).all()
+    assert rows == [("Reports",)]
+    public_id = sm.find_role(sm.auth_role_public).id
+    clause = sm.permission_filter(Document.view_name, "can_list", role_ids=[public_id])
+    assert query.filter(clause).all() == []
+
+    report_id = sm.find_view_menu("Reports").id
+    subquery = sm.allowed_view_menus_query("can_read", key="id")
+    assert [row[0] for row in db.session.execute(subquery)] == [report_id]
@@ -0,0 +1,106 @@
+"""Statement budgets for the RBAC code paths
+
+Each test runs an operation against the fixtures from conftest and fails
+when it issues more SQL statements than its budget, so lazy loads and
+N+1 query storms are caught by CI.
+"""
+# Third party imports
+import pytest
+from flask_jwt_extended import verify_jwt_in_request
+
+# RBAC Builder imports
+from rbac_builder import const as c
+from rbac_builder.testing import (
+    StatementBudgetExceeded,
+    StatementCounter,
+    assert_max_statements,
+)
+
+
+@pytest.fixture
+def sm(rbac, db, user_request):
+    """Security manager with an authenticated user and a cold session"""
+    verify_jwt_in_request()
+    db.session.expire_all()
+    return rbac.sm
+
+
+#
+# Tests
+#
+def test_counter_counts_statements(db):
+    """Test that StatementCounter records every statement in the block"""
+    with StatementCounter(db.engine) as counter:
+        db.session.execute("SELECT 1")
+        db.session.execute("SELECT 2")
+    db.session.execute("SELECT 3")
+    assert counter.count == 2
+
+
+def test_budget_exceeded(db):
+    """Test that assert_max_statements fails when the budget is exceeded"""
+    with pytest.raises(StatementBudgetExceeded) as excinfo:
+        with assert_max_statements(db.engine, 1):
+            db.session.execute("SELECT 1")
+            db.session.execute("SELECT 2")
+    assert "SELECT 2" in str(excinfo.value)
+
+
+def test_has_access_budget(sm, db):
+    """Test has_access loads the user roles and runs a single check"""
+    with assert_max_statements(db.engine, 3):
+        assert sm.has_access("can_list", "ItemView")
+    with assert_max_statements(db.engine, 1):
+        assert not sm.has_access("can_delete", "ItemView")
+
+
+def test_has_access_decorator_budget(rbac, sm, db):
+    """Test a protected method call stays within budget"""
+    view = rbac.get_view("ItemView")
+    with assert_max_statements(db.engine, 3):
+        assert view.list() == "list"
+
+
+def test_get_user_permission_view_budget(sm, db):
+    """Test listing permissions does not lazy load views or permissions"""
+    with assert_max_statements(db.engine, 3):
+        permission_views = sm.get_user_permission_view()
+    assert {(pv["action"], pv["view"]) for pv in permission_views} == {
+        ("can_list", "ItemView"),
+        ("can_show", "ItemView"),
+        ("can_edit", "ItemView"),
+        ("can_read", "Reports"),
+    }
+
+
+def test_menu_get_data_budget(rbac, sm, db):
+    """Test rendering the menu does not issue a query per menu item"""
+    with assert_max_statements(db.engine, 4):
+        data = rbac.menu.get_data()
+    assert data[0]["name"] == "Catalog"
+    assert [item["name"] for item in data[0]["childs"]] == ["Items", "Reports"]
+
+
+def test_add_permissions_view_budget(sm, db):
+    """Test re-registering an unchanged view stays within budget"""
+    with assert_max_statements(db.engine, 12):
+        sm.add_permissions_view(["can_list", "can_show", "can_edit"], "ItemView")
+
+
+def test_security_converge_budget(rbac, sm, db):
+    """Test converging permissions stays within budget"""
+    with assert_max_statements(db.engine, 5):
+        rbac.security_converge()
+
+
+def test_boot_budget(rbac, db):
+    """Test a stamped database is verified with a single query on boot"""
+    with assert_max_statements(db.engine, 1):
+        rbac.security_manager_class(rbac)
+
+
+def test_boot_upgrades_old_stamp(rbac, db):
+    """Test an old schema stamp re-runs creation and is bumped"""
+    rbac.sm.stamp_schema_version(0)
+    rbac.security_manager_class(rbac)
+    assert rbac.sm.find_schema_version() == c.SECURITY_SCHEMA_VERSION
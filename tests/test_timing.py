@@ -0,0 +1,54 @@
+"""Tests for the rbac_builder.timing module"""
+# Third party imports
+import pytest
+from flask import jsonify
+from flask_jwt_extended import create_access_token
+
+
+@pytest.fixture
+def app(app):
+    """App with the RBAC timings enabled"""
+    app.config["RBAC_SERVER_TIMING"] = True
+    return app
+
+
+@pytest.fixture
+def client(app, rbac, admin_user):
+    app.add_url_rule("/items", "items", lambda: rbac.get_view("ItemView").list())
+    app.add_url_rule("/menu", "menu", lambda: jsonify(rbac.menu.get_data()))
+    token = create_access_token(identity=admin_user.username)
+    client = app.test_client()
+    client.environ_base["HTTP_AUTHORIZATION"] = "Bearer {0}".format(token)
+    return client
+
+
+#
+# Tests
+#
+def test_server_timing_header(client, caplog):
+    """Test a protected request reports its RBAC sections"""
+    with caplog.at_level("INFO", logger="rbac_builder.timing"):
+        response = client.get("/items")
+    assert response.status_code == 200
+    metrics = {
+        metric.split(";")[0]: metric
+        for metric in response.headers["Server-Timing"].split(", ")
+    }
+    assert set(metrics) == {"rbac-verify_jwt", "rbac-roles", "rbac-has_access"}
+    assert 'desc="calls=1 statements=1"' in metrics["rbac-has_access"]
+    record = caplog.records[-1]
+    assert record.getMessage().startswith("RBAC timings GET /items: verify_jwt=")
+    assert record.rbac_timings["has_access"]["statements"] == 1
+
+
+def test_menu_timing(client):
+    """Test menu rendering is reported with the statements it ran"""
+    response = client.get("/menu")
+    assert response.status_code == 200
+    assert "rbac-menu;" in response.headers["Server-Timing"]
+
+
+def test_disabled(rbac, user_request):
+    """Test no timings are collected unless enabled"""
+    from rbac_builder.timing import get_request_timings
+    assert get_request_timings() is None